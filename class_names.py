@@ -0,0 +1,19 @@
+import yaml
+
+
+def load_class_names(path):
+    '''
+    读取类别名称
+    ·path       labels.txt (每行一个类别) 或 yaml (names 为列表或 {id: name} 字典)
+    ·return     {类别名称: 类别id}
+    '''
+    if path.lower().endswith(('.yaml', '.yml')):
+        with open(path, 'r', encoding='utf-8') as file:
+            names = yaml.safe_load(file)['names']
+        if isinstance(names, dict):
+            return {str(name): int(i) for i, name in names.items()}
+        return {str(name): i for i, name in enumerate(names)}
+
+    with open(path, 'r', encoding='utf-8') as f:
+        names = [line.strip() for line in f.readlines()]
+    return {name: i for i, name in enumerate(names) if name}
@@ -0,0 +1,167 @@
+import os
+import json
+import shutil
+import tempfile
+import numpy as np
+from image_size import probe_image_size
+from yolo_label import read_yolo_labels, label_warnings, xywhn_to_xyxy, class_ids
+from job_control import worker_canceled
+
+
+def read_yolo_boxes(task):
+    '''
+    读取一个 YOLO txt 标签并转换为像素坐标，可在进程池中执行
+    ·task       (txt文件路径, 图片路径, 图片尺寸或 None)，尺寸为 None 时在子进程中解析文件头
+    ·return     (txt文件路径, 图片路径, 图片尺寸, 错误, 警告, 框数组)
+                错误和警告与 yolo2labelme.convert_yolo_file 相同；框数组为 (N, 5) 的 [类别, x, y, w, h]
+    '''
+    txt_file, image_path, image_size = task
+    # 暂停时等待；任务已取消时不再处理，调用方会丢弃这个结果
+    if worker_canceled():
+        return txt_file, image_path, image_size, None, [], None
+    if image_size is None:
+        try:
+            image_size = probe_image_size(image_path)
+        except Exception as e:
+            return txt_file, image_path, None, ("无法读取图片尺寸", str(e)), [], None
+
+    try:
+        labels, truncated, skipped = read_yolo_labels(txt_file, with_stats=True)
+        xyxy = xywhn_to_xyxy(labels, image_size[0], image_size[1])
+        boxes = np.column_stack([
+            class_ids(labels), xyxy[:, 0], xyxy[:, 1], xyxy[:, 2] - xyxy[:, 0], xyxy[:, 3] - xyxy[:, 1]
+        ])
+    except Exception as e:
+        return txt_file, image_path, image_size, ("处理文件失败", str(e)), [], None
+    return txt_file, image_path, image_size, None, label_warnings(truncated, skipped), boxes
+
+
+class CocoWriter:
+    '''
+    流式写出 COCO 格式标注，内存占用与图片数量无关
+    图片信息直接写入输出文件，标注先写到本地临时文件，关闭时再拼接到输出文件后面；
+    每个文件写完后才替换为正式文件名，中途失败或取消时 abort 删除本次写出的所有文件，不会留下不完整的结果
+    ·output_path    输出文件路径，例如 annotations.json
+    ·categories     类别名称列表 (labels.txt 的内容)，类别 k 的 category_id 为 k + 1；
+                    每个分片都写出完整的类别表，不在表中的类别id (包括负数) 的目标被跳过
+    ·shard_size     每个文件最多包含的图片数，None 或 0 表示只写一个文件；
+                    分片时文件名为 annotations_000.json、annotations_001.json ...
+    ·precision      坐标保留的小数位数，None 表示不取舍
+    '''
+
+    def __init__(self, output_path, categories, shard_size=None, precision=None):
+        self.output_path = output_path
+        self.categories = list(categories)
+        self.shard_size = shard_size or None
+        self.precision = precision
+        self.image_count = 0
+        self.annotation_count = 0
+        self.paths = []
+        self._shard_index = 0
+        self._shard_images = 0
+        self._shard_annotations = 0
+        self._file = None
+        self._spool = None
+        self._open_shard()
+
+    def _shard_path(self):
+        if not self.shard_size:
+            return self.output_path
+        root, ext = os.path.splitext(self.output_path)
+        return f"{root}_{self._shard_index:03d}{ext}"
+
+    def _open_shard(self):
+        self._path = self._shard_path()
+        self._file = open(self._path + '.part', 'w', encoding='utf-8')
+        self._file.write('{"info":{"description":"converted from YOLO labels"},"images":[')
+        self._spool = tempfile.TemporaryFile('w+', encoding='utf-8')
+        self._shard_images = 0
+        self._shard_annotations = 0
+
+    def _close_shard(self):
+        self._file.write('],"annotations":[')
+        self._spool.seek(0)
+        shutil.copyfileobj(self._spool, self._file, 1024 * 1024)
+        self._spool.close()
+
+        # 所有分片使用相同的完整类别表
+        categories = [{"id": i + 1, "name": name, "supercategory": ""} for i, name in enumerate(self.categories)]
+        self._file.write('],"categories":')
+        self._file.write(json.dumps(categories, ensure_ascii=False))
+        self._file.write('}')
+        self._file.close()
+        os.replace(self._path + '.part', self._path)
+        self.paths.append(self._path)
+
+    def add_image(self, file_name, width, height, boxes):
+        '''
+        添加一张图片及其标注
+        ·file_name  图片文件名
+        ·width      图片宽度
+        ·height     图片高度
+        ·boxes      (N, 5) 数组，每行为 [类别, x, y, w, h] (像素坐标，x、y 为左上角)
+        ·return     被跳过的目标的类别id列表 (负数或不在类别表中)
+        '''
+        if self.shard_size and self._shard_images >= self.shard_size:
+            self._close_shard()
+            self._shard_index += 1
+            self._open_shard()
+
+        self.image_count += 1
+        image_id = self.image_count
+        image = {"id": image_id, "file_name": file_name, "width": width, "height": height}
+        self._file.write((',' if self._shard_images else '') + json.dumps(image, ensure_ascii=False))
+        self._shard_images += 1
+
+        boxes = np.asarray(boxes, dtype=np.float64).reshape(-1, 5)
+        ids = boxes[:, 0].astype(np.int64)
+        # category_id 0 是 COCO 保留的，负数和超出类别表的id都不写出
+        known = (ids >= 0) & (ids < len(self.categories))
+        invalid = ids[~known].tolist()
+        if not known.all():
+            boxes = boxes[known]
+            ids = ids[known]
+        if not len(boxes):
+            return invalid
+        xywh = boxes[:, 1:]
+        if self.precision is not None:
+            xywh = xywh.round(self.precision)
+        areas = xywh[:, 2] * xywh[:, 3]
+        if self.precision is not None:
+            areas = areas.round(self.precision)
+
+        parts = []
+        for class_id, bbox, area in zip(ids.tolist(), xywh.tolist(), areas.tolist()):
+            self.annotation_count += 1
+            parts.append(json.dumps({
+                "id": self.annotation_count, "image_id": image_id, "category_id": class_id + 1,
+                "bbox": bbox, "area": area, "iscrowd": 0, "segmentation": []
+            }))
+        self._spool.write((',' if self._shard_annotations else '') + ','.join(parts))
+        self._shard_annotations += len(parts)
+        return invalid
+
+    def close(self):
+        '''
+        写完最后一个文件
+        ·return     所有输出文件的路径
+        '''
+        if self._file is not None:
+            self._close_shard()
+            self._file = None
+        return self.paths
+
+    def abort(self):
+        '''
+        放弃写入 (例如转换被取消)，删除未完成的临时文件和已经写完的分片，
+        避免留下看起来完整的部分结果；close 之后调用不做任何事
+        '''
+        if self._file is not None:
+            self._file.close()
+            self._spool.close()
+            os.remove(self._path + '.part')
+            self._file = None
+            for path in self.paths:
+                if os.path.exists(path):
+                    os.remove(path)
+            self.paths = []
@@ -0,0 +1,175 @@
+import os
+import csv
+import struct
+import numpy as np
+from PIL import Image
+
+
+# images.npy 的文件头固定为 128 字节，扩容和结束时可以原地改写样本数
+_NPY_HEADER_LEN = 128
+# 没有类别名称的 YOLO 标签以 "class_N" 作为类别名称，写入数据集时类别id 仍为 N
+YOLO_CLASS_PREFIX = 'class_'
+
+
+def _npy_header(shape):
+    header = "{'descr': '|u1', 'fortran_order': False, 'shape': %r, }" % (tuple(shape),)
+    header = header.ljust(_NPY_HEADER_LEN - 11) + '\n'
+    return b'\x93NUMPY\x01\x00' + struct.pack('<H', len(header)) + header.encode('latin1')
+
+
+def letterbox(image, size, channels=3, fill=114):
+    '''
+    保持宽高比缩放到固定尺寸，不足的部分居中填充
+    ·image      PIL 图像或 RGB/灰度 uint8 数组
+    ·size       (宽, 高)
+    ·channels   输出通道数，1 为灰度，3 为 RGB
+    ·fill       填充颜色
+    ·return     (高, 宽, 通道数) uint8 数组
+    '''
+    if not isinstance(image, Image.Image):
+        image = Image.fromarray(np.ascontiguousarray(image))
+    mode = 'L' if channels == 1 else 'RGB'
+    if image.mode != mode:
+        image = image.convert(mode)
+
+    width, height = size
+    scale = min(width / image.width, height / image.height)
+    new_size = (max(1, round(image.width * scale)), max(1, round(image.height * scale)))
+    if new_size != image.size:
+        image = image.resize(new_size, Image.BILINEAR)
+
+    canvas = np.full((height, width, channels), fill, dtype=np.uint8)
+    x0 = (width - new_size[0]) // 2
+    y0 = (height - new_size[1]) // 2
+    canvas[y0:y0 + new_size[1], x0:x0 + new_size[0]] = np.asarray(image).reshape(new_size[1], new_size[0], channels)
+    return canvas
+
+
+class CropDatasetWriter:
+    '''
+    把裁剪结果写成固定尺寸的数组数据集，训练时用 np.load(path, mmap_mode='r') 直接切片，不需要解码
+    输出目录中包含：
+        images.npy  (N, 高, 宽, 通道数) uint8，每个裁剪按 letterbox 缩放
+        labels.npy  (N,) int32 类别id
+        meta.csv    每个样本的序号、类别、来源图像和裁剪框
+        classes.txt 类别名称，第 k 行为类别id k
+    images.npy 预分配为内存映射文件，写满后扩容，结束时截断为实际样本数；
+    所有文件写完后才替换为正式文件名，中途失败不会留下不完整的数据集
+    ·output_dir     输出目录
+    ·size           (宽, 高)
+    ·channels       通道数，1 为灰度，3 为 RGB
+    ·class_names    已知的类别名称列表，其他类别按出现顺序追加在后面；
+                    "class_N" 形式的类别 (YOLO 标签) 使用类别id N，该位置已被其他名称占用时才追加在后面
+    ·capacity       初始预分配的样本数
+    '''
+
+    def __init__(self, output_dir, size=(64, 64), channels=3, class_names=None, capacity=4096):
+        os.makedirs(output_dir, exist_ok=True)
+        self.output_dir = output_dir
+        self.size = tuple(size)
+        self.channels = channels
+        self.class_names = [str(name) for name in (class_names or [])]
+        self.count = 0
+        self._class_ids = {name: i for i, name in enumerate(self.class_names)}
+        self._labels = []
+        self._images_path = os.path.join(output_dir, 'images.npy')
+        self._labels_path = os.path.join(output_dir, 'labels.npy')
+        self._classes_path = os.path.join(output_dir, 'classes.txt')
+        self._meta_path = os.path.join(output_dir, 'meta.csv')
+        self._meta_file = open(self._meta_path + '.part', 'w', encoding='utf-8', newline='')
+        self._meta = csv.writer(self._meta_file)
+        self._meta.writerow(['index', 'label', 'class_id', 'source', 'xmin', 'ymin', 'xmax', 'ymax'])
+        with open(self._images_path + '.part', 'wb'):
+            pass
+        self._array = None
+        self._map(max(1, capacity))
+
+    @property
+    def sample_shape(self):
+        return self.size[1], self.size[0], self.channels
+
+    def _map(self, capacity):
+        # 改写文件头并调整文件大小后重新映射，已写入的样本保留在原位置
+        if self._array is not None:
+            self._array.flush()
+            self._array = None
+        shape = (capacity,) + self.sample_shape
+        with open(self._images_path + '.part', 'r+b') as f:
+            f.write(_npy_header(shape))
+            f.truncate(_NPY_HEADER_LEN + int(np.prod(shape)))
+        self._array = np.memmap(self._images_path + '.part', dtype=np.uint8, mode='r+',
+                                offset=_NPY_HEADER_LEN, shape=shape)
+
+    def class_id(self, label):
+        label = str(label)
+        class_id = self._class_ids.get(label)
+        if class_id is None:
+            class_id = _yolo_class_id(label)
+            if class_id is None or (class_id < len(self.class_names) and self.class_names[class_id] is not None):
+                class_id = len(self.class_names)
+            # 跳过的类别id 先用 None 占位，写出时补为 "class_N"
+            self.class_names.extend([None] * (class_id + 1 - len(self.class_names)))
+            self.class_names[class_id] = label
+            self._class_ids[label] = class_id
+        return class_id
+
+    def add(self, label, source, bbox, array):
+        '''
+        添加一个样本
+        ·label      类别名称
+        ·source     来源图像路径
+        ·bbox       (xmin, ymin, xmax, ymax) 原图像素坐标
+        ·array      letterbox 的结果，形状为 (高, 宽, 通道数)
+        '''
+        if self.count >= len(self._array):
+            self._map(len(self._array) * 2)
+        class_id = self.class_id(label)
+        self._array[self.count] = array
+        self._labels.append(class_id)
+        self._meta.writerow([self.count, label, class_id, source] + [round(float(v), 2) for v in bbox])
+        self.count += 1
+
+    def close(self):
+        '''
+        截断到实际样本数并写出所有文件
+        ·return     样本数
+        '''
+        if self._array is None:
+            return self.count
+        self._array.flush()
+        self._array = None
+        shape = (self.count,) + self.sample_shape
+        with open(self._images_path + '.part', 'r+b') as f:
+            f.write(_npy_header(shape))
+            f.truncate(_NPY_HEADER_LEN + int(np.prod(shape)))
+        self._meta_file.close()
+
+        with open(self._labels_path + '.part', 'wb') as f:
+            np.save(f, np.asarray(self._labels, dtype=np.int32))
+        with open(self._classes_path + '.part', 'w', encoding='utf-8') as f:
+            f.writelines(f"{YOLO_CLASS_PREFIX}{i}\n" if name is None else name + '\n'
+                         for i, name in enumerate(self.class_names))
+        for path in self._paths():
+            os.replace(path + '.part', path)
+        return self.count
+
+    def abort(self):
+        '''
+        放弃写入 (例如处理被取消)，删除未完成的临时文件
+        '''
+        if self._array is not None:
+            self._array = None
+            self._meta_file.close()
+            for path in self._paths():
+                if os.path.exists(path + '.part'):
+                    os.remove(path + '.part')
+
+    def _paths(self):
+        return self._labels_path, self._classes_path, self._meta_path, self._images_path
+
+
+def _yolo_class_id(label):
+    # "class_N" 中的 N，其他名称返回 None
+    if label.startswith(YOLO_CLASS_PREFIX) and label[len(YOLO_CLASS_PREFIX):].isdigit():
+        return int(label[len(YOLO_CLASS_PREFIX):])
+    return None
@@ -0,0 +1,255 @@
+import io
+import os
+import json
+import time
+from PIL import Image, ImageDraw
+from jpeg_crop import read_jpeg_layout, align_box, lossless_backend, crop_jpeg, save_image
+from region_read import REGION_FORMATS, REGION_MIN_PIXELS, open_region_reader
+from crop_dataset import YOLO_CLASS_PREFIX, letterbox
+from job_control import set_worker_control, worker_canceled
+from yolo_label import read_yolo_labels, label_warnings, xywhn_to_xyxy, class_ids
+
+
+def parse_json_label(label_path, img_width, img_height):
+    targets = []
+    with open(label_path, 'r') as f:
+        data = json.load(f)
+
+    for shape in data.get('shapes', []):
+        label = shape.get('label', 'unknown')
+        points = shape.get('points', [])
+
+        if not points:
+            continue
+
+        # 计算边界框
+        x_coords = [p[0] for p in points]
+        y_coords = [p[1] for p in points]
+        x_min = max(0, min(x_coords))
+        y_min = max(0, min(y_coords))
+        x_max = min(img_width, max(x_coords))
+        y_max = min(img_height, max(y_coords))
+
+        # 确保边界框有效
+        if x_max > x_min and y_max > y_min:
+            bbox = (x_min, y_min, x_max, y_max)
+            targets.append((label, bbox))
+
+    return targets
+
+
+def parse_txt_label(label_path, img_width, img_height, warnings=None):
+    # 读取整个标签文件，用数组运算计算边界框并限制在图像范围内
+    labels, truncated, skipped = read_yolo_labels(label_path, with_stats=True)
+    if warnings is not None:
+        warnings.extend((category, label_path, message) for category, message in label_warnings(truncated, skipped))
+    boxes = xywhn_to_xyxy(labels, img_width, img_height, clip=True)
+
+    # 使用类ID作为标签
+    return [(f"{YOLO_CLASS_PREFIX}{class_id}", tuple(bbox))
+            for class_id, bbox in zip(class_ids(labels).tolist(), boxes.tolist())]
+
+
+def parse_label(label_path, img_width, img_height, warnings=None):
+    if label_path.lower().endswith('.json'):
+        return parse_json_label(label_path, img_width, img_height)
+    return parse_txt_label(label_path, img_width, img_height, warnings)
+
+
+def draw_targets(image, targets):
+    # 直接在传入的图像上绘制边界框和标签
+    draw = ImageDraw.Draw(image)
+
+    for label, bbox in targets:
+        # 绘制边界框
+        draw.rectangle(bbox, outline="red", width=3)
+        # 添加标签
+        draw.text((bbox[0] + 5, bbox[1] + 5), label, fill="red")
+
+
+def make_thumbnail(image, targets, max_size):
+    '''
+    生成带边界框的预览缩略图，先缩小再绘制，不修改原图
+    ·image      PIL 图像
+    ·targets    [(类别, (xmin, ymin, xmax, ymax)), ...]，原图像素坐标
+    ·max_size   (最大宽度, 最大高度)
+    ·return     (宽度, 高度, RGB888 字节)，可以直接构造 QImage
+    '''
+    scale = min(max_size[0] / image.width, max_size[1] / image.height, 1.0)
+    size = (max(1, round(image.width * scale)), max(1, round(image.height * scale)))
+    # reducing_gap 先用整数倍缩小再重采样，大图缩放速度快很多
+    thumb = image.convert('RGB') if image.mode != 'RGB' else image
+    thumb = thumb.resize(size, Image.BILINEAR, reducing_gap=2.0)
+
+    draw = ImageDraw.Draw(thumb)
+    for label, bbox in targets:
+        box = [v * scale for v in bbox]
+        draw.rectangle(box, outline="red", width=2)
+        draw.text((box[0] + 3, box[1] + 3), label, fill="red")
+    return thumb.width, thumb.height, thumb.tobytes()
+
+
+# 本次处理中已经创建过的目录，避免每个裁剪都调用一次 os.makedirs，由 init_worker 清空
+_created_dirs = set()
+# 预览缩略图的最大尺寸和同一进程两次生成缩略图的最短间隔 (秒)
+_thumb_size = None
+_thumb_interval = 0.0
+_last_thumb = 0.0
+# 裁剪输出方式，见 CROP_MODES
+_crop_mode = "reencode"
+# 导出为数组数据集时每个裁剪的 (宽, 高) 和通道数，None 表示保存为图片文件
+_array_size = None
+_array_channels = 3
+
+# "reencode": 解码后按 ENCODE_PARAMS 重新编码为 .jpg
+# "lossless": JPEG 原图按 MCU 对齐后直接从压缩数据中裁剪，不解码也不重新编码 (需要 PyTurboJPEG 或 jpegtran，
+#             都不可用时退回重新编码)；其他格式的原图保存为无损 PNG
+CROP_MODES = ("reencode", "lossless")
+
+
+def init_worker(thumb_size=None, thumb_interval=0.0, crop_mode="reencode", array_size=None, array_channels=3,
+                control=None):
+    '''
+    设置进程中共享的处理参数，每次处理开始时调用
+    ·thumb_size     预览缩略图最大尺寸 (宽, 高)，None 表示不生成缩略图
+    ·thumb_interval 同一进程两次生成缩略图的最短间隔 (秒)，用于限制预览刷新频率
+    ·crop_mode      裁剪输出方式，见 CROP_MODES
+    ·array_size     不为 None 时不保存图片文件，裁剪按 letterbox 缩放到 (宽, 高) 后返回，由调用方写入数组数据集
+    ·array_channels 数组数据集的通道数，1 为灰度，3 为 RGB
+    ·control        JobControl，用于暂停和取消，None 表示不控制
+    '''
+    global _thumb_size, _thumb_interval, _last_thumb, _crop_mode, _array_size, _array_channels
+    # 清空目录记录，输出目录可能在两次处理之间被删除
+    _created_dirs.clear()
+    _thumb_size = thumb_size
+    _thumb_interval = thumb_interval
+    _last_thumb = 0.0
+    _crop_mode = crop_mode
+    _array_size = array_size
+    _array_channels = array_channels
+    set_worker_control(control)
+
+
+def _thumbnail_due():
+    # 距离上次生成缩略图超过间隔时才生成，其余图像不做缩放也不传回缩略图
+    global _last_thumb
+    if not _thumb_size:
+        return False
+    now = time.monotonic()
+    if now - _last_thumb < _thumb_interval:
+        return False
+    _last_thumb = now
+    return True
+
+
+def _makedirs(path):
+    if path not in _created_dirs:
+        os.makedirs(path, exist_ok=True)
+        _created_dirs.add(path)
+
+
+def crop_image(task):
+    '''
+    处理一张图像：最多解码一次，所有裁剪和预览图都使用同一个解码结果，可在进程池中执行
+    先完成所有裁剪和缩略图，再在原图缓冲区上绘制预览，因此不需要复制整张图像；
+    无损模式下 JPEG 原图只有需要预览时才解码；超大的 TIFF/BMP 只解码与目标框相交的部分，不生成缩略图
+    ·task       (图像路径, 标签路径, 输出目录, 预览图路径或 None, 是否仅生成预览)
+                预览图路径为 None 时不保存完整尺寸的预览图
+    ·return     (图像路径, 类别列表, 保存的裁剪数, 错误列表, 缩略图, 数组样本, 警告列表)
+                错误为 (类别, 文件, 详细信息)；缩略图见 make_thumbnail，未生成时为 None；
+                导出数组数据集时数组样本为 [(类别, 裁剪框, letterbox 数组), ...]，否则为 None；
+                警告与错误格式相同 (例如多于 5 列被截断的标签行)，图像仍然正常处理
+    '''
+    image_path, label_path, output_dir, preview_path, preview_only = task
+    # 暂停时等待；任务已取消时不再处理，调用方会丢弃这个结果
+    if worker_canceled():
+        return image_path, [], 0, [], None, None, []
+    base_name = os.path.splitext(os.path.basename(image_path))[0]
+    errors = []
+    region = None
+
+    # 打开图像，无损模式下读取原始数据用于直接裁剪
+    try:
+        data = layout = None
+        lossless = _crop_mode == "lossless" and not preview_only and not _array_size
+        if lossless:
+            with open(image_path, 'rb') as f:
+                data = f.read()
+            layout = read_jpeg_layout(data)
+            if layout and not lossless_backend():
+                layout = None
+            image = Image.open(io.BytesIO(data))
+        else:
+            image = Image.open(image_path)
+        # 超大的 TIFF/BMP 不需要保存预览图时按区域读取，不解码整张图像
+        if not layout and not preview_path and image.format in REGION_FORMATS \
+                and image.width * image.height >= REGION_MIN_PIXELS:
+            region = open_region_reader(image_path)
+        want_thumb = region is None and _thumbnail_due()
+        if (not layout and not region) or want_thumb or preview_path:
+            image.load()
+    except Exception as e:
+        return image_path, [], 0, [("无法打开图像", image_path, str(e))], None, None, []
+
+    try:
+        # 解析标签文件
+        try:
+            warnings = []
+            targets = parse_label(label_path, image.width, image.height, warnings)
+        except Exception as e:
+            return image_path, [], 0, [("解析标签失败", label_path, str(e))], None, None, []
+
+        # 裁剪并保存目标区域
+        saved = 0
+        samples = [] if _array_size else None
+        if not preview_only and _array_size:
+            for label, bbox in targets:
+                try:
+                    cropped = region.crop(bbox) if region else image.crop(bbox)
+                    samples.append((label, bbox, letterbox(cropped, _array_size, _array_channels)))
+                    saved += 1
+                except Exception as e:
+                    errors.append(("裁剪失败", image_path, f"{label} - {str(e)}"))
+        elif not preview_only:
+            # 无损模式下非 JPEG 原图保存为 PNG
+            ext = ".png" if lossless and image.format != "JPEG" else ".jpg"
+            for j, (label, bbox) in enumerate(targets):
+                # 创建类别目录
+                class_dir = os.path.join(output_dir, label)
+                output_path = os.path.join(class_dir, f"{base_name}_{j}{ext}")
+                try:
+                    _makedirs(class_dir)
+                    if layout:
+                        # 裁剪框向外扩展到 MCU 边界后直接裁剪压缩数据
+                        box = align_box(bbox, *layout)
+                        with open(output_path, 'wb') as f:
+                            f.write(crop_jpeg(data, box))
+                    else:
+                        # 保存裁剪后的图像
+                        save_image(region.crop(bbox) if region else image.crop(bbox), output_path)
+                    saved += 1
+                except Exception as e:
+                    errors.append(("裁剪失败", image_path, f"{label} - {str(e)}"))
+
+        # 生成预览缩略图
+        thumbnail = None
+        if want_thumb:
+            try:
+                thumbnail = make_thumbnail(image, targets, _thumb_size)
+            except Exception as e:
+                errors.append(("生成预览失败", image_path, str(e)))
+
+        # 保存完整尺寸的预览图
+        if preview_path:
+            try:
+                _makedirs(os.path.dirname(preview_path))
+                draw_targets(image, targets)
+                save_image(image, preview_path)
+            except Exception as e:
+                errors.append(("生成预览失败", image_path, str(e)))
+
+        return image_path, [t[0] for t in targets], saved, errors, thumbnail, samples, warnings
+    finally:
+        if region:
+            region.close()
+        image.close()
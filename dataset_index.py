@@ -0,0 +1,114 @@
+import os
+
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.bmp', '.tif', '.tiff', '.gif')
+LABEL_EXTENSIONS = ('.txt', '.json')
+
+
+def _scan(directory, extensions, table, entries):
+    # 一次 os.scandir 列出目录，按 文件名主干 -> {扩展名: 路径} 建立映射
+    with os.scandir(directory) as it:
+        for entry in it:
+            stem, ext = os.path.splitext(entry.name)
+            ext = ext.lower()
+            if ext not in extensions or not entry.is_file():
+                continue
+            table.setdefault(stem, {})[ext] = entry.path
+            entries[entry.path] = entry
+
+
+class DatasetIndex:
+    '''
+    图片/标签配对索引
+    对图片目录和标签目录各做一次 os.scandir，建立 文件名主干 -> 路径 的映射，
+    之后的配对查询都在内存中完成，不再逐个调用 os.path.exists
+    ·image_dir          图片目录
+    ·label_dir          标签目录，默认与图片目录相同 (相同目录只扫描一次)
+    ·image_extensions   图片扩展名，按优先级排列
+    ·label_extensions   标签扩展名，按优先级排列
+    '''
+
+    def __init__(self, image_dir, label_dir=None, image_extensions=IMAGE_EXTENSIONS,
+                 label_extensions=LABEL_EXTENSIONS):
+        self.image_dir = image_dir
+        self.label_dir = label_dir or image_dir
+        self.image_extensions = tuple(e.lower() for e in image_extensions)
+        self.label_extensions = tuple(e.lower() for e in label_extensions)
+        self.images = {}
+        self.labels = {}
+        self._entries = {}
+
+        if os.path.normcase(os.path.abspath(self.image_dir)) == os.path.normcase(os.path.abspath(self.label_dir)):
+            table = {}
+            _scan(self.image_dir, set(self.image_extensions) | set(self.label_extensions), table, self._entries)
+            for stem, files in table.items():
+                image_files = {e: p for e, p in files.items() if e in self.image_extensions}
+                label_files = {e: p for e, p in files.items() if e in self.label_extensions}
+                if image_files:
+                    self.images[stem] = image_files
+                if label_files:
+                    self.labels[stem] = label_files
+        else:
+            _scan(self.image_dir, set(self.image_extensions), self.images, self._entries)
+            _scan(self.label_dir, set(self.label_extensions), self.labels, self._entries)
+
+    def find_image(self, stem):
+        '''
+        按扩展名优先级查找图片
+        ·stem       文件名主干 (不含扩展名)
+        ·return     图片路径，没有时返回 None
+        '''
+        files = self.images.get(stem)
+        if files:
+            for ext in self.image_extensions:
+                if ext in files:
+                    return files[ext]
+        return None
+
+    def find_label(self, stem, extensions=None):
+        '''
+        按扩展名优先级查找标签
+        ·stem       文件名主干 (不含扩展名)
+        ·extensions 可选，只在这些扩展名中查找，默认使用 label_extensions
+        ·return     标签路径，没有时返回 None
+        '''
+        files = self.labels.get(stem)
+        if files:
+            for ext in extensions or self.label_extensions:
+                if ext in files:
+                    return files[ext]
+        return None
+
+    def image_files(self):
+        '''
+        所有图片路径 (同一主干有多个扩展名时全部返回)，按文件名排序
+        '''
+        return sorted(p for files in self.images.values() for p in files.values())
+
+    def label_files(self, extension):
+        '''
+        指定扩展名的所有标签路径，按文件名排序
+        '''
+        extension = extension.lower()
+        return sorted(files[extension] for files in self.labels.values() if extension in files)
+
+    def images_without_label(self, extensions=None):
+        '''
+        没有对应标签的图片路径
+        '''
+        return [p for p in self.image_files()
+                if self.find_label(os.path.splitext(os.path.basename(p))[0], extensions) is None]
+
+    def labels_without_image(self, extension):
+        '''
+        指定扩展名的标签中，没有对应图片的标签路径
+        '''
+        return [p for p in self.label_files(extension)
+                if self.find_image(os.path.splitext(os.path.basename(p))[0]) is None]
+
+    def stat(self, path):
+        '''
+        返回扫描时得到的文件信息 (Windows 上不需要额外的系统调用)
+        '''
+        entry = self._entries.get(path)
+        return entry.stat() if entry is not None else os.stat(path)
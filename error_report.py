@@ -0,0 +1,110 @@
+import csv
+import threading
+from collections import OrderedDict
+from PyQt5.QtWidgets import (
+    QDialog, QVBoxLayout, QHBoxLayout, QPlainTextEdit, QPushButton, QFileDialog, QMessageBox
+)
+
+
+class ErrorReport:
+    '''
+    批处理错误汇总：按类别计数，每个类别只保留少量样例用于显示，
+    完整记录 (最多 max_records 条) 可导出为 CSV
+    ·max_samples    每个类别保留的样例数
+    ·max_records    最多保留的完整记录数
+    '''
+
+    def __init__(self, max_samples=20, max_records=100000):
+        self.max_samples = max_samples
+        self.max_records = max_records
+        self.counts = OrderedDict()
+        self.samples = OrderedDict()
+        self.records = []
+        self.total = 0
+        self._lock = threading.Lock()
+
+    def add(self, category, path, message=''):
+        '''
+        记录一条错误
+        ·category   错误类别，例如 "找不到图片文件"
+        ·path       出错的文件
+        ·message    详细信息
+        '''
+        with self._lock:
+            self.total += 1
+            self.counts[category] = self.counts.get(category, 0) + 1
+            samples = self.samples.setdefault(category, [])
+            if len(samples) < self.max_samples:
+                samples.append((path, message))
+            if len(self.records) < self.max_records:
+                self.records.append((category, path, message))
+
+    def summary(self):
+        with self._lock:
+            lines = [f"共 {self.total} 个错误"]
+            for category, count in self.counts.items():
+                lines.append("")
+                lines.append(f"[{category}] {count} 个")
+                for path, message in self.samples[category]:
+                    lines.append(f"  {path}" + (f" - {message}" if message else ""))
+                if count > len(self.samples[category]):
+                    lines.append(f"  ... 其余 {count - len(self.samples[category])} 个请导出 CSV 查看")
+            return "\n".join(lines)
+
+    def export_csv(self, path):
+        with self._lock:
+            records = list(self.records)
+        # 使用带 BOM 的 UTF-8，Excel 可以直接正确显示中文
+        with open(path, 'w', newline='', encoding='utf-8-sig') as f:
+            writer = csv.writer(f)
+            writer.writerow(["类别", "文件", "信息"])
+            writer.writerows(records)
+        return len(records)
+
+
+class ErrorReportDialog(QDialog):
+    '''
+    非模态的错误汇总窗口，打开时才生成文本，不阻塞主窗口
+    '''
+
+    def __init__(self, report, parent=None):
+        super().__init__(parent)
+        self.report = report
+        self.setWindowTitle(f"错误汇总 ({report.total} 个)")
+        self.setModal(False)
+        self.resize(700, 400)
+
+        layout = QVBoxLayout(self)
+        self.text_edit = QPlainTextEdit()
+        self.text_edit.setReadOnly(True)
+        layout.addWidget(self.text_edit)
+
+        button_layout = QHBoxLayout()
+        self.export_btn = QPushButton("导出 CSV")
+        self.export_btn.clicked.connect(self.export_csv)
+        button_layout.addWidget(self.export_btn)
+        self.close_btn = QPushButton("关闭")
+        self.close_btn.clicked.connect(self.close)
+        button_layout.addWidget(self.close_btn)
+        layout.addLayout(button_layout)
+        self._rendered = False
+
+    def showEvent(self, event):
+        super().showEvent(event)
+        if not self._rendered:
+            self.text_edit.setPlainText(self.report.summary())
+            self._rendered = True
+
+    def export_csv(self):
+        path, _ = QFileDialog.getSaveFileName(self, "导出错误列表", "errors.csv", "CSV Files (*.csv)")
+        if not path:
+            return
+        try:
+            count = self.report.export_csv(path)
+        except Exception as e:
+            QMessageBox.critical(self, "错误", f"导出失败: {str(e)}")
+            return
+        if count < self.report.total:
+            QMessageBox.information(self, "完成", f"已导出前 {count} 条错误（共 {self.report.total} 条）")
+        else:
+            QMessageBox.information(self, "完成", f"已导出 {count} 条错误")
@@ -0,0 +1,209 @@
+import os
+import sys
+import time
+import errno
+import shutil
+import threading
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+try:
+    # Linux 的 FICLONE ioctl (btrfs、xfs 等支持写时复制的文件系统)
+    import fcntl
+except ImportError:
+    fcntl = None
+
+
+# 保留源文件的落地方式：复制、硬链接、符号链接、写时复制 (reflink)
+COPY_MODES = ('copy', 'hardlink', 'symlink', 'reflink')
+TRANSFER_MODES = COPY_MODES + ('move',)
+# 网络盘上单个文件的延迟远大于传输时间，线程数按并发请求数设置而不是CPU核心数
+DEFAULT_WORKERS = 8
+
+_FICLONE = 0x40049409
+
+# 可以重试的临时错误：网络中断、超时、文件被占用等
+_TRANSIENT_ERRNOS = {errno.EAGAIN, errno.EBUSY, errno.EINTR, errno.EIO, errno.ETIMEDOUT,
+                     errno.ECONNRESET, errno.ECONNABORTED, errno.EHOSTUNREACH, errno.ENETRESET, errno.ENETUNREACH}
+# Windows：文件被占用、锁定冲突、网络路径不可用、网络名不再可用、信号灯超时
+_TRANSIENT_WINERRORS = {32, 33, 53, 64, 121}
+
+
+def _reflink(src, dst):
+    if fcntl is None:
+        raise OSError("当前系统不支持 reflink")
+    with open(src, 'rb') as fsrc, open(dst, 'wb') as fdst:
+        try:
+            fcntl.ioctl(fdst.fileno(), _FICLONE, fsrc.fileno())
+        except OSError:
+            fdst.close()
+            os.remove(dst)
+            raise
+
+
+def _copy(src, dst, preserve=False):
+    # shutil.copyfile 在 Linux 上使用 sendfile，在 macOS 上使用 fcopyfile，在内核中复制
+    shutil.copyfile(src, dst)
+    if preserve:
+        shutil.copystat(src, dst)
+
+
+def transfer_file(src, dst, mode='copy', preserve=False):
+    '''
+    把 src 落地到 dst，链接失败 (跨分区、文件系统或权限不支持) 时退回复制
+    ·src        源文件
+    ·dst        目标文件，已存在时先删除，避免写穿之前创建的链接而修改源文件
+    ·mode       TRANSFER_MODES 之一；move 在同一分区内直接重命名，跨分区时复制后删除源文件
+    ·preserve   复制时是否保留修改时间等元数据 (与 shutil.copy2 相同)
+    ·return     实际使用的方式，同分区移动为 'rename'
+    '''
+    if mode not in TRANSFER_MODES:
+        raise ValueError(f"不支持的方式: {mode}，可选 {TRANSFER_MODES}")
+    if os.path.normcase(os.path.abspath(src)) == os.path.normcase(os.path.abspath(dst)):
+        return 'skip'
+    if mode == 'move':
+        try:
+            os.replace(src, dst)
+            return 'rename'
+        except OSError as e:
+            if e.errno != errno.EXDEV:
+                raise
+        _copy(src, dst, preserve=True)
+        os.remove(src)
+        return mode
+
+    if os.path.lexists(dst):
+        os.remove(dst)
+    try:
+        if mode == 'hardlink':
+            os.link(src, dst)
+            return mode
+        if mode == 'symlink':
+            os.symlink(os.path.abspath(src), dst)
+            return mode
+        if mode == 'reflink':
+            _reflink(src, dst)
+            return mode
+    except OSError:
+        pass
+    _copy(src, dst, preserve)
+    return 'copy'
+
+
+def is_transient(error):
+    '''
+    是否为可以重试的临时错误
+    '''
+    if isinstance(error, (FileNotFoundError, IsADirectoryError, NotADirectoryError)):
+        return False
+    return getattr(error, 'winerror', None) in _TRANSIENT_WINERRORS or error.errno in _TRANSIENT_ERRNOS
+
+
+class TransferStats:
+    '''
+    批量传输的统计信息
+    ·total      文件总数，未知时为 None
+    ·files      已完成的文件数
+    ·bytes      已完成的字节数
+    ·modes      实际使用的方式计数，例如链接失败后退回的 copy
+    ·errors     失败的 [(src, dst, 异常), ...]
+    '''
+
+    def __init__(self, total=None):
+        self.total = total
+        self.files = 0
+        self.bytes = 0
+        self.retries = 0
+        self.modes = Counter()
+        self.errors = []
+        self.start = time.monotonic()
+
+    @property
+    def elapsed(self):
+        return time.monotonic() - self.start
+
+    def summary(self):
+        elapsed = max(self.elapsed, 1e-6)
+        done = f"{self.files}/{self.total}" if self.total is not None else str(self.files)
+        return (f"{done} 个文件, {self.bytes / 1048576:.1f} MB, "
+                f"{self.files / elapsed:.1f} 个/秒, {self.bytes / 1048576 / elapsed:.1f} MB/秒")
+
+
+def print_progress(stats):
+    '''
+    默认的进度输出，在同一行刷新
+    '''
+    sys.stdout.write('\r' + stats.summary())
+    sys.stdout.flush()
+
+
+def _transfer_with_retry(src, dst, mode, preserve, retries, made_dirs, lock):
+    parent = os.path.dirname(dst)
+    if parent and parent not in made_dirs:
+        os.makedirs(parent, exist_ok=True)
+        with lock:
+            made_dirs.add(parent)
+    size = os.path.getsize(src)
+    for attempt in range(retries + 1):
+        try:
+            return transfer_file(src, dst, mode, preserve), size, attempt
+        except OSError as e:
+            if attempt >= retries or not is_transient(e):
+                raise
+            # 指数退避，等待网络恢复
+            time.sleep(0.2 * 2 ** attempt)
+
+
+def transfer_files(pairs, mode='copy', workers=DEFAULT_WORKERS, preserve=False, retries=3,
+                   progress=None, interval=1.0, total=None):
+    '''
+    多线程批量复制/链接/移动文件
+    提交的任务数限制在线程数的若干倍以内，pairs 可以是边遍历目录边生成的迭代器；
+    单个文件失败时记录到 stats.errors，不影响其他文件
+    ·pairs      [(src, dst), ...] 或迭代器，目标目录不存在时自动创建
+    ·mode       TRANSFER_MODES 之一
+    ·workers    线程数
+    ·preserve   复制时是否保留元数据
+    ·retries    临时错误的重试次数
+    ·progress   进度回调 progress(stats)，每隔 interval 秒及结束时调用
+    ·interval   进度回调的最短间隔 (秒)
+    ·total      文件总数，仅用于显示；pairs 为列表时自动获取
+    ·return     TransferStats
+    '''
+    if total is None and hasattr(pairs, '__len__'):
+        total = len(pairs)
+    stats = TransferStats(total)
+    made_dirs = set()
+    lock = threading.Lock()
+    last_report = 0.0
+
+    def collect(futures):
+        nonlocal last_report
+        for future in futures:
+            src, dst = pending.pop(future)
+            try:
+                used, size, attempts = future.result()
+            except Exception as e:
+                stats.errors.append((src, dst, e))
+                continue
+            stats.files += 1
+            stats.bytes += size
+            stats.retries += attempts
+            stats.modes[used] += 1
+        if progress is not None and time.monotonic() - last_report >= interval:
+            last_report = time.monotonic()
+            progress(stats)
+
+    pending = {}
+    limit = max(1, workers) * 4
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+        for src, dst in pairs:
+            if len(pending) >= limit:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                collect(done)
+            future = executor.submit(_transfer_with_retry, src, dst, mode, preserve, retries, made_dirs, lock)
+            pending[future] = (src, dst)
+        collect(list(pending))
+    if progress is not None:
+        progress(stats)
+    return stats
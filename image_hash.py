@@ -0,0 +1,251 @@
+import os
+import sqlite3
+from functools import partial
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+from PIL import Image
+
+
+# 感知哈希方法，均为 64 位
+HASH_METHODS = ('dhash', 'phash')
+# 哈希缓存与图片尺寸缓存放在同一目录，不在图片所在的目录中写入任何文件
+DEFAULT_CACHE_PATH = os.path.join(os.path.expanduser('~'), '.cvtools', 'image_hash_cache.sqlite')
+
+# 图像数少于该值时在当前进程中计算
+PARALLEL_THRESHOLD = 64
+
+# pHash 使用的 32x32 DCT-II 矩阵
+_DCT_SIZE = 32
+_DCT = np.cos(np.pi / _DCT_SIZE * (np.arange(_DCT_SIZE)[None, :] + 0.5) * np.arange(_DCT_SIZE)[:, None])
+
+# 没有 np.bitwise_count (numpy < 2.0) 时按字节查表计算汉明距离
+_POPCOUNT8 = np.array([bin(i).count('1') for i in range(256)], dtype=np.uint8)
+
+
+def _load_gray(path, size):
+    # JPEG 用 draft 在解码时按 1/2、1/4、1/8 缩小，只解码缩略图需要的分辨率
+    with Image.open(path) as image:
+        image.draft('L', (size[0] * 4, size[1] * 4))
+        image = image.convert('L').resize(size, Image.BILINEAR)
+        return np.asarray(image, dtype=np.float32)
+
+
+def _pack_bits(bits):
+    return int(np.packbits(bits.ravel().astype(np.uint8)).view('>u8')[0])
+
+
+def dhash(path):
+    '''
+    差值哈希：缩小为 9x8 的灰度图，比较水平相邻像素
+    ·return     64 位整数
+    '''
+    pixels = _load_gray(path, (9, 8))
+    return _pack_bits(pixels[:, 1:] > pixels[:, :-1])
+
+
+def phash(path):
+    '''
+    感知哈希：32x32 灰度图做 DCT，取左上角 8x8 低频系数与中值比较
+    ·return     64 位整数
+    '''
+    pixels = _load_gray(path, (_DCT_SIZE, _DCT_SIZE))
+    low = (_DCT @ pixels @ _DCT.T)[:8, :8]
+    # 直流分量不参与中值计算
+    return _pack_bits(low > np.median(low.ravel()[1:]))
+
+
+def image_hash(path, method='dhash'):
+    '''
+    计算一张图像的感知哈希，可在进程池中执行
+    ·return     (路径, 64 位整数)，图像无法读取时哈希为 None
+    '''
+    try:
+        return path, (phash if method == 'phash' else dhash)(path)
+    except (OSError, ValueError, Image.DecompressionBombError):
+        return path, None
+
+
+def _open_cache(cache_path):
+    # 缓存目录不可写或数据库损坏时返回 None，不使用缓存
+    try:
+        os.makedirs(os.path.dirname(os.path.abspath(cache_path)), exist_ok=True)
+        conn = sqlite3.connect(cache_path)
+        conn.execute(
+            'CREATE TABLE IF NOT EXISTS image_hash ('
+            'path TEXT, method TEXT, file_size INTEGER, mtime_ns INTEGER, hash TEXT, PRIMARY KEY (path, method))'
+        )
+        return conn
+    except (OSError, sqlite3.Error):
+        return None
+
+
+def _lookup_cache(conn, path, method, signature):
+    try:
+        row = conn.execute(
+            'SELECT hash FROM image_hash WHERE path = ? AND method = ? AND file_size = ? AND mtime_ns = ?',
+            (path, method) + signature
+        ).fetchone()
+    except sqlite3.Error:
+        return None
+    return int(row[0], 16) if row else None
+
+
+def _store_cache(conn, rows):
+    try:
+        with conn:
+            conn.executemany('INSERT OR REPLACE INTO image_hash VALUES (?, ?, ?, ?, ?)', rows)
+    except sqlite3.Error:
+        # 缓存所在的磁盘只读或已满时不缓存
+        pass
+
+
+def compute_hashes(paths, method='dhash', workers=None, cache=True, cache_path=DEFAULT_CACHE_PATH):
+    '''
+    并行计算一组图像的感知哈希
+    缓存以绝对路径、文件大小和修改时间为键，文件没有变化时直接使用缓存
+    ·paths      图像路径列表
+    ·method     HASH_METHODS 之一
+    ·workers    进程数，默认使用全部CPU核心
+    ·cache      是否读写缓存
+    ·cache_path 缓存文件路径，无法写入时不使用缓存
+    ·return     (hashes, valid)：(n,) uint64 数组和 (n,) bool 数组，无法读取的图像 valid 为 False
+    '''
+    if method not in HASH_METHODS:
+        raise ValueError(f"不支持的哈希方法: {method}，可选 {HASH_METHODS}")
+    hashes = np.zeros(len(paths), dtype=np.uint64)
+    valid = np.zeros(len(paths), dtype=bool)
+
+    # 签名为 (大小, 修改时间)
+    conn = _open_cache(cache_path) if cache else None
+    signatures = {}
+    todo = []
+    for i, path in enumerate(paths):
+        try:
+            st = os.stat(path)
+        except OSError:
+            continue
+        signatures[i] = (st.st_size, st.st_mtime_ns)
+        value = None if conn is None else _lookup_cache(conn, os.path.abspath(path), method, signatures[i])
+        if value is not None:
+            hashes[i] = value
+            valid[i] = True
+        else:
+            todo.append(i)
+
+    workers = workers or os.cpu_count() or 1
+    compute = partial(image_hash, method=method)
+    todo_paths = [paths[i] for i in todo]
+    if workers > 1 and len(todo) >= PARALLEL_THRESHOLD:
+        chunksize = max(1, min(256, len(todo) // (workers * 8)))
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            results = list(executor.map(compute, todo_paths, chunksize=chunksize))
+    else:
+        results = [compute(path) for path in todo_paths]
+
+    rows = []
+    for i, (path, value) in zip(todo, results):
+        if value is None:
+            continue
+        hashes[i] = value
+        valid[i] = True
+        rows.append((os.path.abspath(path), method) + signatures[i] + (f'{value:016x}',))
+    if conn is not None:
+        if rows:
+            _store_cache(conn, rows)
+        conn.close()
+    return hashes, valid
+
+
+def popcount64(values):
+    '''
+    uint64 数组每个元素中 1 的个数
+    '''
+    if hasattr(np, 'bitwise_count'):
+        return np.bitwise_count(values)
+    return _POPCOUNT8[np.ascontiguousarray(values).view(np.uint8).reshape(values.shape + (8,))].sum(axis=-1)
+
+
+def hamming(hashes, value):
+    '''
+    hashes 中每个哈希与 value 的汉明距离
+    '''
+    return popcount64(np.bitwise_xor(hashes, np.uint64(value)))
+
+
+class HashIndex:
+    '''
+    感知哈希的半径查询索引，哈希保存在连续的 uint64 数组中，一次向量化计算与候选哈希的汉明距离
+    ·hashes     (n,) uint64 数组
+    ·valid      (n,) bool 数组，为 False 的项不参与查询，可以用 add/remove 修改
+    '''
+
+    def __init__(self, hashes, valid=None):
+        self.hashes = np.ascontiguousarray(hashes, dtype=np.uint64)
+        n = len(self.hashes)
+        self.valid = np.ones(n, dtype=bool) if valid is None else np.asarray(valid, dtype=bool).copy()
+
+    def add(self, indices):
+        self.valid[indices] = True
+
+    def remove(self, indices):
+        self.valid[indices] = False
+
+    def query(self, value, radius, start=0, end=None):
+        '''
+        ·start, end 只查询下标在 [start, end) 内的项
+        ·return     与 value 的汉明距离不超过 radius 的下标数组
+        '''
+        candidates = start + np.flatnonzero(self.valid[start:end])
+        if len(candidates) == 0:
+            return candidates
+        return candidates[hamming(self.hashes[candidates], value) <= radius]
+
+
+def near_duplicate_groups(hashes, radius, valid=None, window=None):
+    '''
+    把近似重复的图像分组
+    按顺序取第一张未分组的图像作为代表，与其距离不超过 radius 的未分组图像归入同一组；
+    组内每张图像都与代表相似，连续帧缓慢变化时不会串成一个大组
+    已分组的图像从索引中移除，只有代表需要查询，计算量与 图像数 x 组数 成正比
+    ·hashes     (n,) uint64 数组
+    ·radius     汉明距离阈值，64 位哈希一般取 4~10
+    ·valid      (n,) bool 数组，无效的图像各自单独成组
+    ·window     只与之后 window 张图像比较 (按帧顺序排列的连续拍摄)，None 时与全部图像比较
+    ·return     (n,) int64 数组，每张图像所在组的代表下标
+    '''
+    index = HashIndex(hashes, valid)
+    n = len(index.hashes)
+    groups = np.full(n, -1, dtype=np.int64)
+    for i in range(n):
+        if groups[i] >= 0:
+            continue
+        groups[i] = i
+        if not index.valid[i]:
+            continue
+        index.remove(i)
+        end = None if window is None else i + 1 + window
+        members = index.query(index.hashes[i], radius, i + 1, end)
+        groups[members] = i
+        index.remove(members)
+    return groups
+
+
+def select_distinct(hashes, radius, valid=None, limit=None):
+    '''
+    按顺序贪心选择互不相似的图像：与已选图像的距离都大于 radius 时才选中
+    ·limit      最多选择的数量
+    ·return     选中的下标列表
+    '''
+    # 索引中只保留已选中的图像
+    index = HashIndex(hashes, np.zeros(len(hashes), dtype=bool))
+    selected = []
+    for i in range(len(index.hashes)):
+        if limit is not None and len(selected) >= limit:
+            break
+        if valid is not None and not valid[i]:
+            continue
+        if len(index.query(index.hashes[i], radius, 0, i)):
+            continue
+        index.add(i)
+        selected.append(i)
+    return selected
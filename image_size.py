@@ -0,0 +1,282 @@
+import os
+import struct
+import sqlite3
+import threading
+import atexit
+
+
+# 默认缓存文件，所有工具共用
+DEFAULT_CACHE_PATH = os.path.join(os.path.expanduser('~'), '.cvtools', 'image_size_cache.sqlite')
+
+# 缓存表名，尺寸的含义变化时 (JPEG 改为按 EXIF 方向的显示尺寸) 换用新表，旧表中的结果不再使用
+_CACHE_TABLE = 'image_size_v2'
+
+# JPEG 中携带图像尺寸的 SOF 标记 (排除 DHT:C4、JPG:C8、DAC:CC)
+_JPEG_SOF_MARKERS = {0xC0, 0xC1, 0xC2, 0xC3, 0xC5, 0xC6, 0xC7, 0xC9, 0xCA, 0xCB, 0xCD, 0xCE, 0xCF}
+
+
+def _exif_orientation(data):
+    # APP1 段中 EXIF 的 Orientation 标记 (0x0112)，只查找 IFD0
+    if data[:6] != b'Exif\x00\x00':
+        return None
+    tiff = data[6:]
+    byte_order = {b'II': '<', b'MM': '>'}.get(tiff[:2])
+    if byte_order is None:
+        return None
+    try:
+        offset = struct.unpack(byte_order + 'I', tiff[4:8])[0]
+        count = struct.unpack(byte_order + 'H', tiff[offset:offset + 2])[0]
+        for i in range(count):
+            entry = tiff[offset + 2 + 12 * i:offset + 14 + 12 * i]
+            tag = struct.unpack(byte_order + 'H', entry[:2])[0]
+            if tag == 0x0112:
+                return struct.unpack(byte_order + 'H', entry[8:10])[0]
+    except struct.error:
+        pass
+    return None
+
+
+def _probe_jpeg(f):
+    f.seek(2)
+    orientation = None
+    while True:
+        byte = f.read(1)
+        if not byte:
+            return None
+        if byte != b'\xff':
+            continue
+        marker = f.read(1)
+        # 跳过填充字节 FF FF ...
+        while marker == b'\xff':
+            marker = f.read(1)
+        if not marker:
+            return None
+        code = marker[0]
+        # 无长度字段的标记：RSTn、TEM、SOI
+        if 0xD0 <= code <= 0xD7 or code in (0x01, 0xD8):
+            continue
+        if code == 0xD9:
+            return None
+        length_bytes = f.read(2)
+        if len(length_bytes) < 2:
+            return None
+        length = struct.unpack('>H', length_bytes)[0]
+        if code in _JPEG_SOF_MARKERS:
+            data = f.read(5)
+            if len(data) < 5:
+                return None
+            height, width = struct.unpack('>xHH', data)
+            # EXIF 方向为 5~8 时图像显示时旋转 90 度，返回显示尺寸 (与 cv2.imread、LabelMe 一致)
+            if orientation in (5, 6, 7, 8):
+                return height, width
+            return width, height
+        if code == 0xE1 and orientation is None:
+            data = f.read(length - 2)
+            orientation = _exif_orientation(data)
+            continue
+        f.seek(length - 2, os.SEEK_CUR)
+
+
+def _probe_png(f):
+    f.seek(16)
+    data = f.read(8)
+    if len(data) < 8:
+        return None
+    return struct.unpack('>II', data)
+
+
+def _probe_gif(f):
+    f.seek(6)
+    data = f.read(4)
+    if len(data) < 4:
+        return None
+    return struct.unpack('<HH', data)
+
+
+def _probe_bmp(f):
+    f.seek(14)
+    data = f.read(12)
+    if len(data) < 12:
+        return None
+    header_size = struct.unpack('<I', data[:4])[0]
+    if header_size == 12:
+        # BITMAPCOREHEADER 使用 16 位宽高
+        width, height = struct.unpack('<HH', data[4:8])
+    else:
+        # BITMAPINFOHEADER 及以后版本，高度为负表示自上而下存储
+        width, height = struct.unpack('<ii', data[4:12])
+    return abs(width), abs(height)
+
+
+def _probe_tiff(f, byte_order):
+    f.seek(2)
+    magic = struct.unpack(byte_order + 'H', f.read(2))[0]
+    if magic == 42:
+        offset = struct.unpack(byte_order + 'I', f.read(4))[0]
+        count_fmt, entry_size, value_fmt = 'H', 12, 'I'
+    elif magic == 43:
+        # BigTIFF
+        f.seek(8)
+        offset = struct.unpack(byte_order + 'Q', f.read(8))[0]
+        count_fmt, entry_size, value_fmt = 'Q', 20, 'Q'
+    else:
+        return None
+
+    f.seek(offset)
+    count = struct.unpack(byte_order + count_fmt, f.read(struct.calcsize(count_fmt)))[0]
+    width = height = None
+    for _ in range(count):
+        entry = f.read(entry_size)
+        if len(entry) < entry_size:
+            break
+        tag, field_type = struct.unpack(byte_order + 'HH', entry[:4])
+        if tag not in (256, 257):
+            continue
+        value_bytes = entry[4 + struct.calcsize(value_fmt):]
+        # SHORT、LONG 或 LONG8 类型，值直接存放在条目中
+        if field_type == 3:
+            value = struct.unpack(byte_order + 'H', value_bytes[:2])[0]
+        elif field_type == 16:
+            value = struct.unpack(byte_order + 'Q', value_bytes[:8])[0]
+        else:
+            value = struct.unpack(byte_order + 'I', value_bytes[:4])[0]
+        if tag == 256:
+            width = value
+        else:
+            height = value
+        if width is not None and height is not None:
+            return width, height
+    return None
+
+
+def probe_image_size(path):
+    '''
+    只解析文件头获取图片尺寸，不解码像素，支持 JPEG/PNG/BMP/TIFF/GIF
+    JPEG 按 EXIF 方向返回显示尺寸，旋转 90 度的照片宽高互换
+    ·path       图片路径
+    ·return     (宽度, 高度)
+    '''
+    with open(path, 'rb') as f:
+        head = f.read(8)
+        size = None
+        if head[:2] == b'\xff\xd8':
+            size = _probe_jpeg(f)
+        elif head == b'\x89PNG\r\n\x1a\n':
+            size = _probe_png(f)
+        elif head[:2] == b'BM':
+            size = _probe_bmp(f)
+        elif head[:2] == b'II':
+            size = _probe_tiff(f, '<')
+        elif head[:2] == b'MM':
+            size = _probe_tiff(f, '>')
+        elif head[:6] in (b'GIF87a', b'GIF89a'):
+            size = _probe_gif(f)
+    if size:
+        return size
+
+    # 不认识的格式或文件头不完整时，交给 PIL 处理 (Image.open 同样只读取文件头)
+    from PIL import Image
+    with Image.open(path) as img:
+        return img.size
+
+
+class ImageSizeCache:
+    '''
+    图片尺寸的磁盘缓存，以路径、文件大小和修改时间为键
+    文件没有变化时直接返回缓存结果，完全跳过文件读取
+    ·cache_path 缓存文件路径，默认所有工具共用同一个缓存文件
+    '''
+
+    def __init__(self, cache_path=DEFAULT_CACHE_PATH, commit_every=500):
+        os.makedirs(os.path.dirname(os.path.abspath(cache_path)), exist_ok=True)
+        self.commit_every = commit_every
+        self._lock = threading.Lock()
+        self._uncommitted = 0
+        self._conn = sqlite3.connect(cache_path, check_same_thread=False)
+        self._conn.execute(
+            f'CREATE TABLE IF NOT EXISTS {_CACHE_TABLE} ('
+            'path TEXT PRIMARY KEY, file_size INTEGER, mtime_ns INTEGER, width INTEGER, height INTEGER)'
+        )
+        self._conn.commit()
+
+    def get(self, path, stat_result=None):
+        '''
+        获取图片尺寸，缓存未命中时解析文件头并写入缓存
+        ·path           图片路径
+        ·stat_result    可选，已有的 os.stat 结果 (例如 os.scandir 返回的)，可省去一次 stat
+        ·return         (宽度, 高度)
+        '''
+        if stat_result is None:
+            stat_result = os.stat(path)
+        size = self.lookup(path, stat_result)
+        if size is None:
+            size = probe_image_size(path)
+            self.store(path, stat_result, size)
+        return size
+
+    def lookup(self, path, stat_result):
+        '''
+        只查询缓存，文件有变化或没有记录时返回 None
+        '''
+        with self._lock:
+            row = self._conn.execute(
+                f'SELECT width, height FROM {_CACHE_TABLE} WHERE path = ? AND file_size = ? AND mtime_ns = ?',
+                (os.path.abspath(path), stat_result.st_size, stat_result.st_mtime_ns)
+            ).fetchone()
+        return (row[0], row[1]) if row else None
+
+    def store(self, path, stat_result, size):
+        '''
+        写入缓存 (例如子进程解析得到的尺寸由主进程统一写入)
+        '''
+        with self._lock:
+            self._conn.execute(
+                f'INSERT OR REPLACE INTO {_CACHE_TABLE} VALUES (?, ?, ?, ?, ?)',
+                (os.path.abspath(path), stat_result.st_size, stat_result.st_mtime_ns, size[0], size[1])
+            )
+            self._uncommitted += 1
+            if self._uncommitted >= self.commit_every:
+                self._conn.commit()
+                self._uncommitted = 0
+
+    def flush(self):
+        with self._lock:
+            if self._uncommitted:
+                self._conn.commit()
+                self._uncommitted = 0
+
+    def close(self):
+        self.flush()
+        self._conn.close()
+
+
+_default_cache = None
+_default_cache_lock = threading.Lock()
+
+
+def get_default_cache():
+    '''
+    获取所有工具共用的默认缓存，缓存文件不可用时返回 None
+    '''
+    global _default_cache
+    with _default_cache_lock:
+        if _default_cache is None:
+            try:
+                _default_cache = ImageSizeCache()
+                atexit.register(_default_cache.flush)
+            except (OSError, sqlite3.Error):
+                _default_cache = False
+    return _default_cache or None
+
+
+def get_image_size(path, stat_result=None):
+    '''
+    获取图片尺寸，优先使用默认磁盘缓存；缓存不可用时直接解析文件头
+    ·path           图片路径
+    ·stat_result    可选，已有的 os.stat 结果
+    ·return         (宽度, 高度)
+    '''
+    cache = get_default_cache()
+    if cache is None:
+        return probe_image_size(path)
+    return cache.get(path, stat_result)
@@ -0,0 +1,128 @@
+import os
+import json
+import time
+import multiprocessing
+
+
+# 检查点文件名，保存在任务的输出目录中
+CHECKPOINT_NAME = '.cvtools_checkpoint.txt'
+
+
+class JobControl:
+    '''
+    长时间任务的取消和暂停控制
+    界面线程调用 cancel/pause/resume；工作线程和进程池中的子进程在处理每个文件前调用 wait，
+    暂停时在 wait 中阻塞，取消后立即返回，不再开始新的文件。可以作为 initargs 传给进程池
+    '''
+
+    def __init__(self):
+        self._cancel = multiprocessing.Event()
+        self._run = multiprocessing.Event()
+        self._run.set()
+
+    def cancel(self):
+        self._cancel.set()
+        # 暂停中取消时唤醒等待的进程
+        self._run.set()
+
+    def pause(self):
+        self._run.clear()
+
+    def resume(self):
+        self._run.set()
+
+    @property
+    def canceled(self):
+        return self._cancel.is_set()
+
+    @property
+    def paused(self):
+        return not self._run.is_set()
+
+    def wait(self):
+        '''
+        暂停时阻塞直到继续或取消
+        ·return     是否已取消
+        '''
+        self._run.wait()
+        return self._cancel.is_set()
+
+
+# 进程中当前任务的控制对象，由各工具的 init_worker 设置
+_worker_control = None
+
+
+def set_worker_control(control):
+    global _worker_control
+    _worker_control = control
+
+
+def worker_canceled():
+    '''
+    子进程处理每个文件前调用：暂停时等待，任务已取消时返回 True
+    '''
+    return _worker_control is not None and _worker_control.wait()
+
+
+class Checkpoint:
+    '''
+    记录已完成的文件，任务中断 (取消、崩溃、断网) 后重新运行时跳过这些文件
+    文件第一行为任务参数 (JSON)，之后每行一个已完成的路径；追加写入，每隔 interval 秒刷新到磁盘
+    ·path       检查点文件路径
+    ·params     任务参数字典，与已有检查点的参数不同时不复用
+    ·resume     是否从已有的检查点继续，否则清空重新记录
+    ·interval   刷新到磁盘的最短间隔 (秒)
+    '''
+
+    def __init__(self, path, params, resume=False, interval=2.0):
+        self.path = path
+        self.interval = interval
+        self.done = self.load(path, params) if resume else set()
+        self._header = json.dumps(params, ensure_ascii=False, sort_keys=True)
+        self._last_flush = time.monotonic()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        if self.done:
+            self._file = open(path, 'a', encoding='utf-8')
+        else:
+            self._file = open(path, 'w', encoding='utf-8')
+            self._file.write(self._header + '\n')
+            self._flush()
+
+    @staticmethod
+    def load(path, params):
+        '''
+        读取已有检查点中已完成的路径
+        ·return     路径集合，检查点不存在或参数不同时为空集合
+        '''
+        header = json.dumps(params, ensure_ascii=False, sort_keys=True)
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                if f.readline().rstrip('\n') != header:
+                    return set()
+                # 最后一行可能在中断时只写了一半，只接受以换行结尾的行
+                return {line[:-1] for line in f if line.endswith('\n')}
+        except (OSError, UnicodeDecodeError):
+            return set()
+
+    def _flush(self):
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._last_flush = time.monotonic()
+
+    def add(self, item):
+        self._file.write(item + '\n')
+        if time.monotonic() - self._last_flush >= self.interval:
+            self._flush()
+
+    def close(self):
+        if not self._file.closed:
+            self._flush()
+            self._file.close()
+
+    def remove(self):
+        '''
+        任务正常完成后删除检查点
+        '''
+        self.close()
+        if os.path.exists(self.path):
+            os.remove(self.path)
@@ -0,0 +1,141 @@
+import os
+import math
+import shutil
+import struct
+import subprocess
+from image_size import _JPEG_SOF_MARKERS
+
+try:
+    # 可选依赖：PyTurboJPEG，在进程内完成无损裁剪，速度最快
+    from turbojpeg import TurboJPEG
+except ImportError:
+    TurboJPEG = None
+
+# 没有 PyTurboJPEG 时使用 libjpeg 自带的 jpegtran 命令行工具
+JPEGTRAN = shutil.which('jpegtran')
+
+# 重新编码时显式指定的编码参数，不依赖 PIL 的默认值
+ENCODE_PARAMS = {
+    'JPEG': {'quality': 95, 'subsampling': 0},
+    'PNG': {'compress_level': 1},
+    'BMP': {},
+    'TIFF': {'compression': 'raw'},
+}
+
+# 各输出格式可以直接保存的像素模式，其余模式先转换为 RGB
+_SAVE_MODES = {
+    'JPEG': ('L', 'RGB', 'CMYK'),
+    'BMP': ('1', 'L', 'P', 'RGB'),
+}
+
+_EXT_FORMATS = {'.jpg': 'JPEG', '.jpeg': 'JPEG', '.png': 'PNG', '.bmp': 'BMP', '.tif': 'TIFF', '.tiff': 'TIFF'}
+
+
+def read_jpeg_layout(data):
+    '''
+    解析 JPEG 的 SOF 段，获取图像尺寸和 MCU 大小
+    ·data       JPEG 文件内容 (bytes)
+    ·return     (宽度, 高度, MCU宽度, MCU高度)，不是 JPEG 或文件头不完整时返回 None
+    '''
+    if data[:2] != b'\xff\xd8':
+        return None
+    pos = 2
+    end = len(data)
+    while pos + 4 <= end:
+        if data[pos] != 0xFF:
+            pos += 1
+            continue
+        code = data[pos + 1]
+        # 填充字节以及无长度字段的标记：RSTn、TEM、SOI
+        if code == 0xFF or 0xD0 <= code <= 0xD7 or code in (0x01, 0xD8):
+            pos += 1 if code == 0xFF else 2
+            continue
+        if code == 0xD9:
+            return None
+        length = struct.unpack_from('>H', data, pos + 2)[0]
+        if code in _JPEG_SOF_MARKERS:
+            if pos + 10 > end:
+                return None
+            height, width, components = struct.unpack_from('>HHB', data, pos + 5)
+            # 单通道图像的 MCU 固定为 8x8，多通道时由最大采样因子决定
+            h_max = v_max = 1
+            if components > 1:
+                for i in range(components):
+                    offset = pos + 10 + i * 3 + 1
+                    if offset >= end:
+                        return None
+                    h_max = max(h_max, data[offset] >> 4)
+                    v_max = max(v_max, data[offset] & 0x0F)
+            return width, height, 8 * h_max, 8 * v_max
+        pos += 2 + length
+    return None
+
+
+def align_box(bbox, width, height, mcu_w, mcu_h):
+    '''
+    把裁剪框向外扩展到 MCU 边界，无损裁剪要求左上角与 MCU 对齐
+    ·bbox       (xmin, ymin, xmax, ymax)，像素坐标
+    ·return     对齐后的整数 (xmin, ymin, xmax, ymax)，右下角超出图像时限制在图像边缘
+    '''
+    x0 = max(0, int(bbox[0]) // mcu_w * mcu_w)
+    y0 = max(0, int(bbox[1]) // mcu_h * mcu_h)
+    x1 = min(width, math.ceil(bbox[2] / mcu_w) * mcu_w)
+    y1 = min(height, math.ceil(bbox[3] / mcu_h) * mcu_h)
+    return x0, y0, x1, y1
+
+
+# 每个进程只加载一次 libturbojpeg
+_turbo = None
+
+
+def lossless_backend():
+    '''
+    当前可用的无损裁剪后端
+    ·return     'turbojpeg'、'jpegtran'，都不可用时返回 None
+    '''
+    global _turbo
+    if TurboJPEG is not None:
+        if _turbo is None:
+            try:
+                _turbo = TurboJPEG()
+            except Exception:
+                _turbo = False
+        if _turbo:
+            return 'turbojpeg'
+    if JPEGTRAN:
+        return 'jpegtran'
+    return None
+
+
+def crop_jpeg(data, box):
+    '''
+    直接从压缩数据中裁剪 JPEG，不解码也不重新编码
+    ·data       JPEG 文件内容 (bytes)
+    ·box        已经按 align_box 对齐的 (xmin, ymin, xmax, ymax)
+    ·return     裁剪后的 JPEG 文件内容，没有可用的后端时返回 None
+    '''
+    backend = lossless_backend()
+    x0, y0, x1, y1 = box
+    if backend == 'turbojpeg':
+        return _turbo.crop(data, x0, y0, x1 - x0, y1 - y0)
+    if backend == 'jpegtran':
+        result = subprocess.run(
+            [JPEGTRAN, '-crop', f'{x1 - x0}x{y1 - y0}+{x0}+{y0}', '-copy', 'none'],
+            input=data, stdout=subprocess.PIPE, stderr=subprocess.PIPE, check=True
+        )
+        return result.stdout
+    return None
+
+
+def save_image(image, output_path):
+    '''
+    按输出文件后缀选择编码器，使用 ENCODE_PARAMS 中的编码参数保存
+    RGBA、P 等 JPEG 不支持的模式先转换为 RGB，避免 .jpg 保存失败
+    ·image          PIL 图像
+    ·output_path    保存路径
+    '''
+    fmt = _EXT_FORMATS.get(os.path.splitext(output_path)[1].lower(), 'PNG')
+    modes = _SAVE_MODES.get(fmt)
+    if modes and image.mode not in modes:
+        image = image.convert('RGB')
+    image.save(output_path, fmt, **ENCODE_PARAMS[fmt])
@@ -0,0 +1,154 @@
+import os
+import argparse
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+from tqdm import tqdm
+from dataset_index import DatasetIndex
+from class_names import load_class_names
+
+try:
+    # 可选依赖：orjson 解析速度比标准库快很多
+    import orjson
+
+    def _load_json(path):
+        with open(path, 'rb') as f:
+            return orjson.loads(f.read())
+except ImportError:
+    import json
+
+    def _load_json(path):
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+
+
+# 参与导出的形状类型，其余类型 (point、line 等) 没有有效的边界框
+SHAPE_TYPES = ('rectangle', 'polygon')
+
+
+def make_parser():
+    parser = argparse.ArgumentParser("json2txt")
+    parser.add_argument("--json_dir",  default=r"F:\Image\车号\华兴\json\json标签", help="LabelMe json标签路径")
+    parser.add_argument("--classes",   default=r"labels.txt", help="类别文件：labels.txt 或带 names 的 yaml")
+    parser.add_argument("--save_dir",  default=r"F:\Image\车号\华兴\txt", help="txt标签保存路径")
+    parser.add_argument("--workers",   default=None, type=int, help="进程数，默认使用全部CPU核心")
+    return parser
+
+
+# 子进程中共享的导出参数，由 init_worker 设置
+_class_map = {}
+_save_dir = ''
+
+
+def init_worker(class_map, save_dir):
+    global _class_map, _save_dir
+    _class_map = class_map
+    _save_dir = save_dir
+
+
+def convert_json_file(json_path):
+    '''
+    把一个 LabelMe json 标签转换为 YOLO txt，可在进程池中执行
+    图片尺寸取自 imageWidth/imageHeight，不读取图片；矩形和多边形都导出为外接矩形
+    ·json_path  json文件路径
+    ·return     (json文件路径, 框数量, 未知类别计数, 错误信息)，成功时错误信息为 None
+    '''
+    unknown = Counter()
+    try:
+        data = _load_json(json_path)
+        img_w = float(data['imageWidth'])
+        img_h = float(data['imageHeight'])
+
+        ids = []
+        points = []
+        lengths = []
+        for shape in data.get('shapes', []):
+            if shape.get('shape_type', 'polygon') not in SHAPE_TYPES or not shape.get('points'):
+                continue
+            class_id = _class_map.get(str(shape.get('label')))
+            if class_id is None:
+                unknown[str(shape.get('label'))] += 1
+                continue
+            ids.append(class_id)
+            points.extend(shape['points'])
+            lengths.append(len(shape['points']))
+
+        lines = ''
+        if ids:
+            # 所有形状的点拼接成一个数组，按形状分段求外接矩形
+            pts = np.asarray(points, dtype=np.float64).reshape(-1, 2)
+            starts = np.concatenate(([0], np.cumsum(lengths)[:-1]))
+            mins = np.minimum.reduceat(pts, starts, axis=0)
+            maxs = np.maximum.reduceat(pts, starts, axis=0)
+            size = np.array([img_w, img_h])
+            mins = np.clip(mins, 0, size)
+            maxs = np.clip(maxs, 0, size)
+
+            wh = maxs - mins
+            valid = (wh[:, 0] > 0) & (wh[:, 1] > 0)
+            center = (mins + maxs) / 2 / size
+            wh = wh / size
+            rows = np.column_stack([center, wh])[valid]
+            ids = np.asarray(ids)[valid]
+            lines = ''.join('%d %.6f %.6f %.6f %.6f\n' % (c, *r) for c, r in zip(ids.tolist(), rows.tolist()))
+            count = len(ids)
+        else:
+            count = 0
+
+        txt_name = os.path.splitext(os.path.basename(json_path))[0] + '.txt'
+        with open(os.path.join(_save_dir, txt_name), 'w') as f:
+            f.write(lines)
+    except Exception as e:
+        return json_path, 0, unknown, str(e)
+    return json_path, count, unknown, None
+
+
+def Json2Txt(json_dir, classes, save_dir, workers=None):
+    '''
+    LabelMe json标签批量转换为 YOLO txt标签
+    ·json_dir: json标签路径
+    ·classes: 类别文件 (labels.txt 或 yaml)
+    ·save_dir: 保存路径
+    ·workers: 进程数，默认使用全部CPU核心
+    '''
+    os.makedirs(save_dir, exist_ok=True)
+    class_map = load_class_names(classes)
+    json_files = DatasetIndex(json_dir, image_extensions=(), label_extensions=['.json']).label_files('.json')
+    workers = workers or os.cpu_count() or 1
+
+    total_boxes = 0
+    unknown = Counter()
+    errors = []
+    if workers > 1 and len(json_files) > 1:
+        executor = ProcessPoolExecutor(max_workers=workers, initializer=init_worker, initargs=(class_map, save_dir))
+        chunksize = max(1, min(256, len(json_files) // (workers * 8)))
+        results = executor.map(convert_json_file, json_files, chunksize=chunksize)
+    else:
+        executor = None
+        init_worker(class_map, save_dir)
+        results = map(convert_json_file, json_files)
+
+    try:
+        for json_path, count, file_unknown, error in tqdm(results, total=len(json_files)):
+            total_boxes += count
+            unknown.update(file_unknown)
+            if error:
+                errors.append((json_path, error))
+    finally:
+        if executor:
+            executor.shutdown()
+
+    print(f"转换完成：{len(json_files) - len(errors)} 个文件，{total_boxes} 个目标")
+    if unknown:
+        print("以下类别不在类别文件中，已跳过：")
+        for name, count in unknown.most_common():
+            print(f"  {name}: {count}")
+    if errors:
+        print(f"{len(errors)} 个文件转换失败：")
+        for json_path, error in errors[:20]:
+            print(f"  {json_path} - {error}")
+
+
+if __name__ == '__main__':
+    args = make_parser().parse_args()
+    Json2Txt(args.json_dir, args.classes, args.save_dir, args.workers)
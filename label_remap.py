@@ -0,0 +1,234 @@
+import os
+import numpy as np
+from job_control import set_worker_control, worker_canceled
+from class_names import load_class_names
+
+
+# 删除类别的目标id
+DROP = -1
+# 查找表的最大长度
+_MAX_LUT = 1 << 16
+
+
+class ClassMap:
+    '''
+    YOLO 类别id映射表，支持任意 id→id 映射、删除类别、合并类别和区间平移
+    查询时按需生成查找表，整个标签文件的类别列一次查表完成
+    优先级：单个id的映射 > 区间规则 > 默认 (保留原id，或 drop_unmapped 时删除)
+    ·mapping        {旧id: 新id}，新id为 DROP 表示删除
+    ·ranges         [(起始id, 结束id或 None 表示不限, ('shift', 偏移) 或 ('set', 新id))]
+    ·drop_unmapped  未匹配任何规则的类别是否删除
+    '''
+
+    def __init__(self, mapping=None, ranges=None, drop_unmapped=False):
+        self.mapping = dict(mapping or {})
+        self.ranges = list(ranges or [])
+        self.drop_unmapped = drop_unmapped
+        self._lut = np.zeros(0, dtype=np.int64)
+
+    @classmethod
+    def parse(cls, text):
+        '''
+        解析映射规则，每行一条，# 之后为注释：
+            3 -> 5          类别 3 改为 5
+            4,6,7 -> 4      合并为类别 4
+            10 -> drop      删除类别 10
+            15~ -> shift -1 15 及以上的类别 id 减 1，平移量必须带 +/- 号
+            20~29 -> 20     区间合并为类别 20
+            * -> drop       其余类别全部删除
+        删除只能写 drop，负数目标 (例如 10 -> -1) 有歧义，报错
+        ·return     ClassMap
+        '''
+        mapping = {}
+        ranges = []
+        drop_unmapped = False
+        for number, line in enumerate(text.splitlines(), 1):
+            line = line.split('#', 1)[0].strip()
+            if not line:
+                continue
+            if '->' not in line:
+                raise ValueError(f"第 {number} 行缺少 '->': {line}")
+            source, target = (part.strip() for part in line.split('->', 1))
+            try:
+                if source == '*':
+                    if target.lower() != 'drop':
+                        raise ValueError("'*' 只能删除")
+                    drop_unmapped = True
+                elif '~' in source:
+                    start, end = source.split('~', 1)
+                    end = int(end) if end.strip() else None
+                    if target.lower().startswith('shift'):
+                        offset = target[len('shift'):].strip()
+                        if not offset or offset[0] not in '+-':
+                            raise ValueError("平移量必须带 +/- 号，例如 shift -1")
+                        action = ('shift', int(offset))
+                    else:
+                        action = ('set', _parse_target(target))
+                    ranges.append((int(start), end, action))
+                else:
+                    new_id = _parse_target(target)
+                    for old_id in source.split(','):
+                        mapping[int(old_id)] = new_id
+            except ValueError as e:
+                raise ValueError(f"第 {number} 行无法解析: {line} ({e})")
+        return cls(mapping, ranges, drop_unmapped)
+
+    @classmethod
+    def from_vocabularies(cls, old_path, new_path):
+        '''
+        按类别名称对照新旧两个类别文件 (labels.txt 或 yaml) 生成映射，新文件中没有的类别删除
+        '''
+        old_names = load_class_names(old_path)
+        new_names = load_class_names(new_path)
+        mapping = {old_id: new_names.get(name, DROP) for name, old_id in old_names.items()}
+        return cls(mapping)
+
+    def to_rules(self):
+        '''
+        转换为 parse 可以读取的规则文本，只列出有变化的类别
+        '''
+        lines = [f"{old_id} -> {'drop' if new_id == DROP else new_id}"
+                 for old_id, new_id in sorted(self.mapping.items()) if old_id != new_id]
+        for start, end, (kind, value) in self.ranges:
+            source = f"{start}~{'' if end is None else end}"
+            if kind == 'shift':
+                lines.append(f"{source} -> shift {value:+d}")
+            else:
+                lines.append(f"{source} -> {'drop' if value == DROP else value}")
+        if self.drop_unmapped:
+            lines.append("* -> drop")
+        return '\n'.join(lines)
+
+    def _map_one(self, class_id):
+        if class_id in self.mapping:
+            return self.mapping[class_id]
+        for start, end, (kind, value) in self.ranges:
+            if class_id >= start and (end is None or class_id <= end):
+                if kind == 'set':
+                    return value
+                new_id = class_id + value
+                return new_id if new_id >= 0 else DROP
+        return DROP if self.drop_unmapped else class_id
+
+    def lookup(self, ids):
+        '''
+        ·ids        非负整数数组
+        ·return     新id数组，DROP 表示删除
+        '''
+        ids = np.asarray(ids, dtype=np.int64)
+        if len(ids) and ids.max() >= _MAX_LUT:
+            # 异常大的id不建表，逐个映射
+            return np.array([self._map_one(int(i)) for i in ids], dtype=np.int64)
+        if len(ids) and ids.max() >= len(self._lut):
+            # 查找表不够时扩展到至少两倍，避免反复重建
+            size = max(int(ids.max()) + 1, 2 * len(self._lut), 64)
+            self._lut = np.array([self._map_one(i) for i in range(size)], dtype=np.int64)
+        return self._lut[ids]
+
+
+def _parse_target(target):
+    # 目标为 drop 或非负的类别id，带符号的数字容易与平移混淆，不接受
+    if target.lower() == 'drop':
+        return DROP
+    if not target.isdigit():
+        raise ValueError("目标必须是非负的类别id或 drop，区间平移写作 shift +k/-k")
+    return int(target)
+
+
+def remap_text(text, class_map):
+    '''
+    按映射表修改 YOLO 标签内容，坐标保持原样，类别无法解析的行保留
+    ·return     (新内容, 修改的目标数, 删除的目标数)，没有任何变化时新内容为 None
+    '''
+    lines = text.splitlines()
+    parts = [line.split(None, 1) for line in lines]
+    rows = [i for i, p in enumerate(parts) if p]
+    if not rows:
+        return None, 0, 0
+
+    # 类别列一次转换为数组，无法解析的行为 nan
+    heads = [parts[i][0] for i in rows]
+    try:
+        values = np.array(heads, dtype=np.float64)
+    except ValueError:
+        values = np.array([_to_float(head) for head in heads], dtype=np.float64)
+    valid = np.isfinite(values) & (values >= 0) & (values == np.floor(values))
+    ids = np.where(valid, values, 0).astype(np.int64)
+    new_ids = np.where(valid, class_map.lookup(ids), ids)
+    dropped = valid & (new_ids == DROP)
+    changed = valid & ~dropped & (new_ids != ids)
+    if not dropped.any() and not changed.any():
+        return None, 0, 0
+
+    output = []
+    for k, i in enumerate(rows):
+        if dropped[k]:
+            continue
+        if changed[k]:
+            rest = parts[i][1] if len(parts[i]) > 1 else ''
+            output.append(f"{new_ids[k]} {rest}".rstrip())
+        else:
+            output.append(lines[i].rstrip())
+    new_text = '\n'.join(output) + '\n' if output else ''
+    return new_text, int(changed.sum()), int(dropped.sum())
+
+
+def _to_float(value):
+    try:
+        return float(value)
+    except ValueError:
+        return np.nan
+
+
+def _read_text(path):
+    try:
+        with open(path, 'r') as f:
+            return f.read()
+    except FileNotFoundError:
+        return None
+
+
+def _write_atomic(path, text):
+    # 先写临时文件再替换，中断时不会留下写了一半的标签
+    with open(path + '.part', 'w') as f:
+        f.write(text)
+    os.replace(path + '.part', path)
+
+
+# 子进程中共享的映射表，由 init_worker 设置
+_class_map = None
+
+
+def init_worker(class_map, control=None):
+    '''
+    设置映射表
+    ·class_map  ClassMap
+    ·control    JobControl，用于暂停和取消，None 表示不控制
+    '''
+    global _class_map
+    _class_map = class_map
+    set_worker_control(control)
+
+
+def remap_file(task):
+    '''
+    修改一个标签文件，可在进程池中执行；目标文件内容已经与结果相同时不写入
+    ·task       (输入路径, 输出路径)，两者相同时原地修改
+    ·return     (输入路径, 是否写入, 修改的目标数, 删除的目标数, 错误信息或 None)
+    '''
+    input_path, output_path = task
+    if worker_canceled():
+        return input_path, False, 0, 0, None
+    try:
+        text = _read_text(input_path)
+        if text is None:
+            return input_path, False, 0, 0, "文件不存在"
+        new_text, changed, dropped = remap_text(text, _class_map)
+        result = text if new_text is None else new_text
+        same_file = os.path.normcase(os.path.abspath(input_path)) == os.path.normcase(os.path.abspath(output_path))
+        if (new_text is None and same_file) or (not same_file and _read_text(output_path) == result):
+            return input_path, False, changed, dropped, None
+        _write_atomic(output_path, result)
+        return input_path, True, changed, dropped, None
+    except (OSError, UnicodeDecodeError) as e:
+        return input_path, False, 0, 0, str(e)
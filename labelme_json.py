@@ -0,0 +1,67 @@
+import json
+
+try:
+    # 可选依赖：orjson 序列化速度比标准库快很多
+    import orjson
+except ImportError:
+    orjson = None
+
+
+# 紧凑模式下，值等于默认值时可以省略的形状字段 (LabelMe / X-AnyLabeling 读取时都有默认值)
+_SHAPE_DEFAULTS = {
+    "kie_linking": [],
+    "group_id": None,
+    "description": None,
+    "difficult": False,
+    "flags": {},
+    "attributes": {},
+}
+
+
+def compact_shape(shape):
+    '''
+    去掉值为默认值的形状字段，label、points、shape_type 始终保留
+    ·shape      LabelMe 形状字典
+    ·return     新的形状字典
+    '''
+    return {k: v for k, v in shape.items()
+            if not (k in _SHAPE_DEFAULTS and (v == _SHAPE_DEFAULTS[k] or v == ""))}
+
+
+def compact_labelme(data):
+    '''
+    紧凑化整个 LabelMe 数据：去掉形状中的默认字段和空的顶层 description，
+    imagePath、imageData、imageHeight、imageWidth 等 LabelMe 必需字段保持不变
+    '''
+    result = {k: v for k, v in data.items() if not (k == "description" and not v)}
+    result["shapes"] = [compact_shape(s) for s in data.get("shapes", [])]
+    return result
+
+
+def dumps_labelme(data, compact=False, indent=2):
+    '''
+    序列化 LabelMe 数据
+    ·data       LabelMe 字典
+    ·compact    紧凑模式：去掉默认字段、不缩进、中文不转义，有 orjson 时使用 orjson
+    ·indent     非紧凑模式下的缩进
+    ·return     UTF-8 编码的 bytes
+    '''
+    if not compact:
+        return json.dumps(data, indent=indent).encode('utf-8')
+    data = compact_labelme(data)
+    if orjson is not None:
+        return orjson.dumps(data)
+    return json.dumps(data, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+
+def write_labelme(data, json_path, compact=False, indent=2):
+    '''
+    写入 LabelMe JSON 文件，先在内存中序列化再一次性写入
+    ·data       LabelMe 字典
+    ·json_path  保存路径
+    ·compact    是否使用紧凑模式，见 dumps_labelme
+    ·indent     非紧凑模式下的缩进
+    '''
+    content = dumps_labelme(data, compact, indent)
+    with open(json_path, 'wb') as f:
+        f.write(content)
@@ -0,0 +1,155 @@
+import math
+from PIL import Image
+
+try:
+    # PIL 11 以后 tile 为命名元组，旧版本为普通元组
+    from PIL.ImageFile import _Tile
+except ImportError:
+    def _Tile(*args):
+        return tuple(args)
+
+try:
+    # 可选依赖：tifffile + zarr，按块读取压缩的分块/分条 TIFF (PIL 只能整图解码压缩的 TIFF)
+    import tifffile
+    import zarr
+except ImportError:
+    tifffile = zarr = None
+
+
+# 支持按区域读取的格式，其余格式整图解码
+REGION_FORMATS = ('TIFF', 'BMP')
+# 像素数达到该值时才按区域读取，小图整图解码更快
+REGION_MIN_PIXELS = 4096 * 4096
+
+# TIFF 标签：每个样本的位数、平面配置
+_TIFF_BITS_PER_SAMPLE = 258
+_TIFF_PLANAR_CONFIGURATION = 284
+
+
+class RegionReader:
+    '''
+    只解码与裁剪框相交的部分，用于从超大图像中裁剪少量小目标
+    未压缩的 TIFF (分条/分块) 和 BMP 只读取相交的条带、块或行；压缩的 TIFF 在安装了 tifffile 和 zarr 时按块读取；
+    其他情况退回整图解码，且整图只解码一次
+    ·path       图像路径
+    '''
+
+    def __init__(self, path):
+        self.path = path
+        self.image = Image.open(path)
+        self.size = self.image.size
+        self.mode = None
+        self._tiles = None
+        self._array = None
+        self._store = None
+        if self.image.format in REGION_FORMATS and self.image.tile and \
+                all(tile[0] == 'raw' for tile in self.image.tile):
+            self.mode = 'raw'
+            self._tiles = [self._with_stride(tile) for tile in self.image.tile]
+        elif self.image.format == 'TIFF' and tifffile is not None:
+            try:
+                self._store = tifffile.imread(path, aszarr=True)
+                array = zarr.open(self._store, mode='r')
+                # 多分辨率的 TIFF 打开后是一个组，第 0 层为原始分辨率
+                self._array = array if hasattr(array, 'shape') else array[0]
+                self.mode = 'tifffile'
+            except Exception:
+                self._close_store()
+
+    def _with_stride(self, tile):
+        # TIFF 的原始数据块不记录行字节数 (为 0)，按每像素位数补上，才能只读取相交的行
+        codec, extents, offset, args = tile
+        if not isinstance(args, tuple) or len(args) != 3 or args[1]:
+            return tile
+        tags = getattr(self.image, 'tag_v2', {})
+        bits = tags.get(_TIFF_BITS_PER_SAMPLE, 1)
+        if not bits or tags.get(_TIFF_PLANAR_CONFIGURATION, 1) != 1:
+            return tile
+        bits = bits if isinstance(bits, tuple) else (bits,)
+        stride = math.ceil((extents[2] - extents[0]) * sum(bits) / 8)
+        return _Tile(codec, extents, offset, (args[0], stride, args[2]))
+
+    def crop(self, box):
+        '''
+        裁剪一个区域
+        ·box        (xmin, ymin, xmax, ymax)，像素坐标
+        ·return     PIL 图像
+        '''
+        # 与 Image.crop 相同，坐标四舍五入取整
+        width, height = self.size
+        x0, y0, x1, y1 = (int(round(v)) for v in box)
+        x0, y0 = max(0, x0), max(0, y0)
+        x1, y1 = min(width, x1), min(height, y1)
+        if x1 <= x0 or y1 <= y0:
+            raise ValueError(f"裁剪区域为空: {box}")
+
+        if self.mode == 'raw':
+            return self._crop_tiles(x0, y0, x1, y1)
+        if self.mode == 'tifffile':
+            return Image.fromarray(self._array[y0:y1, x0:x1])
+        # 整图解码
+        self.image.load()
+        return self.image.crop((x0, y0, x1, y1))
+
+    def _crop_tiles(self, x0, y0, x1, y1):
+        tiles = []
+        for codec, (tx0, ty0, tx1, ty1), offset, args in self._tiles:
+            if tx1 <= x0 or tx0 >= x1 or ty1 <= y0 or ty0 >= y1:
+                continue
+            # 已知行字节数时只读取与裁剪框相交的行，例如整张 BMP 或单条带的 TIFF
+            if isinstance(args, tuple) and len(args) == 3 and args[1]:
+                stride, ystep = args[1], args[2]
+                ry0, ry1 = max(ty0, y0), min(ty1, y1)
+                # ystep 为 -1 时数据从最后一行开始存储 (BMP)
+                skip = ry0 - ty0 if ystep > 0 else ty1 - ry1
+                offset += skip * stride
+                ty0, ty1 = ry0, ry1
+            tiles.append((codec, (tx0, ty0, tx1, ty1), offset, args))
+
+        ux0 = min(tile[1][0] for tile in tiles)
+        uy0 = min(tile[1][1] for tile in tiles)
+        ux1 = max(tile[1][2] for tile in tiles)
+        uy1 = max(tile[1][3] for tile in tiles)
+
+        # 重新打开文件 (只读取文件头)，把图像尺寸改为相交块的外接矩形，只解码这些块
+        region = Image.open(self.path)
+        region._size = (ux1 - ux0, uy1 - uy0)
+        region.tile = [
+            _Tile(codec, (tx0 - ux0, ty0 - uy0, tx1 - ux0, ty1 - uy0), offset, args)
+            for codec, (tx0, ty0, tx1, ty1), offset, args in tiles
+        ]
+        with region:
+            region.load()
+            return region.crop((x0 - ux0, y0 - uy0, x1 - ux0, y1 - uy0))
+
+    def _close_store(self):
+        if self._store is not None:
+            self._store.close()
+        self._store = None
+        self._array = None
+
+    def close(self):
+        self._close_store()
+        self.image.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+def open_region_reader(path, min_pixels=REGION_MIN_PIXELS):
+    '''
+    图像足够大且支持按区域读取时返回 RegionReader，否则返回 None (调用方整图解码)
+    ·path       图像路径
+    ·min_pixels 最小像素数
+    '''
+    with Image.open(path) as image:
+        if image.format not in REGION_FORMATS or image.width * image.height < min_pixels:
+            return None
+    reader = RegionReader(path)
+    if reader.mode is None:
+        reader.close()
+        return None
+    return reader
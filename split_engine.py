@@ -0,0 +1,194 @@
+import os
+import hashlib
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+from yolo_label import read_yolo_labels, class_ids
+
+
+# 划分名称，划分结果数组中的值为这里的下标
+SPLIT_NAMES = ('train', 'val', 'test')
+
+
+def split_counts(n, ratios):
+    '''
+    按比例计算每个划分的样本数，val、test 四舍五入，其余全部归入 train
+    ·n          样本数
+    ·ratios     (train, val, test) 比例
+    ·return     每个划分的样本数
+    '''
+    ratios = np.asarray(ratios, dtype=np.float64)
+    ratios = ratios / ratios.sum()
+    counts = np.round(ratios * n).astype(np.int64)
+    counts[0] = n - counts[1:].sum()
+    return counts
+
+
+def random_split(n, ratios, seed=0):
+    '''
+    随机划分，相同的 seed 得到相同的结果
+    ·n          样本数
+    ·ratios     (train, val, test) 比例
+    ·seed       随机种子
+    ·return     (n,) int8 数组，第 i 个样本所属的划分 (SPLIT_NAMES 的下标)
+    '''
+    counts = split_counts(n, ratios)
+    assignment = np.repeat(np.arange(len(counts), dtype=np.int8), counts)
+    return assignment[np.random.default_rng(seed).permutation(n)]
+
+
+def group_split(groups, ratios, seed=0):
+    '''
+    按组随机划分，同一组的样本 (例如近似重复的连续帧) 分到同一个划分
+    ·groups     (n,) 数组，第 i 个样本所在组的编号
+    ·ratios     (train, val, test) 比例
+    ·seed       随机种子
+    ·return     (n,) int8 数组，第 i 个样本所属的划分 (SPLIT_NAMES 的下标)
+    '''
+    keys, inverse, sizes = np.unique(np.asarray(groups), return_inverse=True, return_counts=True)
+    order = np.random.default_rng(seed).permutation(len(keys))
+    # 按打乱后的顺序累计样本数，组的起点落在哪个划分的区间就分到哪个划分
+    starts = np.cumsum(sizes[order]) - sizes[order]
+    bounds = np.cumsum(split_counts(len(inverse), ratios))[:-1]
+    group_assignment = np.empty(len(keys), dtype=np.int8)
+    group_assignment[order] = np.searchsorted(bounds, starts, side='right')
+    return group_assignment[inverse]
+
+
+def hash_split(keys, ratios, seed=0):
+    '''
+    按 key (文件名) 的哈希值划分，与样本数量和顺序无关，新增样本不会改变已有样本的划分
+    ·keys       样本 key 列表
+    ·ratios     (train, val, test) 比例
+    ·seed       哈希盐值，修改后得到另一种划分
+    ·return     (n,) int8 数组，第 i 个样本所属的划分 (SPLIT_NAMES 的下标)
+    '''
+    ratios = np.asarray(ratios, dtype=np.float64)
+    bounds = np.cumsum(ratios / ratios.sum())[:-1]
+    salt = f"{seed}:".encode('utf-8')
+    values = np.fromiter((int.from_bytes(hashlib.blake2b(salt + key.encode('utf-8'), digest_size=8).digest(), 'little')
+                          for key in keys), dtype=np.uint64, count=len(keys))
+    # 取高 53 位映射到 [0, 1)，float64 可以精确表示
+    return np.searchsorted(bounds, (values >> np.uint64(11)) / float(1 << 53), side='right').astype(np.int8)
+
+
+def incremental_group_split(keys, groups, previous, ratios, seed=0):
+    '''
+    增量的按组划分：新增样本可能改变组的代表或使两组合并，不能只按代表的 key 哈希
+    已划分过的样本保持上次的划分；新样本跟随组内 (按顺序) 第一个已有样本的划分；
+    整组都是新样本时按组代表的 key 哈希
+    ·keys       样本 key 列表
+    ·groups     (n,) 数组，每个样本所在组的代表下标
+    ·previous   {key: 上次的划分下标}
+    ·ratios     (train, val, test) 比例
+    ·seed       哈希盐值
+    ·return     (n,) int8 数组，第 i 个样本所属的划分 (SPLIT_NAMES 的下标)
+    '''
+    groups = np.asarray(groups).tolist()
+    assignment = hash_split([keys[g] for g in groups], ratios, seed)
+    pinned = {}
+    for i, g in enumerate(groups):
+        split = previous.get(keys[i])
+        if split is not None:
+            assignment[i] = split
+            pinned.setdefault(g, split)
+    for i, g in enumerate(groups):
+        if keys[i] not in previous and g in pinned:
+            assignment[i] = pinned[g]
+    return assignment
+
+
+def read_class_histogram(label_path):
+    '''
+    读取一个 YOLO txt 标签中各类别的目标数，可在进程池中执行
+    ·label_path 标签文件路径
+    ·return     (类别数组, 数量数组)，读取失败时两个数组都为空
+    '''
+    try:
+        ids = class_ids(read_yolo_labels(label_path))
+    except (OSError, ValueError):
+        ids = np.zeros(0, dtype=np.int64)
+    return np.unique(ids[ids >= 0], return_counts=True)
+
+
+def class_histograms(label_paths, workers=None):
+    '''
+    并行读取所有标签的类别直方图
+    ·label_paths    标签文件路径列表
+    ·workers        进程数，默认使用全部CPU核心
+    ·return         与 label_paths 对应的 [(类别数组, 数量数组), ...]
+    '''
+    workers = workers or os.cpu_count() or 1
+    if workers > 1 and len(label_paths) >= 1000:
+        chunksize = max(1, min(1024, len(label_paths) // (workers * 8)))
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            return list(executor.map(read_class_histogram, label_paths, chunksize=chunksize))
+    return [read_class_histogram(path) for path in label_paths]
+
+
+def stratified_split(histograms, ratios, seed=0):
+    '''
+    按类别分层划分 (迭代分层)，一张图片可以包含多个类别
+    先处理包含稀有类别的图片，每张图片分到对其最稀有类别仍有需求最多的划分；
+    出现在足够多图片中的类别保证在每个比例大于 0 的划分中至少出现一次，稀有字符也能进入验证集
+    ·histograms     class_histograms 的结果
+    ·ratios         (train, val, test) 比例
+    ·seed           随机种子，相同的输入和 seed 得到相同的结果
+    ·return         (n,) int8 数组，第 i 个样本所属的划分 (SPLIT_NAMES 的下标)
+    '''
+    n = len(histograms)
+    ratios = np.asarray(ratios, dtype=np.float64)
+    ratios = ratios / ratios.sum()
+    active = ratios > 0
+    rng = np.random.default_rng(seed)
+    if n == 0:
+        return np.zeros(0, dtype=np.int8)
+
+    # 每个类别出现在多少张图片中
+    num_classes = 1 + max((int(classes.max()) for classes, _ in histograms if len(classes)), default=-1)
+    presence = np.zeros(num_classes, dtype=np.int64)
+    for classes, _ in histograms:
+        presence[classes] += 1
+
+    # 每个划分对每个类别的需求 (图片数)，样本足够时非 train 划分至少需要 1 张
+    need = np.outer(ratios, presence)
+    enough = presence >= active.sum()
+    for s in range(1, len(ratios)):
+        if active[s]:
+            need[s, enough] = np.maximum(need[s, enough], 1)
+    need[0] = presence - need[1:].sum(axis=0)
+    total_need = split_counts(n, ratios).astype(np.float64)
+
+    # 先随机打乱，再按最稀有类别的出现次数稳定排序，相同稀有度的图片顺序由 seed 决定
+    order = rng.permutation(n)
+    rarest = np.array([presence[histograms[i][0]].min() if len(histograms[i][0]) else np.iinfo(np.int64).max
+                       for i in order])
+    order = order[np.argsort(rarest, kind='stable')]
+
+    assignment = np.zeros(n, dtype=np.int8)
+    for i in order:
+        classes = histograms[i][0]
+        if len(classes):
+            rare = classes[np.argmin(presence[classes])]
+            score = np.where(active, need[:, rare], -np.inf)
+        else:
+            # 没有目标的图片只按总数分配
+            score = np.where(active, total_need, -np.inf)
+        # 需求相同时选总需求更多的划分
+        candidates = np.flatnonzero(score == score.max())
+        s = candidates[np.argmax(total_need[candidates])]
+        assignment[i] = s
+        need[s, classes] -= 1
+        total_need[s] -= 1
+    return assignment
+
+
+def split_class_counts(histograms, assignment, num_splits=len(SPLIT_NAMES)):
+    '''
+    统计每个划分中各类别的目标数
+    ·return     (划分数, 类别数) int64 数组
+    '''
+    num_classes = 1 + max((int(classes.max()) for classes, _ in histograms if len(classes)), default=-1)
+    counts = np.zeros((num_splits, max(num_classes, 0)), dtype=np.int64)
+    for (classes, numbers), s in zip(histograms, assignment.tolist()):
+        counts[s, classes] += numbers
+    return counts
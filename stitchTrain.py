@@ -1,21 +1,499 @@
 import os
+import time
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
 from PIL import Image
 import re # 用于正则表达式解析文件名
 
-def stitch_images_in_folder(folder_path, output_size=(1200, 800)):
+
+def get_resample_filter():
+    try: # 兼容 Pillow 不同版本
+        return Image.Resampling.LANCZOS
+    except AttributeError:
+        return Image.LANCZOS
+
+
+# 定义正则表达式来解析文件名并提取编号
+# 例如：105-000-x.jpg -> 提取 ("105", "000", "x")
+# 我们主要关心中间的数字编号 "000" 用于排序和命名输出文件
+# 这里的 (.*) 表示文件名中第二個连字符后的任意字符
+FILENAME_PATTERN = re.compile(r"([^-]+)-(\d+)-(.*)\.jpg", re.IGNORECASE)
+
+
+def parse_image_filename(folder_path, filename):
+    """
+    解析 'prefix-NNN-suffix.jpg' 格式的文件名。
+
+    返回:
+    dict: 图片信息；文件名不符合格式时返回 None。
+    """
+    match = FILENAME_PATTERN.match(filename)
+    if not match:
+        return None
+    prefix = match.group(1)      # 例如 "105"
+    id_str = match.group(2)      # 例如 "000"
+    suffix_part = match.group(3) # 例如 "x" 或其他字符
+    id_num = int(id_str)         # 将编号转为整数，方便排序
+
+    return {
+        'filename': filename,
+        'path': os.path.join(folder_path, filename),
+        'id_num': id_num,
+        'id_str': id_str, # 保留字符串形式的ID用于命名
+        'prefix': prefix,
+        'suffix': suffix_part
+    }
+
+
+class FrameCache:
+    """
+    滑动窗口帧缓存：保存最近使用的若干张已解码、已缩放为一半的图片。
+
+    每张图片会出现在连续三个窗口 (i, i+1, i+2) 中，缓存随窗口向前移动，
+    保证每个 JPEG 只解码和缩放一次。读取失败的图片也会被记录，
+    后续窗口直接复用该错误，不再重复尝试解码。
+
+    参数:
+    parsed_files (list): 已排序的图片信息列表 (包含 'path')。
+    resample_filter: 缩放使用的重采样算法。
+    capacity (int): 最多缓存的图片数量，默认等于窗口大小 3。
+    """
+
+    def __init__(self, parsed_files, resample_filter, capacity=3):
+        self.parsed_files = parsed_files
+        self.resample_filter = resample_filter
+        self.capacity = capacity
+        self._frames = OrderedDict()
+
+    def get(self, index):
+        if index not in self._frames:
+            try:
+                self._frames[index] = self._load(self.parsed_files[index]['path'])
+            except Exception as e:
+                self._frames[index] = e
+            # 超出容量时丢弃最早进入窗口的图片
+            while len(self._frames) > self.capacity:
+                _, old = self._frames.popitem(last=False)
+                if not isinstance(old, Exception):
+                    old.close()
+        frame = self._frames[index]
+        if isinstance(frame, Exception):
+            raise frame
+        return frame
+
+    def _load(self, path):
+        # 打开图片并转换为RGB以统一格式，然后缩放为原来的一半
+        with Image.open(path) as image:
+            image_rgb = image.convert('RGB')
+        w_orig, h_orig = image_rgb.size
+        image_scaled = image_rgb.resize((w_orig // 2, h_orig // 2), self.resample_filter)
+        image_rgb.close() # 关闭原始图片，释放资源
+        return image_scaled
+
+
+class TargetFrameCache:
+    """
+    直接合成模式的帧缓存：按输出位置需要的尺寸解码并缩放图片。
+
+    JPEG 使用 draft 模式在解码时按 DCT 系数直接降采样 (1/2、1/4、1/8)，
+    只解码到略大于目标尺寸的分辨率，内存占用与原图大小无关。
+    降采样后的图片和最近一次缩放结果会被缓存，随窗口移动。
+
+    参数:
+    parsed_files (list): 已排序的图片信息列表 (包含 'path')。
+    resample_filter: 缩放使用的重采样算法。
+    capacity (int): 最多缓存的图片数量，默认等于窗口大小 3。
+    """
+
+    def __init__(self, parsed_files, resample_filter, capacity=3):
+        self.parsed_files = parsed_files
+        self.resample_filter = resample_filter
+        self.capacity = capacity
+        self._frames = OrderedDict()
+
+    def _entry(self, index):
+        if index not in self._frames:
+            try:
+                # 只读取文件头获取尺寸，像素数据在 get 中按需解码
+                with Image.open(self.parsed_files[index]['path']) as image:
+                    w_orig, h_orig = image.size
+                self._frames[index] = {'half_size': (w_orig // 2, h_orig // 2), 'decoded': None, 'resized': {}}
+            except Exception as e:
+                self._frames[index] = e
+            # 超出容量时丢弃最早进入窗口的图片
+            while len(self._frames) > self.capacity:
+                self._frames.popitem(last=False)
+        entry = self._frames[index]
+        if isinstance(entry, Exception):
+            raise entry
+        return entry
+
+    def half_size(self, index):
+        return self._entry(index)['half_size']
+
+    def get(self, index, size):
+        entry = self._entry(index)
+        if size in entry['resized']:
+            return entry['resized'][size]
+        try:
+            if entry['decoded'] is None:
+                entry['decoded'] = self._load(self.parsed_files[index]['path'], size)
+            resized = entry['decoded'].resize(size, self.resample_filter)
+        except Exception as e:
+            self._frames[index] = e
+            raise
+        # 同一张图片在相邻窗口中的目标尺寸通常相同，保留最近一次结果即可复用
+        entry['resized'] = {size: resized}
+        return resized
+
+    def _load(self, path, size):
+        with Image.open(path) as image:
+            # 多请求 1 像素，保证不同窗口位置因取整产生的尺寸差异也不需要放大
+            image.draft('RGB', (size[0] + 1, size[1] + 1))
+            return image.convert('RGB')
+
+
+def compose_window_stitched(frame_cache, index, output_size, resample_filter):
+    """
+    先把三张缩放为一半的图片拼接成中间大图，再整体缩放到目标尺寸。
+
+    参数:
+    frame_cache (FrameCache): 提供已缩放为一半图片的缓存。
+    index (int): 窗口第一张图片的序号。
+    output_size (tuple): 拼接后输出图片的尺寸 (宽度, 高度)。
+    resample_filter: 缩放使用的重采样算法。
+    """
+    # 从缓存中取出已缩放为一半的三张图片
+    image1_scaled = frame_cache.get(index)
+    image2_scaled = frame_cache.get(index + 1)
+    image3_scaled = frame_cache.get(index + 2)
+
+    # 获取缩放后图片的尺寸
+    w1, h1 = image1_scaled.size
+    w2, h2 = image2_scaled.size
+    w3, h3 = image3_scaled.size
+
+    # # 获取图片原始尺寸
+    # w1, h1 = image1.size
+    # w2, h2 = image2.size
+    # w3, h3 = image3.size
+
+    # 计算拼接后图片的尺寸
+    # 总宽度是三张图片宽度之和
+    # 高度取三张图片中最高者，以容纳所有图片内容
+    total_width = w1 + w2 + w3
+    max_height = max(h1, h2, h3)
+
+    # 创建一个新的空白图片，用于粘贴三张图片
+    # 背景默认为黑色，如果需要白色或其他颜色，可以添加 color="white" 参数
+    stitched_image = Image.new('RGB', (total_width, max_height))
+
+    # 将三张图片依次粘贴到新图片上
+    stitched_image.paste(image1_scaled, (0, 0))
+    stitched_image.paste(image2_scaled, (w1, 0)) # 第二张图片粘贴在前一张的右边
+    stitched_image.paste(image3_scaled, (w1 + w2, 0)) # 第三张图片再往右
+
+    # 5. 将拼接成的图像调整到目标尺寸 (1200x800)
+    # Image.LANCZOS (或 Image.Resampling.LANCZOS for Pillow >= 9.1.0) 是一种高质量的缩放算法
+
+    return stitched_image.resize(output_size, resample_filter)
+
+
+def compute_window_layout(half_sizes, output_size):
+    """
+    计算每张图片在最终输出图片中的位置。
+
+    与先拼接再缩放的几何关系完全一致：图片按缩放为一半后的宽度依次横向排列，
+    高度以最高者为准，再整体映射到 output_size。
+
+    参数:
+    half_sizes (list): 每张图片缩放为一半后的尺寸 [(宽度, 高度), ...]。
+    output_size (tuple): 输出图片的尺寸 (宽度, 高度)。
+
+    返回:
+    list: 每张图片在输出图片中的区域 [(left, top, right, bottom), ...]。
+    """
+    total_width = sum(w for w, _ in half_sizes)
+    max_height = max(h for _, h in half_sizes)
+    scale_x = output_size[0] / total_width
+    scale_y = output_size[1] / max_height
+
+    boxes = []
+    x = 0
+    for w, h in half_sizes:
+        boxes.append((round(x * scale_x), 0, round((x + w) * scale_x), round(h * scale_y)))
+        x += w
+    return boxes
+
+
+def compose_window_direct(frame_cache, index, output_size, resample_filter):
+    """
+    直接合成：每张图片只做一次缩放，直接写入输出尺寸的画布，不生成中间拼接大图。
+
+    参数:
+    frame_cache (TargetFrameCache): 提供图片尺寸和按目标尺寸缩放图片的缓存。
+    index (int): 窗口第一张图片的序号。
+    output_size (tuple): 拼接后输出图片的尺寸 (宽度, 高度)。
+    resample_filter: 缩放使用的重采样算法。
+    """
+    indices = (index, index + 1, index + 2)
+    boxes = compute_window_layout([frame_cache.half_size(k) for k in indices], output_size)
+
+    # 背景默认为黑色，与拼接模式中高度不足部分的填充一致
+    final_image = Image.new('RGB', output_size)
+    for k, (left, top, right, bottom) in zip(indices, boxes):
+        if right <= left or bottom <= top:
+            continue
+        final_image.paste(frame_cache.get(k, (right - left, bottom - top)), (left, top))
+    return final_image
+
+
+def stitch_window(frame_cache, parsed_files, i, output_dir, output_size, direct_composite, resample_filter, log=print):
+    """
+    拼接以第 i 张图片开头的窗口 (i, i+1, i+2) 并保存。
+
+    返回:
+    bool: 是否成功拼接并保存。
+    """
+    img_info1 = parsed_files[i]
+    img_info2 = parsed_files[i+1]
+    img_info3 = parsed_files[i+2]
+
+    try:
+        if direct_composite:
+            final_image = compose_window_direct(frame_cache, i, output_size, resample_filter)
+        else:
+            final_image = compose_window_stitched(frame_cache, i, output_size, resample_filter)
+
+        # 6. 确定输出文件名 (使用第一张图片的编号)
+        output_filename = f"{img_info1['id_str']}.jpg"
+        output_path = os.path.join(output_dir, output_filename)
+
+        # 7. 保存拼接并调整大小后的图片
+        final_image.save(output_path, "JPEG", quality=90) # quality参数可以调整图片质量/文件大小
+        log(f"成功拼接: {img_info1['filename']}, {img_info2['filename']}, {img_info3['filename']} -> 保存为: {output_path}")
+        return True
+
+    except Exception as e:
+        log(f"处理图片组 ({img_info1['filename']}, {img_info2['filename']}, {img_info3['filename']}) 时发生错误: {e}")
+        return False
+
+
+def stitch_window_range(parsed_files, output_dir, output_size, direct_composite=True, log=print):
+    """
+    对一段连续的图片列表做滑动窗口拼接，并把结果保存到输出文件夹。
+
+    参数:
+    parsed_files (list): 已排序的图片信息列表，窗口为 (i, i+1, i+2)。
+    output_dir (str): 拼接结果的保存文件夹。
+    output_size (tuple): 拼接后输出图片的尺寸 (宽度, 高度)。
+    direct_composite (bool): 是否直接合成到输出尺寸，False 时先拼接中间大图再缩放。
+    log (callable): 输出处理信息的函数，默认为 print。
+
+    返回:
+    int: 成功拼接并保存的图片数量。
+    """
+    resample_filter = get_resample_filter()
+
+    # 遍历排序后的图片列表，以滑动窗口（每次3张）的方式进行拼接
+    # 相邻窗口共享两张图片，用随窗口移动的小缓存避免重复解码
+    if direct_composite:
+        frame_cache = TargetFrameCache(parsed_files, resample_filter)
+    else:
+        frame_cache = FrameCache(parsed_files, resample_filter)
+    stitched_count = 0
+    for i in range(len(parsed_files) - 2): # 减2确保总有3张图片可以取
+        if stitch_window(frame_cache, parsed_files, i, output_dir, output_size,
+                         direct_composite, resample_filter, log):
+            stitched_count += 1
+
+    return stitched_count
+
+
+def _stitch_chunk(args):
+    # 进程池中执行的任务：处理一个连续分块，日志收集后交给主进程按顺序打印
+    chunk_files, output_dir, output_size, direct_composite = args
+    logs = []
+    stitched_count = stitch_window_range(chunk_files, output_dir, output_size, direct_composite, log=logs.append)
+    return stitched_count, logs
+
+
+def stitch_parallel(parsed_files, output_dir, output_size, workers, direct_composite=True):
+    """
+    多进程并行拼接：把窗口划分成连续的分块，每个进程处理一块。
+
+    每个分块额外带上后面两张图片作为重叠帧，保证分块边界处的窗口完整。
+    输出文件名仍由窗口第一张图片的编号决定，与串行模式完全一致；
+    单个窗口失败只会记录错误，不影响其他窗口和分块。
+
+    参数:
+    parsed_files (list): 已排序的图片信息列表。
+    output_dir (str): 拼接结果的保存文件夹。
+    output_size (tuple): 拼接后输出图片的尺寸 (宽度, 高度)。
+    workers (int): 进程数。
+    direct_composite (bool): 是否直接合成到输出尺寸。
+
+    返回:
+    int: 成功拼接并保存的图片数量。
+    """
+    num_windows = len(parsed_files) - 2
+    workers = min(workers, num_windows)
+    chunk_size = -(-num_windows // workers) # 向上取整
+    tasks = []
+    for start in range(0, num_windows, chunk_size):
+        stop = min(start + chunk_size, num_windows)
+        # 窗口 [start, stop) 需要图片 [start, stop + 2)
+        tasks.append((parsed_files[start:stop + 2], output_dir, output_size, direct_composite))
+
+    print(f"使用 {workers} 个进程并行拼接，共 {len(tasks)} 个分块。")
+    stitched_count = 0
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        # 按分块顺序取回结果，日志顺序与串行模式一致
+        for chunk_index, future in enumerate([executor.submit(_stitch_chunk, t) for t in tasks]):
+            try:
+                count, logs = future.result()
+            except Exception as e:
+                chunk_files = tasks[chunk_index][0]
+                print(f"处理分块 ({chunk_files[0]['filename']} ~ {chunk_files[-1]['filename']}) 时发生错误: {e}")
+                continue
+            for line in logs:
+                print(line)
+            stitched_count += count
+    return stitched_count
+
+
+def _has_jpeg_eoi(path):
+    # 写入完成的 JPEG 以 EOI 标记 (FF D9) 结尾
+    try:
+        with open(path, 'rb') as f:
+            f.seek(-2, os.SEEK_END)
+            return f.read(2) == b'\xff\xd9'
+    except OSError:
+        return False
+
+
+def watch_and_stitch(folder_path, output_size=(1200, 800), direct_composite=True,
+                     poll_interval=0.5, settle_time=1.0, idle_timeout=30.0):
+    """
+    流式拼接：监视采集文件夹，窗口内三张图片都写入完成后立即拼接输出。
+
+    图片按编号顺序进入滚动缓冲区，文件大小和修改时间在 settle_time 内不再变化
+    且以 JPEG 结束标记结尾时才认为写入完成；编号更小的图片还没写完时，
+    后面的图片会等待，保证窗口顺序与批量模式一致。
+    超过 idle_timeout 秒没有新图片时停止监视 (也可以按 Ctrl+C 提前结束)。
+
+    参数:
+    folder_path (str): 采集程序写入图片的文件夹，可以尚未创建。
+    output_size (tuple): 拼接后输出图片的尺寸 (宽度, 高度)。
+    direct_composite (bool): 是否直接合成到输出尺寸。
+    poll_interval (float): 扫描文件夹的间隔秒数。
+    settle_time (float): 文件大小保持不变多少秒后视为写入完成。
+    idle_timeout (float): 没有新图片多少秒后停止监视。
+
+    返回:
+    int: 成功拼接并保存的图片数量。
+    """
+    output_dir = os.path.join(folder_path, "stitched_output2")
+    resample_filter = get_resample_filter()
+
+    parsed_files = [] # 已写入完成、按编号排序的图片，随采集不断增长
+    if direct_composite:
+        frame_cache = TargetFrameCache(parsed_files, resample_filter)
+    else:
+        frame_cache = FrameCache(parsed_files, resample_filter)
+
+    pending = {}     # 文件名 -> [(大小, 修改时间), 状态开始稳定的时间, 图片信息]
+    handled = set()  # 已进入缓冲区或已跳过的文件名
+    next_window = 0
+    stitched_count = 0
+    last_activity = time.monotonic()
+    print(f"开始监视文件夹: {folder_path} (空闲 {idle_timeout} 秒后停止)")
+
+    try:
+        while True:
+            now = time.monotonic()
+            try:
+                entries = list(os.scandir(folder_path))
+            except FileNotFoundError:
+                entries = [] # 采集尚未开始，文件夹还没有创建
+
+            for entry in entries:
+                name = entry.name
+                if name in handled or not name.lower().endswith('.jpg'):
+                    continue
+                try:
+                    stat = entry.stat()
+                except OSError:
+                    continue
+                signature = (stat.st_size, stat.st_mtime_ns)
+                if name not in pending:
+                    file_info = parse_image_filename(folder_path, name)
+                    if not file_info:
+                        print(f"文件名 {name} 不符合预期的格式 (例如 'prefix-NNN-suffix.jpg')，已跳过。")
+                        handled.add(name)
+                        continue
+                    pending[name] = [signature, now, file_info]
+                    last_activity = now
+                elif pending[name][0] != signature:
+                    # 文件仍在写入
+                    pending[name][0] = signature
+                    pending[name][1] = now
+                    last_activity = now
+
+            idle = now - last_activity >= idle_timeout
+
+            # 按编号顺序把写入完成的图片放入缓冲区，遇到未完成的图片就停下等待
+            for name, (signature, since, file_info) in sorted(pending.items(), key=lambda x: x[1][2]['id_num']):
+                if parsed_files and file_info['id_num'] <= parsed_files[-1]['id_num']:
+                    print(f"图片 {name} 到达时已错过它所在的窗口，已跳过。")
+                elif signature[0] > 0 and now - since >= settle_time and (idle or _has_jpeg_eoi(file_info['path'])):
+                    parsed_files.append(file_info)
+                    last_activity = now
+                else:
+                    break
+                del pending[name]
+                handled.add(name)
+
+            # 拼接所有三张图片都已就绪的窗口
+            while next_window + 2 < len(parsed_files):
+                if next_window == 0 and not os.path.isdir(output_dir):
+                    os.makedirs(output_dir, exist_ok=True)
+                if stitch_window(frame_cache, parsed_files, next_window, output_dir, output_size,
+                                 direct_composite, resample_filter):
+                    stitched_count += 1
+                next_window += 1
+
+            if idle:
+                break
+            time.sleep(poll_interval)
+    except KeyboardInterrupt:
+        print("\n已手动停止监视。")
+
+    if pending:
+        print(f"仍有 {len(pending)} 张图片未写入完成，未参与拼接。")
+    return stitched_count
+
+
+def stitch_images_in_folder(folder_path, output_size=(1200, 800), workers=1, direct_composite=True,
+                            watch=False, idle_timeout=30.0):
     """
     读取指定文件夹中的图片，每三张横向拼接，并保存为新的图片。
 
     参数:
     folder_path (str): 包含图片的文件夹路径。
     output_size (tuple): 拼接后输出图片的尺寸 (宽度, 高度)。
+    workers (int): 并行拼接使用的进程数，1 为串行，None 表示使用全部 CPU 核心。
+    direct_composite (bool): 直接把每张图片缩放到它在输出图片中的位置，
+        JPEG 按目标尺寸降采样解码，不生成中间拼接大图；False 时使用原来的先拼接再缩放。
+    watch (bool): 流式模式，边采集边拼接，见 watch_and_stitch。
+    idle_timeout (float): 流式模式下没有新图片多少秒后停止。
     """
     print(f"开始处理文件夹: {folder_path}")
 
-    try: # 兼容 Pillow 不同版本
-        resample_filter = Image.Resampling.LANCZOS
-    except AttributeError:
-        resample_filter = Image.LANCZOS
+    if watch:
+        stitched_count = watch_and_stitch(folder_path, output_size, direct_composite, idle_timeout=idle_timeout)
+        print_summary(stitched_count)
+        return
 
     # 1. 获取文件夹中所有的 JPG 图片文件名
     try:
@@ -32,29 +510,12 @@ def stitch_images_in_folder(folder_path, output_size=(1200, 800)):
         print("文件夹中没有找到 JPG 图片。")
         return
 
-    # 2. 定义正则表达式来解析文件名并提取编号
-    #    例如：105-000-x.jpg -> 提取 ("105", "000", "x")
-    #    我们主要关心中间的数字编号 "000" 用于排序和命名输出文件
-    #    这里的 (.*) 表示文件名中第二個连字符后的任意字符
-    filename_pattern = re.compile(r"([^-]+)-(\d+)-(.*)\.jpg", re.IGNORECASE)
-
+    # 2. 解析文件名并提取编号
     parsed_files = []
     for filename in image_files:
-        match = filename_pattern.match(filename)
-        if match:
-            prefix = match.group(1)      # 例如 "105"
-            id_str = match.group(2)      # 例如 "000"
-            suffix_part = match.group(3) # 例如 "x" 或其他字符
-            id_num = int(id_str)         # 将编号转为整数，方便排序
-            
-            parsed_files.append({
-                'filename': filename,
-                'path': os.path.join(folder_path, filename),
-                'id_num': id_num,
-                'id_str': id_str, # 保留字符串形式的ID用于命名
-                'prefix': prefix,
-                'suffix': suffix_part
-            })
+        file_info = parse_image_filename(folder_path, filename)
+        if file_info:
+            parsed_files.append(file_info)
         else:
             print(f"文件名 {filename} 不符合预期的格式 (例如 'prefix-NNN-suffix.jpg')，已跳过。")
 
@@ -67,85 +528,23 @@ def stitch_images_in_folder(folder_path, output_size=(1200, 800)):
     
     print(f"找到并排序了 {len(parsed_files)} 个符合格式的图片文件。")
 
-    # 4. 遍历排序后的图片列表，以滑动窗口（每次3张）的方式进行拼接
-    stitched_count = 0
-    for i in range(len(parsed_files) - 2): # 减2确保总有3张图片可以取
-        img_info1 = parsed_files[i]
-        img_info2 = parsed_files[i+1]
-        img_info3 = parsed_files[i+2]
+    # (可选) 如果你想把拼接后的图片保存到单独的输出文件夹，可以修改这里的文件夹名
+    output_dir = os.path.join(folder_path, "stitched_output2")
+    os.makedirs(output_dir, exist_ok=True) # 创建输出文件夹，如果不存在的话
 
-        try:
-            # 打开三张图片
-            image1 = Image.open(img_info1['path']).convert('RGB') # 转换为RGB以统一格式
-            image2 = Image.open(img_info2['path']).convert('RGB')
-            image3 = Image.open(img_info3['path']).convert('RGB')
-
-
-            # --- 新增步骤：将每张原始图像缩放为原来的一半 ---
-            w1_orig, h1_orig = image1.size
-            image1_scaled = image1.resize((w1_orig // 2, h1_orig // 2), resample_filter)
-            image1.close() # 关闭原始图片，释放资源
-
-            w2_orig, h2_orig = image2.size
-            image2_scaled = image2.resize((w2_orig // 2, h2_orig // 2), resample_filter)
-            image2.close()
-
-            w3_orig, h3_orig = image3.size
-            image3_scaled = image3.resize((w3_orig // 2, h3_orig // 2), resample_filter)
-            image3.close()
-
-            # 获取缩放后图片的尺寸
-            w1, h1 = image1_scaled.size
-            w2, h2 = image2_scaled.size
-            w3, h3 = image3_scaled.size
-
-            # # 获取图片原始尺寸
-            # w1, h1 = image1.size
-            # w2, h2 = image2.size
-            # w3, h3 = image3.size
-
-            # 计算拼接后图片的尺寸
-            # 总宽度是三张图片宽度之和
-            # 高度取三张图片中最高者，以容纳所有图片内容
-            total_width = w1 + w2 + w3
-            max_height = max(h1, h2, h3)
-
-            # 创建一个新的空白图片，用于粘贴三张图片
-            # 背景默认为黑色，如果需要白色或其他颜色，可以添加 color="white" 参数
-            stitched_image = Image.new('RGB', (total_width, max_height))
-
-            # 将三张图片依次粘贴到新图片上
-            stitched_image.paste(image1_scaled, (0, 0))
-            stitched_image.paste(image2_scaled, (w1, 0)) # 第二张图片粘贴在前一张的右边
-            stitched_image.paste(image3_scaled, (w1 + w2, 0)) # 第三张图片再往右
-
-            # 5. 将拼接成的图像调整到目标尺寸 (1200x800)
-            # Image.LANCZOS (或 Image.Resampling.LANCZOS for Pillow >= 9.1.0) 是一种高质量的缩放算法
-
-            final_image = stitched_image.resize(output_size, resample_filter)
-
-            # 6. 确定输出文件名 (使用第一张图片的编号)
-            output_filename = f"{img_info1['id_str']}.jpg"
-            output_path = os.path.join(folder_path, output_filename)
-            
-            # (可选) 如果你想把拼接后的图片保存到单独的输出文件夹，可以取消下面这几行的注释
-            output_dir = os.path.join(folder_path, "stitched_output2")
-            os.makedirs(output_dir, exist_ok=True) # 创建输出文件夹，如果不存在的话
-            output_path = os.path.join(output_dir, output_filename)
-
-            # 7. 保存拼接并调整大小后的图片
-            final_image.save(output_path, "JPEG", quality=90) # quality参数可以调整图片质量/文件大小
-            print(f"成功拼接: {img_info1['filename']}, {img_info2['filename']}, {img_info3['filename']} -> 保存为: {output_path}")
-            stitched_count += 1
+    # 4. 以滑动窗口（每次3张）的方式进行拼接，可选多进程并行
+    if workers is None:
+        workers = os.cpu_count() or 1
+    num_windows = len(parsed_files) - 2
+    if workers > 1 and num_windows > 1:
+        stitched_count = stitch_parallel(parsed_files, output_dir, output_size, workers, direct_composite)
+    else:
+        stitched_count = stitch_window_range(parsed_files, output_dir, output_size, direct_composite)
 
-            # 关闭图片文件，释放资源
-            image1.close()
-            image2.close()
-            image3.close()
+    print_summary(stitched_count)
 
-        except Exception as e:
-            print(f"处理图片组 ({img_info1['filename']}, {img_info2['filename']}, {img_info3['filename']}) 时发生错误: {e}")
 
+def print_summary(stitched_count):
     if stitched_count > 0:
         print(f"\n处理完成！总共拼接并保存了 {stitched_count} 张图片。")
     else:
@@ -158,6 +557,9 @@ if __name__ == "__main__":
     # 注意：Windows路径中的反斜杠 \ 可能需要转义 (例如 \\) 或者使用原始字符串 (r"...")
     image_folder_path = r"F:\Image\020250518150820"
     
-    # 调用函数开始处理
-    stitch_images_in_folder(image_folder_path)
+    # 调用函数开始处理 (workers=None 表示使用全部 CPU 核心并行拼接)
+    stitch_images_in_folder(image_folder_path, workers=None)
+
+    # 采集过程中实时拼接：监视文件夹，每个窗口的三张图片写完后立即输出
+    # stitch_images_in_folder(image_folder_path, watch=True, idle_timeout=30.0)
 
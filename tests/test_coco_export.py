@@ -0,0 +1,27 @@
+import json
+import os
+import numpy as np
+from coco_export import CocoWriter
+
+
+def test_shards_share_categories_and_skip_invalid_ids(tmp_path):
+    writer = CocoWriter(str(tmp_path / 'annotations.json'), ['car', 'bus'], shard_size=1)
+    assert writer.add_image('a.jpg', 10, 10, np.array([[0, 1, 1, 2, 2], [-1, 1, 1, 2, 2]])) == [-1]
+    assert writer.add_image('b.jpg', 10, 10, np.array([[5, 1, 1, 2, 2]])) == [5]
+    paths = writer.close()
+    assert len(paths) == 2
+    shards = [json.load(open(path, encoding='utf-8')) for path in paths]
+    assert shards[0]['categories'] == shards[1]['categories']
+    assert [c['id'] for c in shards[0]['categories']] == [1, 2]
+    assert [a['category_id'] for a in shards[0]['annotations']] == [1]
+    assert shards[1]['annotations'] == []
+    writer.abort()
+    assert all(os.path.exists(path) for path in paths)
+
+
+def test_abort_removes_finished_shards(tmp_path):
+    writer = CocoWriter(str(tmp_path / 'annotations.json'), ['car'], shard_size=1)
+    writer.add_image('a.jpg', 10, 10, np.array([[0, 1, 1, 2, 2]]))
+    writer.add_image('b.jpg', 10, 10, np.zeros((0, 5)))
+    writer.abort()
+    assert os.listdir(tmp_path) == []
@@ -0,0 +1,24 @@
+import os
+import numpy as np
+from crop_dataset import CropDatasetWriter
+
+
+def test_yolo_class_ids_are_kept(tmp_path):
+    writer = CropDatasetWriter(str(tmp_path), size=(4, 4), capacity=1)
+    sample = np.zeros((4, 4, 3), dtype=np.uint8)
+    for label in ['class_3', 'class_0', 'person', 'class_3']:
+        writer.add(label, 'a.jpg', (0, 0, 4, 4), sample)
+    # 写完之前只有临时文件
+    assert not any(name.endswith(('.npy', '.txt')) for name in os.listdir(tmp_path))
+    assert writer.close() == 4
+    assert np.load(tmp_path / 'labels.npy').tolist() == [3, 0, 4, 3]
+    assert (tmp_path / 'classes.txt').read_text(encoding='utf-8').split() == \
+        ['class_0', 'class_1', 'class_2', 'class_3', 'person']
+    assert np.load(tmp_path / 'images.npy').shape == (4, 4, 4, 3)
+    assert not any(name.endswith('.part') for name in os.listdir(tmp_path))
+
+
+def test_abort_removes_temporary_files(tmp_path):
+    writer = CropDatasetWriter(str(tmp_path), size=(4, 4))
+    writer.abort()
+    assert os.listdir(tmp_path) == []
@@ -0,0 +1,58 @@
+import os
+import numpy as np
+from PIL import Image
+from image_hash import HashIndex, compute_hashes, near_duplicate_groups, select_distinct
+
+
+def _make_images(folder, n=3):
+    rng = np.random.default_rng(0)
+    paths = []
+    for i in range(n):
+        path = os.path.join(folder, f'{i}.png')
+        Image.fromarray(rng.integers(0, 255, (16, 16), dtype=np.uint8)).save(path)
+        paths.append(path)
+    return paths
+
+
+def test_compute_hashes_cache_outside_image_folder(tmp_path):
+    images = tmp_path / 'images'
+    images.mkdir()
+    paths = _make_images(str(images))
+    cache_path = str(tmp_path / 'cache' / 'hashes.sqlite')
+    first, valid = compute_hashes(paths, workers=1, cache_path=cache_path)
+    assert valid.all()
+    assert sorted(os.listdir(images)) == ['0.png', '1.png', '2.png']
+    assert os.path.exists(cache_path)
+    second, _ = compute_hashes(paths, workers=1, cache_path=cache_path)
+    assert second.tolist() == first.tolist()
+
+
+def test_compute_hashes_unwritable_cache(tmp_path):
+    paths = _make_images(str(tmp_path))
+    # 缓存目录的上级是一个文件，无法创建
+    blocker = tmp_path / 'blocker'
+    blocker.write_text('')
+    hashes, valid = compute_hashes(paths, workers=1, cache_path=str(blocker / 'hashes.sqlite'))
+    uncached, _ = compute_hashes(paths, workers=1, cache=False)
+    assert valid.all() and hashes.tolist() == uncached.tolist()
+
+
+def test_hash_index_query():
+    hashes = np.array([0b0000, 0b0001, 0b0111, 0b1111], dtype=np.uint64)
+    index = HashIndex(hashes)
+    assert index.query(0, 1).tolist() == [0, 1]
+    assert index.query(0, 3, start=1).tolist() == [1, 2]
+    index.remove(1)
+    assert index.query(0, 1).tolist() == [0]
+
+
+def test_near_duplicate_groups_and_select_distinct():
+    hashes = np.array([0b0000, 0b0001, 0xff00, 0b0011, 0xff01], dtype=np.uint64)
+    valid = np.array([True, True, True, True, False])
+    # 0b0011 与代表 0 的距离为 2，不会经由 0b0001 串入第一组
+    assert near_duplicate_groups(hashes, 1, valid).tolist() == [0, 0, 2, 3, 4]
+    assert near_duplicate_groups(hashes, 1, valid, window=1).tolist() == [0, 0, 2, 3, 4]
+    assert near_duplicate_groups(hashes, 2, valid, window=3).tolist() == [0, 0, 2, 0, 4]
+    assert near_duplicate_groups(hashes, 2, valid, window=2).tolist() == [0, 0, 2, 3, 4]
+    assert select_distinct(hashes, 1, valid) == [0, 2, 3]
+    assert select_distinct(hashes, 2, valid, limit=1) == [0]
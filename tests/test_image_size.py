@@ -0,0 +1,19 @@
+from PIL import Image
+from image_size import probe_image_size
+
+
+def _save_jpeg(path, orientation=None):
+    image = Image.new('RGB', (40, 20))
+    if orientation is None:
+        image.save(path)
+        return
+    exif = Image.Exif()
+    exif[0x0112] = orientation
+    image.save(path, exif=exif)
+
+
+def test_probe_jpeg_applies_exif_rotation(tmp_path):
+    for orientation, expected in [(None, (40, 20)), (1, (40, 20)), (3, (40, 20)), (6, (20, 40)), (8, (20, 40))]:
+        path = str(tmp_path / f'{orientation}.jpg')
+        _save_jpeg(path, orientation)
+        assert probe_image_size(path) == expected
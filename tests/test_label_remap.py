@@ -0,0 +1,19 @@
+import pytest
+from label_remap import DROP, ClassMap
+
+
+def test_range_shift_renumbers():
+    class_map = ClassMap.parse("15~ -> shift -1\n3 -> 5")
+    assert class_map.lookup([3, 14, 15, 20]).tolist() == [5, 14, 14, 19]
+    assert ClassMap.parse(class_map.to_rules()).lookup([3, 15, 20]).tolist() == [5, 14, 19]
+
+
+def test_drop_keyword():
+    class_map = ClassMap.parse("15~ -> drop\n10 -> drop")
+    assert class_map.lookup([9, 10, 15, 30]).tolist() == [9, DROP, DROP, DROP]
+
+
+@pytest.mark.parametrize('rules', ["15~ -> -1", "15~ -> +2", "10 -> -1", "15~ -> shift 1", "15~ -> shift"])
+def test_ambiguous_rules_rejected(rules):
+    with pytest.raises(ValueError):
+        ClassMap.parse(rules)
@@ -0,0 +1,25 @@
+import numpy as np
+from split_engine import hash_split, incremental_group_split
+
+
+def test_incremental_group_split_keeps_existing_samples():
+    ratios = (0.5, 0.5, 0.0)
+    keys = [f'frame{i:03d}' for i in range(40)]
+    groups = np.repeat(np.arange(0, 40, 4), 4)
+    first = incremental_group_split(keys, groups, {}, ratios)
+    assert all(len(set(first[groups == g])) == 1 for g in np.unique(groups))
+
+    # 新帧排在最前面成为第一组的代表，且与第二组合并
+    new_keys = ['frame000a'] + keys
+    new_groups = np.concatenate([[0], np.where(groups + 1 <= 5, 0, groups + 1)])
+    previous = dict(zip(keys, first.tolist()))
+    second = incremental_group_split(new_keys, new_groups, previous, ratios)
+    assert second[1:].tolist() == first.tolist()
+    assert second[0] == first[0]
+
+
+def test_incremental_group_split_new_group_uses_representative_hash():
+    keys = ['a', 'b', 'c']
+    second = incremental_group_split(keys, np.array([0, 0, 2]), {}, (0.5, 0.5, 0.0), seed=3)
+    expected = hash_split(['a', 'a', 'c'], (0.5, 0.5, 0.0), seed=3)
+    assert second.tolist() == expected.tolist()
@@ -0,0 +1,22 @@
+import numpy as np
+from yolo_label import parse_yolo_text
+
+
+def test_parse_uniform_rows():
+    labels = parse_yolo_text("0 0.5 0.5 0.1 0.2\n3 0.1 0.2 0.3 0.4")
+    np.testing.assert_allclose(labels, [[0, 0.5, 0.5, 0.1, 0.2], [3, 0.1, 0.2, 0.3, 0.4]])
+
+
+def test_parse_mixed_width_rows_do_not_shift():
+    # 6 列 + 4 列的总数等于 2 x 5，不能走整体 reshape
+    labels = parse_yolo_text("1 0.5 0.5 0.1 0.2 0.9\n2 0.3 0.3 0.1\n")
+    np.testing.assert_allclose(labels, [[1, 0.5, 0.5, 0.1, 0.2]])
+
+
+def test_parse_yolo_text_stats():
+    text = "0 0.5 0.5 0.1 0.2\n1 0.5 0.5 0.1 0.2 0.3 0.4\n2 0.1 0.1\nx 0.1 0.1 0.1 0.1\n"
+    labels, truncated, skipped = parse_yolo_text(text, with_stats=True)
+    assert labels[:, 0].tolist() == [0, 1]
+    assert (truncated, skipped) == (1, 2)
+    assert parse_yolo_text("0 0.5 0.5 0.1 0.2\n", with_stats=True)[1:] == (0, 0)
+    assert parse_yolo_text("", with_stats=True)[0].shape == (0, 5)
@@ -1,141 +1,199 @@
 import os
-import json
-import glob
+import time
+from concurrent.futures import ProcessPoolExecutor
 from PyQt5.QtWidgets import (
     QApplication, QMainWindow, QWidget, QVBoxLayout, QHBoxLayout, QPushButton,
-    QLabel, QLineEdit, QFileDialog, QProgressBar, QMessageBox
+    QLabel, QLineEdit, QFileDialog, QProgressBar, QMessageBox, QCheckBox, QSpinBox, QComboBox
 )
 from PyQt5.QtCore import Qt, QThread, pyqtSignal
-from PIL import Image
+from image_size import get_default_cache
+from dataset_index import DatasetIndex
+from yolo2labelme import init_worker, convert_yolo_file
+from coco_export import CocoWriter, read_yolo_boxes
+from error_report import ErrorReport, ErrorReportDialog
+from job_control import JobControl, Checkpoint, CHECKPOINT_NAME
 
 class ConverterThread(QThread):
+    IMAGE_EXTENSIONS = ['.jpg', '.jpeg', '.png', '.bmp', '.tiff', '.gif']
+    PROGRESS_INTERVAL = 0.1   # 进度信号最短间隔 (秒)
+    PARALLEL_THRESHOLD = 200  # 文件数达到该值时才启动进程池
+
     progress_updated = pyqtSignal(int, int)
     finished = pyqtSignal()
     error_occurred = pyqtSignal(str)
 
-    def __init__(self, labels_path, txt_dir, json_dir, parent=None):
+    def __init__(self, labels_path, txt_dir, json_dir, workers=None, compact=False, precision=None,
+                 output_format="labelme", shard_size=None, resume_checkpoint=False, parent=None):
         super().__init__(parent)
         self.labels_path = labels_path
         self.txt_dir = txt_dir
         self.json_dir = json_dir
-        self.canceled = False
+        self.compact = compact      # 紧凑 JSON 输出
+        self.precision = precision  # 坐标保留的小数位数，None 表示不取舍
+        self.output_format = output_format  # "labelme": 每张图片一个JSON，"coco": 单个 annotations.json
+        self.shard_size = shard_size        # COCO 输出时每个文件最多包含的图片数，None 表示不分片
+        self.workers = workers or os.cpu_count() or 1
+        self.resume_checkpoint = resume_checkpoint  # 是否跳过检查点中记录的已完成文件
+        self.control = JobControl()  # 取消和暂停，同时作用于进程池中的子进程
+        self.report = ErrorReport()  # 单个文件的错误汇总到报告中，结束后统一显示
+        self._last_progress = 0.0
+
+    @property
+    def canceled(self):
+        return self.control.canceled
+
+    @property
+    def checkpoint_path(self):
+        # COCO 文件在结束时一次写出，中断后无法接着写，此时不使用检查点
+        if self.output_format != "labelme":
+            return None
+        return os.path.join(self.json_dir, CHECKPOINT_NAME)
+
+    def checkpoint_params(self):
+        return {
+            "task": "txt2json", "labels_path": self.labels_path, "txt_dir": self.txt_dir,
+            "compact": self.compact, "precision": self.precision,
+        }
+
+    def pending_checkpoint(self):
+        '''
+        输出目录中与本次参数相同的检查点里已完成的文件数，0 表示没有可以继续的任务
+        '''
+        if not self.checkpoint_path:
+            return 0
+        return len(Checkpoint.load(self.checkpoint_path, self.checkpoint_params()))
 
     def run(self):
+        checkpoint = None
         try:
             # 读取标签文件
             with open(self.labels_path, 'r') as f:
                 self.labels = [line.strip() for line in f.readlines()]
             
-            # 获取所有txt文件
-            txt_files = glob.glob(os.path.join(self.txt_dir, '*.txt'))
+            # 扫描一次目录，建立txt文件与图片的对应关系
+            index = DatasetIndex(self.txt_dir, image_extensions=self.IMAGE_EXTENSIONS, label_extensions=['.txt'])
+            txt_files = index.label_files('.txt')
             total_files = len(txt_files)
             
-            for i, txt_file in enumerate(txt_files):
-                if self.canceled:
-                    break
-                
-                self.progress_updated.emit(i + 1, total_files)
-                
-                # 获取对应的图片文件路径
+            # 检查点记录已完成的文件，继续上次的任务时跳过这些文件
+            finished = set()
+            if self.checkpoint_path:
+                checkpoint = Checkpoint(self.checkpoint_path, self.checkpoint_params(), self.resume_checkpoint)
+                finished = checkpoint.done
+            
+            # 配对图片并查询尺寸缓存，未命中缓存的图片由子进程解析文件头
+            size_cache = get_default_cache()
+            tasks = []
+            uncached = set()
+            done = 0
+            for txt_file in txt_files:
+                if txt_file in finished:
+                    done += 1
+                    continue
                 base_name = os.path.splitext(os.path.basename(txt_file))[0]
-                image_path = self.find_image_file(os.path.dirname(txt_file), base_name)
+                image_path = index.find_image(base_name)
                 
                 if not image_path:
-                    self.error_occurred.emit(f"找不到图片文件: {base_name}")
-                    continue
-                
-                # 获取图片尺寸
-                try:
-                    with Image.open(image_path) as img:
-                        img_width, img_height = img.size
-                except Exception as e:
-                    self.error_occurred.emit(f"无法读取图片尺寸: {image_path} - {str(e)}")
+                    self.report.add("找不到图片文件", txt_file)
+                    done += 1
                     continue
                 
-                # 创建JSON数据结构
-                json_data = {
-                    "version": "2.4.4",
-                    "flags": {},
-                    "shapes": [],
-                    "imagePath": os.path.basename(image_path),
-                    "imageData": None,
-                    "imageHeight": img_height,
-                    "imageWidth": img_width,
-                    "description": ""
-                }
-                
-                # 处理YOLO标签
-                try:
-                    with open(txt_file, 'r') as f:
-                        lines = f.readlines()
-                    
-                    for line in lines:
-                        parts = line.strip().split()
-                        if len(parts) < 5:
-                            continue
-                            
-                        class_id = int(parts[0])
-                        center_x = float(parts[1])
-                        center_y = float(parts[2])
-                        width = float(parts[3])
-                        height = float(parts[4])
-                        
-                        # 转换为绝对坐标
-                        abs_center_x = center_x * img_width
-                        abs_center_y = center_y * img_height
-                        abs_width = width * img_width
-                        abs_height = height * img_height
-                        
-                        # 计算矩形框坐标
-                        x_min = abs_center_x - (abs_width / 2)
-                        y_min = abs_center_y - (abs_height / 2)
-                        x_max = abs_center_x + (abs_width / 2)
-                        y_max = abs_center_y + (abs_height / 2)
-                        
-                        # 创建矩形框
-                        shape = {
-                            "kie_linking": [],
-                            "label": self.labels[class_id] if class_id < len(self.labels) else str(class_id),
-                            "score": 1.0,
-                            "points": [
-                                [x_min, y_min],
-                                [x_max, y_min],
-                                [x_max, y_max],
-                                [x_min, y_max]
-                            ],
-                            "group_id": None,
-                            "description": None,
-                            "difficult": False,
-                            "shape_type": "rectangle",
-                            "flags": {},
-                            "attributes": {}
-                        }
-                        json_data["shapes"].append(shape)
+                image_size = size_cache.lookup(image_path, index.stat(image_path)) if size_cache else None
+                if image_size is None:
+                    uncached.add(image_path)
+                tasks.append((txt_file, image_path, image_size))
+            
+            self.report_progress(done, total_files, force=True)
+            
+            # COCO 输出时子进程只解析标签，由当前线程按顺序写入同一个文件
+            coco_writer = None
+            worker = convert_yolo_file
+            if self.output_format == "coco":
+                worker = read_yolo_boxes
+                coco_writer = CocoWriter(
+                    os.path.join(self.json_dir, "annotations.json"), self.labels, self.shard_size, self.precision
+                )
+            
+            # 文件较多时使用进程池并行转换，否则直接在当前线程中转换
+            executor = None
+            if self.workers > 1 and len(tasks) >= self.PARALLEL_THRESHOLD:
+                executor = ProcessPoolExecutor(
+                    max_workers=self.workers, initializer=init_worker,
+                    initargs=(self.labels, self.json_dir, self.compact, self.precision, self.control)
+                )
+                chunksize = max(1, min(256, len(tasks) // (self.workers * 8)))
+                results = executor.map(worker, tasks, chunksize=chunksize)
+            else:
+                init_worker(self.labels, self.json_dir, self.compact, self.precision, self.control)
+                results = map(worker, tasks)
+            
+            try:
+                for result in results:
+                    if self.canceled:
+                        break
                     
-                    # 保存JSON文件
-                    json_path = os.path.join(self.json_dir, f"{base_name}.json")
-                    with open(json_path, 'w') as f:
-                        json.dump(json_data, f, indent=2)
-                        
-                except Exception as e:
-                    self.error_occurred.emit(f"处理文件失败: {txt_file} - {str(e)}")
+                    txt_file, image_path, image_size, error, warnings = result[:5]
+                    done += 1
+                    for category, message in warnings:
+                        self.report.add(category, txt_file, message)
+                    if error:
+                        category, message = error
+                        self.report.add(category, txt_file if category == "处理文件失败" else image_path, message)
+                    elif coco_writer:
+                        invalid = coco_writer.add_image(
+                            os.path.basename(image_path), image_size[0], image_size[1], result[5]
+                        )
+                        if invalid:
+                            self.report.add("类别id超出范围", txt_file,
+                                            f"类别 {sorted(set(invalid))} 不在 labels.txt 中 (共 {len(self.labels)} 类)，"
+                                            f"跳过 {len(invalid)} 个目标")
+                    elif checkpoint:
+                        # 出错的文件不记录，继续任务时重新转换
+                        checkpoint.add(txt_file)
+                    if image_size and size_cache and image_path in uncached:
+                        size_cache.store(image_path, index.stat(image_path), image_size)
+                    self.report_progress(done, total_files)
+                
+                if coco_writer and not self.canceled:
+                    coco_writer.close()
+            finally:
+                if coco_writer:
+                    # 取消或出错时删除未写完的文件
+                    coco_writer.abort()
+                if executor:
+                    # 取消尚未开始的任务，不等待正在执行的任务
+                    executor.shutdown(wait=False, cancel_futures=True)
+                if size_cache:
+                    size_cache.flush()
             
+            # 全部完成后删除检查点，取消时保留以便下次继续
+            if checkpoint and not self.canceled:
+                checkpoint.remove()
+            self.report_progress(done, total_files, force=True)
             self.finished.emit()
             
         except Exception as e:
             self.error_occurred.emit(f"转换过程中出错: {str(e)}")
             self.finished.emit()
+        finally:
+            if checkpoint:
+                checkpoint.close()
 
-    def find_image_file(self, directory, base_name):
-        image_extensions = ['.jpg', '.jpeg', '.png', '.bmp', '.tiff', '.gif']
-        for ext in image_extensions:
-            image_path = os.path.join(directory, base_name + ext)
-            if os.path.exists(image_path):
-                return image_path
-        return None
+    def report_progress(self, current, total, force=False):
+        # 限制进度信号的发送频率，避免大量信号堵塞界面线程
+        now = time.monotonic()
+        if force or now - self._last_progress >= self.PROGRESS_INTERVAL:
+            self._last_progress = now
+            self.progress_updated.emit(current, total)
 
     def cancel(self):
-        self.canceled = True
+        self.control.cancel()
+
+    def pause(self):
+        self.control.pause()
+
+    def resume(self):
+        self.control.resume()
 
 class YoloToJsonConverter(QMainWindow):
     def __init__(self):
@@ -181,6 +239,33 @@ class YoloToJsonConverter(QMainWindow):
         json_layout.addWidget(self.json_btn)
         layout.addLayout(json_layout)
         
+        # 输出格式
+        format_layout = QHBoxLayout()
+        format_layout.addWidget(QLabel("输出格式:"))
+        self.format_combo = QComboBox()
+        self.format_combo.addItems(["LabelMe JSON（每张图片一个文件）", "COCO annotations.json（单个文件）"])
+        format_layout.addWidget(self.format_combo)
+        format_layout.addWidget(QLabel("每个文件最多图片数:"))
+        self.shard_spin = QSpinBox()
+        self.shard_spin.setRange(0, 10000000)
+        self.shard_spin.setSingleStep(10000)
+        self.shard_spin.setSpecialValueText("不分片")
+        format_layout.addWidget(self.shard_spin)
+        layout.addLayout(format_layout)
+        
+        # 输出选项
+        option_layout = QHBoxLayout()
+        self.compact_check = QCheckBox("紧凑 JSON（去掉空字段、不缩进）")
+        option_layout.addWidget(self.compact_check)
+        option_layout.addWidget(QLabel("坐标小数位:"))
+        self.precision_spin = QSpinBox()
+        self.precision_spin.setRange(-1, 10)
+        self.precision_spin.setValue(-1)
+        self.precision_spin.setSpecialValueText("不取舍")
+        option_layout.addWidget(self.precision_spin)
+        option_layout.addStretch()
+        layout.addLayout(option_layout)
+        
         # 进度条
         self.progress_label = QLabel("准备就绪")
         layout.addWidget(self.progress_label)
@@ -201,9 +286,15 @@ class YoloToJsonConverter(QMainWindow):
         self.cancel_btn.setEnabled(False)
         self.cancel_btn.clicked.connect(self.cancel_conversion)
         button_layout.addWidget(self.cancel_btn)
+        
+        self.pause_btn = QPushButton("暂停")
+        self.pause_btn.setEnabled(False)
+        self.pause_btn.clicked.connect(self.toggle_pause)
+        button_layout.addWidget(self.pause_btn)
         layout.addLayout(button_layout)
         
         self.thread = None
+        self.error_dialog = None
 
     def select_labels_file(self):
         path, _ = QFileDialog.getOpenFileName(
@@ -241,13 +332,33 @@ class YoloToJsonConverter(QMainWindow):
             
         if not os.path.exists(json_dir):
             os.makedirs(json_dir)
+        
+        precision = self.precision_spin.value()
+        thread = ConverterThread(
+            labels_path, txt_dir, json_dir,
+            compact=self.compact_check.isChecked(),
+            precision=precision if precision >= 0 else None,
+            output_format="coco" if self.format_combo.currentIndex() == 1 else "labelme",
+            shard_size=self.shard_spin.value() or None
+        )
+        
+        # 保存目录中有相同参数的未完成任务时，询问是否跳过已完成的文件
+        pending = thread.pending_checkpoint()
+        if pending:
+            answer = QMessageBox.question(
+                self, "继续任务", f"保存目录中有未完成的转换，已完成 {pending} 个文件。\n是否跳过已完成的文件继续转换？",
+                QMessageBox.Yes | QMessageBox.No, QMessageBox.Yes
+            )
+            thread.resume_checkpoint = answer == QMessageBox.Yes
             
         self.progress_bar.setValue(0)
         self.progress_label.setText("开始转换...")
         self.convert_btn.setEnabled(False)
         self.cancel_btn.setEnabled(True)
+        self.pause_btn.setEnabled(True)
+        self.pause_btn.setText("暂停")
         
-        self.thread = ConverterThread(labels_path, txt_dir, json_dir)
+        self.thread = thread
         self.thread.progress_updated.connect(self.update_progress)
         self.thread.finished.connect(self.conversion_finished)
         self.thread.error_occurred.connect(self.show_error)
@@ -257,21 +368,49 @@ class YoloToJsonConverter(QMainWindow):
         if total > 0:
             percent = int(current / total * 100)
             self.progress_bar.setValue(percent)
-            self.progress_label.setText(f"处理中: {current}/{total} 文件 ({percent}%)")
+            text = f"处理中: {current}/{total} 文件 ({percent}%)"
+            if self.thread and self.thread.report.total:
+                text += f"，错误 {self.thread.report.total} 个"
+            self.progress_label.setText(text)
 
     def conversion_finished(self):
-        self.progress_label.setText("转换完成！")
+        thread = self.thread
+        report = thread.report if thread else None
+        message = "转换已取消" if thread and thread.canceled else "转换完成！"
+        self.progress_label.setText(message)
         self.convert_btn.setEnabled(True)
         self.cancel_btn.setEnabled(False)
+        self.pause_btn.setEnabled(False)
+        self.pause_btn.setText("暂停")
         self.thread = None
+        if thread:
+            # finished 是 run 中最后发出的信号，这里只等待线程退出，不会阻塞界面
+            thread.wait()
+        
+        # 所有错误汇总后只显示一次，窗口为非模态
+        if report and report.total:
+            self.progress_label.setText(f"{message} 共 {report.total} 个错误")
+            self.error_dialog = ErrorReportDialog(report, self)
+            self.error_dialog.show()
 
     def cancel_conversion(self):
+        # 只发出取消请求，不在界面线程中等待；线程结束后由 conversion_finished 更新界面
         if self.thread and self.thread.isRunning():
             self.thread.cancel()
-            self.thread.wait()
-            self.progress_label.setText("转换已取消")
-            self.convert_btn.setEnabled(True)
             self.cancel_btn.setEnabled(False)
+            self.pause_btn.setEnabled(False)
+            self.progress_label.setText("正在取消...")
+
+    def toggle_pause(self):
+        if not (self.thread and self.thread.isRunning()):
+            return
+        if self.thread.control.paused:
+            self.thread.resume()
+            self.pause_btn.setText("暂停")
+        else:
+            self.thread.pause()
+            self.pause_btn.setText("继续")
+            self.progress_label.setText("已暂停")
 
     def show_error(self, message):
         QMessageBox.critical(self, "错误", message)
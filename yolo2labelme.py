@@ -0,0 +1,102 @@
+import os
+from image_size import probe_image_size
+from yolo_label import read_yolo_labels, label_warnings, xywhn_to_xyxy, class_ids
+from labelme_json import write_labelme
+from job_control import set_worker_control, worker_canceled
+
+
+# 子进程中共享的转换参数，由 init_worker 设置，避免每个任务重复传递类别列表
+_labels = []
+_json_dir = ''
+_compact = False
+_precision = None
+
+
+def init_worker(labels, json_dir, compact=False, precision=None, control=None):
+    '''
+    设置转换参数
+    ·labels     类别名称列表
+    ·json_dir   JSON 保存目录
+    ·compact    是否输出紧凑 JSON (去掉默认字段、不缩进)
+    ·precision  坐标保留的小数位数，None 表示不取舍
+    ·control    JobControl，用于暂停和取消，None 表示不控制
+    '''
+    global _labels, _json_dir, _compact, _precision
+    _labels = labels
+    _json_dir = json_dir
+    _compact = compact
+    _precision = precision
+    set_worker_control(control)
+
+
+def convert_yolo_file(task):
+    '''
+    把一个 YOLO txt 标签转换为 LabelMe JSON 文件，可在进程池中执行
+    ·task       (txt文件路径, 图片路径, 图片尺寸或 None)，尺寸为 None 时在子进程中解析文件头
+    ·return     (txt文件路径, 图片路径, 图片尺寸, 错误, 警告)，错误为 (类别, 详细信息)，成功时为 None；
+                警告为 [(类别, 详细信息), ...]，例如多于 5 列被截断的行，文件仍然正常转换
+    '''
+    txt_file, image_path, image_size = task
+    # 暂停时等待；任务已取消时不再处理，调用方会丢弃这个结果
+    if worker_canceled():
+        return txt_file, image_path, image_size, None, []
+    base_name = os.path.splitext(os.path.basename(txt_file))[0]
+
+    # 获取图片尺寸
+    if image_size is None:
+        try:
+            image_size = probe_image_size(image_path)
+        except Exception as e:
+            return txt_file, image_path, None, ("无法读取图片尺寸", str(e)), []
+    img_width, img_height = image_size
+
+    # 创建JSON数据结构
+    json_data = {
+        "version": "2.4.4",
+        "flags": {},
+        "shapes": [],
+        "imagePath": os.path.basename(image_path),
+        "imageData": None,
+        "imageHeight": img_height,
+        "imageWidth": img_width,
+        "description": ""
+    }
+
+    # 处理YOLO标签
+    try:
+        # 一次读取整个标签文件，并用数组运算转换为绝对坐标的矩形框
+        labels, truncated, skipped = read_yolo_labels(txt_file, with_stats=True)
+        boxes = xywhn_to_xyxy(labels, img_width, img_height)
+        if _precision is not None:
+            boxes = boxes.round(_precision)
+        boxes = boxes.tolist()
+
+        for class_id, (x_min, y_min, x_max, y_max) in zip(class_ids(labels).tolist(), boxes):
+            # 创建矩形框
+            shape = {
+                "kie_linking": [],
+                "label": _labels[class_id] if class_id < len(_labels) else str(class_id),
+                "score": 1.0,
+                "points": [
+                    [x_min, y_min],
+                    [x_max, y_min],
+                    [x_max, y_max],
+                    [x_min, y_max]
+                ],
+                "group_id": None,
+                "description": None,
+                "difficult": False,
+                "shape_type": "rectangle",
+                "flags": {},
+                "attributes": {}
+            }
+            json_data["shapes"].append(shape)
+
+        # 保存JSON文件
+        json_path = os.path.join(_json_dir, f"{base_name}.json")
+        write_labelme(json_data, json_path, compact=_compact, indent=2)
+
+    except Exception as e:
+        return txt_file, image_path, image_size, ("处理文件失败", str(e)), []
+
+    return txt_file, image_path, image_size, None, label_warnings(truncated, skipped)
@@ -0,0 +1,105 @@
+import numpy as np
+
+
+def parse_yolo_text(text, with_stats=False):
+    '''
+    解析 YOLO txt 标签内容
+    兼容空行、行尾空白以及最后一行没有换行符的文件；列数不足 5 的行被跳过，
+    多于 5 列时 (例如分割多边形或带置信度) 只取前 5 列
+    ·text       标签文件内容
+    ·with_stats 是否同时返回被截断和被跳过的行数
+    ·return     (N, 5) float64 数组，每行为 [类别, cx, cy, w, h] (归一化坐标)；
+                with_stats 时为 (数组, 多于 5 列的行数, 跳过的行数)
+    '''
+    # 每行只切分一次，快速路径和兼容路径共用
+    rows = [parts for parts in (line.split() for line in text.splitlines()) if parts]
+    widths = set(map(len, rows))
+    if widths == {5}:
+        # 快速路径：每个非空行恰好 5 列，整体一次转换为数组
+        try:
+            labels = np.array(rows, dtype=np.float64)
+            return (labels, 0, 0) if with_stats else labels
+        except ValueError:
+            pass
+
+    # 兼容路径：逐行取前 5 列，跳过列数不足或无法解析的行
+    values = []
+    truncated = 0
+    for parts in rows:
+        if len(parts) < 5:
+            continue
+        try:
+            values.append([float(p) for p in parts[:5]])
+        except ValueError:
+            continue
+        truncated += len(parts) > 5
+    labels = np.array(values, dtype=np.float64) if values else np.zeros((0, 5), dtype=np.float64)
+    return (labels, truncated, len(rows) - len(values)) if with_stats else labels
+
+
+def read_yolo_labels(label_path, with_stats=False):
+    '''
+    读取 YOLO txt 标签文件
+    ·label_path 标签文件路径
+    ·with_stats 是否同时返回被截断和被跳过的行数，见 parse_yolo_text
+    ·return     (N, 5) float64 数组，每行为 [类别, cx, cy, w, h] (归一化坐标)
+    '''
+    with open(label_path, 'r') as f:
+        return parse_yolo_text(f.read(), with_stats)
+
+
+def label_warnings(truncated, skipped):
+    '''
+    把 parse_yolo_text 的统计转换为错误报告的条目
+    ·return     [(类别, 详细信息), ...]，没有问题时为空列表
+    '''
+    warnings = []
+    if truncated:
+        warnings.append(("标签行多于 5 列", f"{truncated} 行只使用了前 5 列 (分割多边形或置信度被忽略)"))
+    if skipped:
+        warnings.append(("标签行无法解析", f"{skipped} 行列数不足或不是数字，已跳过"))
+    return warnings
+
+
+def xywhn_to_xyxy(labels, img_width, img_height, pad_x=0, pad_y=0, clip=False):
+    '''
+    归一化的中心点宽高坐标转换为像素坐标的左上右下角点
+    ·labels     (N, 5) 标签数组或 (N, 4) 的 [cx, cy, w, h] 数组
+    ·img_width  图片宽度
+    ·img_height 图片高度
+    ·pad_x      x方向外扩像素数
+    ·pad_y      y方向外扩像素数
+    ·clip       是否限制在图片范围内
+    ·return     (N, 4) float64 数组，每行为 [xmin, ymin, xmax, ymax]
+    '''
+    xywh = np.asarray(labels, dtype=np.float64)
+    if xywh.shape[1] == 5:
+        xywh = xywh[:, 1:]
+    scale = np.array([img_width, img_height, img_width, img_height], dtype=np.float64)
+    cx, cy, w, h = (xywh * scale).T
+
+    boxes = np.empty((len(xywh), 4), dtype=np.float64)
+    boxes[:, 0] = cx - w / 2 - pad_x
+    boxes[:, 1] = cy - h / 2 - pad_y
+    boxes[:, 2] = cx + w / 2 + pad_x
+    boxes[:, 3] = cy + h / 2 + pad_y
+    if clip:
+        np.clip(boxes, 0, scale, out=boxes)
+    return boxes
+
+
+def xyxy_to_int(boxes, img_width, img_height):
+    '''
+    像素坐标取整 (向零截断，与 int() 一致) 并限制在图片范围内，用于裁剪
+    ·boxes      (N, 4) 数组，每行为 [xmin, ymin, xmax, ymax]
+    ·return     (N, 4) int64 数组
+    '''
+    scale = np.array([img_width, img_height, img_width, img_height], dtype=np.float64)
+    return np.clip(np.trunc(boxes), 0, scale).astype(np.int64)
+
+
+def class_ids(labels):
+    '''
+    标签数组的类别列，转换为 int64
+    '''
+    return np.asarray(labels)[:, 0].astype(np.int64)
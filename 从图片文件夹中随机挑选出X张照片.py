@@ -1,39 +1,219 @@
 import os
+import math
 import random
-import shutil
+import argparse
+from file_transfer import DEFAULT_WORKERS, transfer_files, print_progress
+from image_hash import HASH_METHODS, compute_hashes, select_distinct
 
-def copy_random_images(source_folder, destination_folder, num_images=100):
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.bmp', '.gif')
+LABEL_EXTENSIONS = ('.txt', '.json', '.xml')
+# 默认随机种子，不指定时每次运行结果也相同
+DEFAULT_SEED = 0
+# 只挑选互不相似的图片时，先多抽取几倍的候选再去掉相似的
+DISTINCT_OVERSAMPLE = 4
+
+
+class Reservoir:
+    '''
+    蓄水池抽样 (Algorithm L)：从未知长度的序列中等概率抽取 k 个，内存只与 k 有关
+    需要替换的位置按几何分布跳跃生成，大部分元素只做一次计数比较
+    ·k      抽样数
+    ·rng    random.Random 实例
+    '''
+
+    def __init__(self, k, rng):
+        self.k = k
+        self.rng = rng
+        self.items = []
+        self.seen = 0
+        self._w = 1.0
+        self._next = 0
+
+    def _skip(self):
+        # 1 - random() 取值 (0, 1]，避免 log(0)
+        self._w *= math.exp(math.log(1.0 - self.rng.random()) / self.k)
+        self._next += math.floor(math.log(1.0 - self.rng.random()) / math.log1p(-self._w)) + 1
+
+    def add(self, item):
+        self.seen += 1
+        if self.k <= 0:
+            return
+        if len(self.items) < self.k:
+            self.items.append(item)
+            if len(self.items) == self.k:
+                self._next = self.seen
+                self._skip()
+        elif self.seen == self._next:
+            self.items[self.rng.randrange(self.k)] = item
+            self._skip()
+
+
+def iter_images(folder, recursive=True, extensions=IMAGE_EXTENSIONS):
+    '''
+    用 os.scandir 逐个生成图片路径，不需要先列出整个目录树
+    每个目录的条目按文件名排序，顺序与文件系统无关，目录复制到其他磁盘或机器后抽样结果不变
+    ·return     (第一级子文件夹名，根目录中的图片为 '', 图片路径) 的迭代器
+    '''
+    stack = [(folder, '')]
+    while stack:
+        path, group = stack.pop()
+        try:
+            with os.scandir(path) as it:
+                entries = sorted(it, key=lambda entry: entry.name)
+        except OSError as e:
+            print(f"无法读取文件夹 {path}: {e}")
+            continue
+        subdirs = []
+        for entry in entries:
+            if entry.is_dir(follow_symlinks=False):
+                if recursive:
+                    subdirs.append((entry.path, group or entry.name))
+            elif entry.name.lower().endswith(extensions):
+                yield group, entry.path
+        # 倒序入栈，子文件夹按名称顺序遍历
+        stack.extend(reversed(subdirs))
+
+
+def allocate(counts, num_images, weights=None):
+    '''
+    按权重把抽样数分配给各子文件夹，图片不够的子文件夹全部选中，剩余名额分给其他子文件夹
+    ·counts     {子文件夹: 图片数}
+    ·num_images 总抽样数
+    ·weights    {子文件夹: 权重}，未列出的子文件夹权重为 1
+    ·return     {子文件夹: 抽样数}
+    '''
+    # 全部按子文件夹名排序处理，结果与集合顺序 (随进程变化的字符串哈希) 无关
+    weights = weights or {}
+    quotas = {}
+    active = sorted(group for group, count in counts.items() if count > 0 and weights.get(group, 1) > 0)
+    remaining = num_images
+    while active and remaining > 0:
+        total = sum(weights.get(group, 1) for group in active)
+        shares = {group: remaining * weights.get(group, 1) / total for group in active}
+        full = [group for group in active if counts[group] <= shares[group]]
+        if not full:
+            # 先取整数部分，余下的名额按小数部分从大到小分配，小数部分相同时按名称
+            for group in active:
+                quotas[group] = int(shares[group])
+            left = remaining - sum(quotas[group] for group in active)
+            for group in sorted(active, key=lambda g: (-(shares[g] - int(shares[g])), g))[:left]:
+                quotas[group] += 1
+            break
+        for group in full:
+            quotas[group] = counts[group]
+            remaining -= counts[group]
+        active = [group for group in active if group not in full]
+    return {group: quotas[group] for group in sorted(quotas)}
+
+
+def find_labels(image_path, extensions=LABEL_EXTENSIONS):
+    # 与图片同名的标签文件
+    stem = os.path.splitext(image_path)[0]
+    return [stem + ext for ext in extensions if os.path.exists(stem + ext)]
+
+
+def copy_random_images(source_folder, destination_folder, num_images=100, seed=DEFAULT_SEED, recursive=True,
+                       balance=False, weights=None, with_labels=True, workers=DEFAULT_WORKERS,
+                       distinct_radius=None, hash_method='dhash'):
+    '''
+    从文件夹 (包括子文件夹) 中随机挑选图片复制到目标文件夹
+    边遍历边抽样，不需要整个目录树的完整列表，内存只与抽样数、子文件夹数和单个目录的条目数有关
+    ·source_folder      源文件夹
+    ·destination_folder 目标文件夹，子文件夹中的图片以 "子文件夹_文件名" 命名，避免重名
+    ·num_images         抽样数，图片不足时全部复制
+    ·seed               随机种子，相同的目录内容和种子得到相同的结果；None 时随机生成并打印出来
+    ·recursive          是否遍历子文件夹
+    ·balance            按第一级子文件夹均衡抽样，否则所有图片等概率
+    ·weights            {第一级子文件夹名: 权重}，设置后按权重分配抽样数 (根目录中的图片为 '')
+    ·with_labels        是否同时复制同名的标签文件 (.txt/.json/.xml)
+    ·workers            复制线程数
+    ·distinct_radius    设置后只挑选感知哈希距离大于该值的图片，避免挑出几乎相同的相邻帧；
+                        候选为抽样数的 DISTINCT_OVERSAMPLE 倍，相似图片过多时可能少于抽样数
+    ·hash_method        感知哈希方法 dhash/phash
+    '''
     # 检查源文件夹是否存在
     if not os.path.exists(source_folder):
         print(f"源文件夹 {source_folder} 不存在")
         return
-    
-    # 获取源文件夹中的所有图片文件
-    image_files = [f for f in os.listdir(source_folder) if f.lower().endswith(('.png', '.jpg', '.jpeg', '.bmp', '.gif'))]
-    
+
+    if seed is None:
+        seed = random.randrange(2 ** 31)
+    print(f"随机种子: {seed}")
+    rng = random.Random(seed)
+    num_candidates = num_images if distinct_radius is None else num_images * DISTINCT_OVERSAMPLE
+    if balance or weights:
+        # 每个子文件夹各保留一个蓄水池，遍历结束后再按图片数和权重分配名额
+        # 每个子文件夹使用由 (seed, 子文件夹) 确定的独立随机数，不受各子文件夹交替遍历的顺序影响
+        reservoirs = {}
+        for group, path in iter_images(source_folder, recursive):
+            reservoir = reservoirs.get(group)
+            if reservoir is None:
+                reservoir = reservoirs[group] = Reservoir(num_candidates, random.Random(f"{seed}:{group}"))
+            reservoir.add((group, path))
+        total = sum(reservoir.seen for reservoir in reservoirs.values())
+        quotas = allocate({group: r.seen for group, r in reservoirs.items()}, num_candidates, weights)
+        selected_images = []
+        for group, quota in quotas.items():
+            selected_images += reservoirs[group].rng.sample(reservoirs[group].items, quota)
+    else:
+        reservoir = Reservoir(num_candidates, rng)
+        for item in iter_images(source_folder, recursive):
+            reservoir.add(item)
+        total = reservoir.seen
+        selected_images = reservoir.items
+
+    if distinct_radius is not None:
+        # 候选打乱后按顺序贪心选择，与已选图片都不相似才选中
+        rng.shuffle(selected_images)
+        hashes, valid = compute_hashes([image for _, image in selected_images], hash_method)
+        keep = select_distinct(hashes, distinct_radius, valid, limit=num_images)
+        print(f"{len(selected_images)} 张候选中选出 {len(keep)} 张互不相似的图片")
+        selected_images = [selected_images[i] for i in keep]
+
     # 检查是否有足够的图片文件
-    if len(image_files) < num_images:
-        print(f"源文件夹中只有 {len(image_files)} 张图片，少于所需的 {num_images} 张图片")
-        return
-    
-    # 随机选择指定数量的图片
-    selected_images = random.sample(image_files, num_images)
-    
+    if total < num_images:
+        print(f"源文件夹中只有 {total} 张图片，少于所需的 {num_images} 张图片，全部复制")
+
+    # 子文件夹中的图片在文件名前加上相对路径，标签与图片同名
+    pairs = []
+    for group, image in selected_images:
+        relative = os.path.relpath(os.path.dirname(image), source_folder)
+        prefix = '' if relative == os.curdir else relative.replace(os.sep, '_') + '_'
+        pairs.append((image, os.path.join(destination_folder, prefix + os.path.basename(image))))
+        if with_labels:
+            for label in find_labels(image):
+                pairs.append((label, os.path.join(destination_folder, prefix + os.path.basename(label))))
+
     # 创建目标文件夹（如果不存在）
-    if not os.path.exists(destination_folder):
-        os.makedirs(destination_folder)
-    
-    # 复制选中的图片到目标文件夹
-    for image in selected_images:
-        source_path = os.path.join(source_folder, image)
-        destination_path = os.path.join(destination_folder, image)
-        shutil.copy2(source_path, destination_path)
-        print(f"已复制: {image}")
-    
-    print(f"成功复制 {num_images} 张图片到 {destination_folder}")
-
-# 示例用法
-source_folder = './机车'  # 替换为你的源文件夹路径
-destination_folder = './100'  # 替换为你的目标文件夹路径
-
-copy_random_images(source_folder, destination_folder, num_images=100)
\ No newline at end of file
+    os.makedirs(destination_folder, exist_ok=True)
+
+    # 多线程复制选中的图片到目标文件夹
+    stats = transfer_files(pairs, preserve=True, workers=workers, progress=print_progress)
+    print()
+    for src, _, error in stats.errors:
+        print(f"复制失败: {src}: {error}")
+
+    print(f"从 {total} 张图片中选出 {len(selected_images)} 张，成功复制 {stats.files} 个文件到 {destination_folder}")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='从图片文件夹中随机挑选出X张照片')
+    parser.add_argument('--source', default='./机车', help='源文件夹路径')
+    parser.add_argument('--dest', default='./100', help='目标文件夹路径')
+    parser.add_argument('--num', type=int, default=100, help='挑选的图片数')
+    parser.add_argument('--seed', type=int, default=DEFAULT_SEED, help='随机种子，相同的目录内容和种子得到相同的结果')
+    parser.add_argument('--flat', action='store_true', help='只挑选源文件夹第一层的图片，不遍历子文件夹')
+    parser.add_argument('--balance', action='store_true', help='按第一级子文件夹均衡挑选')
+    parser.add_argument('--weight', nargs=2, action='append', metavar=('子文件夹', '权重'), default=None,
+                        help='子文件夹的抽样权重，可以设置多次')
+    parser.add_argument('--no-labels', action='store_true', help='不复制同名的标签文件')
+    parser.add_argument('--workers', type=int, default=DEFAULT_WORKERS, help='复制线程数')
+    parser.add_argument('--distinct', type=int, default=None, metavar='RADIUS',
+                        help='只挑选互不相似的图片，值为感知哈希的汉明距离阈值')
+    parser.add_argument('--hash-method', default='dhash', choices=HASH_METHODS, help='感知哈希方法')
+    args = parser.parse_args()
+
+    weights = {name: float(w) for name, w in args.weight} if args.weight else None
+    copy_random_images(args.source, args.dest, num_images=args.num, seed=args.seed, recursive=not args.flat,
+                       balance=args.balance, weights=weights, with_labels=not args.no_labels, workers=args.workers,
+                       distinct_radius=args.distinct, hash_method=args.hash_method)
@@ -1,90 +1,224 @@
-import shutil
-import random
 import os
+import json
 import argparse
+import numpy as np
+import yaml
+from dataset_index import DatasetIndex
+from file_transfer import COPY_MODES, DEFAULT_WORKERS, transfer_files, print_progress
+from class_names import load_class_names
+from image_hash import HASH_METHODS, compute_hashes, near_duplicate_groups
+from split_engine import SPLIT_NAMES, random_split, hash_split, group_split, incremental_group_split, stratified_split, class_histograms, split_class_counts
 
 # 检查文件夹是否存在
 def mkdir(path):
     if not os.path.exists(path):
         os.makedirs(path)
 
-def main(data_dir, save_dir):
-    # 创建文件夹
+def print_class_counts(histograms, assignment, ratios):
+    # 打印每个划分中各类别的目标数，检查稀有类别是否进入了验证集
+    counts = split_class_counts(histograms, assignment)
+    active = [s for s in range(len(SPLIT_NAMES)) if ratios[s] > 0]
+    print("类别\t" + "\t".join(SPLIT_NAMES[s] for s in active))
+    for c in range(counts.shape[1]):
+        if counts[:, c].any():
+            print(f"{c}\t" + "\t".join(str(counts[s, c]) for s in active))
+
+# 只写路径清单、不落地文件的方式
+MANIFEST_MODE = 'manifest'
+# 增量划分的状态文件，保存在 save_dir 中
+STATE_NAME = '.split_state.json'
+
+def file_signature(path):
+    st = os.stat(path)
+    return [st.st_size, st.st_mtime_ns]
+
+def load_state(save_dir):
+    '''
+    读取上次增量划分的状态
+    ·return: {文件名(不含后缀): [划分下标, 图片文件名, 图片签名, 标签签名]}，不存在或损坏时为空字典
+    '''
+    try:
+        with open(os.path.join(save_dir, STATE_NAME), 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+def save_state(save_dir, state):
+    path = os.path.join(save_dir, STATE_NAME)
+    with open(path + '.part', 'w', encoding='utf-8') as f:
+        json.dump(state, f, ensure_ascii=False, separators=(',', ':'))
+    os.replace(path + '.part', path)
+
+def remove_output(split_dirs, entry, stem):
+    # 删除上次落地到旧划分中的图片和标签
+    img_path, label_path = split_dirs[entry[0]]
+    for path in (os.path.join(img_path, entry[1]), os.path.join(label_path, stem + '.txt')):
+        if os.path.lexists(path):
+            os.remove(path)
+
+def write_dataset_yaml(save_dir, splits, classes=None):
+    '''
+    写出 YOLO 训练用的 data.yaml
+    ·save_dir: 数据集目录
+    ·splits: {划分名称: 相对 save_dir 的图片目录或清单文件}
+    ·classes: 类别文件 (labels.txt 或 yaml)，为空时不写 names
+    '''
+    cfg = {'path': os.path.abspath(save_dir)}
+    cfg.update(splits)
+    if classes:
+        cfg['names'] = {i: name for name, i in sorted(load_class_names(classes).items(), key=lambda item: item[1])}
+    else:
+        print("未指定类别文件，data.yaml 中没有 names，训练前需要补充")
+    with open(os.path.join(save_dir, 'data.yaml'), 'w', encoding='utf-8') as f:
+        yaml.safe_dump(cfg, f, allow_unicode=True, sort_keys=False)
+
+def duplicate_groups(index, txt_files, radius, window=None, method='dhash', workers=None):
+    '''
+    按图片的感知哈希把近似重复的样本分组，没有图片的标签单独成组
+    ·return: (n,) int64 数组，每个标签所在组的代表下标
+    '''
+    image_paths = [index.find_image(os.path.basename(path)[:-4]) for path in txt_files]
+    found = np.array([i for i, path in enumerate(image_paths) if path is not None], dtype=np.int64)
+    hashes, valid = compute_hashes([image_paths[i] for i in found], method, workers)
+    groups = np.arange(len(txt_files), dtype=np.int64)
+    if len(found):
+        groups[found] = found[near_duplicate_groups(hashes, radius, valid, window)]
+    print(f"近似重复分组：{len(found)} 张图片分为 {len(np.unique(groups[found]))} 组")
+    return groups
+
+def main(data_dir, save_dir, ratios=(0.8, 0.2, 0.0), seed=0, stratify=False, workers=None, mode='copy', classes=None,
+         incremental=False, transfer_workers=DEFAULT_WORKERS, group_radius=None, group_window=None, hash_method='dhash'):
+    '''
+    划分数据集
+    ·data_dir: 图片和 txt 标签所在目录
+    ·save_dir: 保存路径，生成 images/{train,val,test} 和 labels/{train,val,test}
+    ·ratios: (train, val, test) 比例，test 为 0 时不生成测试集
+    ·seed: 随机种子，相同的数据和 seed 得到相同的划分
+    ·stratify: 按类别分层划分，需要读取所有标签
+    ·workers: 读取标签的进程数，默认使用全部CPU核心
+    ·mode: 文件落地方式 copy/hardlink/symlink/reflink，链接失败时退回复制；
+           manifest 只写 train.txt/val.txt 图片路径清单，不复制文件 (标签需与图片在同一目录)
+    ·classes: 类别文件 (labels.txt 或 yaml)，写入 data.yaml 的 names
+    ·incremental: 按文件名哈希划分，新增样本不改变已有样本的划分；
+                  只处理上次运行后新增或修改的文件，并删除源目录中已不存在的文件
+    ·transfer_workers: 复制文件的线程数
+    ·group_radius: 设置后按感知哈希把近似重复的图片 (例如相邻帧) 分为一组，同一组分到同一个划分
+    ·group_window: 分组时只与之后 N 张图片比较 (按文件名排序)，None 时两两比较
+    ·hash_method: 感知哈希方法 dhash/phash
+    '''
+    manifest = mode == MANIFEST_MODE
+    if not manifest and mode not in COPY_MODES:
+        raise ValueError(f"不支持的方式: {mode}")
+    if incremental and stratify:
+        raise ValueError("增量划分不支持按类别分层")
+    if group_radius is not None and stratify:
+        raise ValueError("近似重复分组不支持按类别分层")
+
+    # 创建文件夹，比例为 0 的划分不创建
     mkdir(save_dir)
     images_dir = os.path.join(save_dir, 'images')
     labels_dir = os.path.join(save_dir, 'labels')
-
-    img_train_path = os.path.join(images_dir, 'train')
-    img_test_path = os.path.join(images_dir, 'test')
-    img_val_path = os.path.join(images_dir, 'val')
-
-    label_train_path = os.path.join(labels_dir, 'train')
-    label_test_path = os.path.join(labels_dir, 'test')
-    label_val_path = os.path.join(labels_dir, 'val')
-
-    mkdir(images_dir)
-    mkdir(labels_dir)
-    mkdir(img_train_path)
-    # mkdir(img_test_path)
-    mkdir(img_val_path)
-    mkdir(label_train_path)
-    # mkdir(label_test_path)
-    mkdir(label_val_path)
-
-    # 数据集划分比例，训练集75%，验证集15%，测试集15%，按需修改
-    train_percent = 0.8
-    val_percent = 0.2
-
-    all_files = os.listdir(data_dir)
-    txt_files = [f for f in all_files if f.endswith('.txt')]
+    split_dirs = []
+    for name, ratio in zip(SPLIT_NAMES, ratios):
+        img_path = os.path.join(images_dir, name)
+        label_path = os.path.join(labels_dir, name)
+        if ratio > 0 and not manifest:
+            mkdir(img_path)
+            mkdir(label_path)
+        split_dirs.append((img_path, label_path))
+
+    # 扫描一次目录，建立标签与图片的对应关系
+    index = DatasetIndex(data_dir, image_extensions=['.jpg', '.png'], label_extensions=['.txt'])
+    txt_files = index.label_files('.txt')
     num_txt = len(txt_files)
-    list_all_txt = range(num_txt)  # 范围 range(0, num)
-
-    num_train = int(num_txt * train_percent)
-    num_val = int(num_txt * val_percent)
-
-    train = random.sample(list_all_txt, num_train)
-    # 在全部数据集中取出train
-    val_test = [i for i in list_all_txt if i not in train]
-    # 再从val_test取出num_val个元素，val_test剩下的元素就是test
-    val = random.sample(val_test, num_val)
-
-    print("训练集数目：{}, 验证集数目：{}".format(len(train), len(val)))
-
-    for i in list_all_txt:
-        txt_name = txt_files[i][:-4]  # 去掉.txt后缀
-        img_name_jpg = txt_name + '.jpg'
-        img_name_png = txt_name + '.png'
-
-        srcImage_jpg = os.path.join(data_dir, img_name_jpg)
-        srcImage_png = os.path.join(data_dir, img_name_png)
-        srcLabel = os.path.join(data_dir, txt_files[i])
-
-        if os.path.exists(srcImage_jpg):
-            srcImage = srcImage_jpg
-            img_name = img_name_jpg
-        elif os.path.exists(srcImage_png):
-            srcImage = srcImage_png
-            img_name = img_name_png
+
+    # 每个标签对应一个划分下标，按下标直接分组，整个过程为线性时间
+    groups = None
+    if group_radius is not None:
+        groups = duplicate_groups(index, txt_files, group_radius, group_window, hash_method, workers)
+    track = incremental and not manifest
+    old_state = load_state(save_dir) if track else {}
+    if incremental:
+        stems = [os.path.basename(path)[:-4] for path in txt_files]
+        if groups is not None:
+            # 已有样本保持上次的划分，新样本跟随同组的已有样本，整组都是新样本时按代表的文件名哈希
+            previous = {stem: entry[0] for stem, entry in old_state.items()}
+            assignment = incremental_group_split(stems, groups, previous, ratios, seed)
         else:
-            print(f"Image for {txt_files[i]} not found, skipping.")
+            assignment = hash_split(stems, ratios, seed)
+    elif groups is not None:
+        assignment = group_split(groups, ratios, seed)
+    elif stratify:
+        histograms = class_histograms(txt_files, workers)
+        assignment = stratified_split(histograms, ratios, seed)
+    else:
+        assignment = random_split(num_txt, ratios, seed)
+
+    counts = np.bincount(assignment, minlength=len(SPLIT_NAMES))
+    print("训练集数目：{}, 验证集数目：{}, 测试集数目：{}".format(*counts.tolist()))
+    if stratify:
+        print_class_counts(histograms, assignment, ratios)
+
+    manifests = [[] for _ in SPLIT_NAMES]
+    jobs = []
+    state = {}
+    skipped = 0
+    for srcLabel, split in zip(txt_files, assignment.tolist()):
+        txt_file = os.path.basename(srcLabel)
+        txt_name = txt_file[:-4]  # 去掉.txt后缀
+
+        # 优先使用 jpg，其次 png
+        srcImage = index.find_image(txt_name)
+        if srcImage is None:
+            print(f"Image for {txt_file} not found, skipping.")
             continue
-
-        if i in train:
-            dst_train_Image = os.path.join(img_train_path, img_name)
-            dst_train_Label = os.path.join(label_train_path, txt_files[i])
-            shutil.copyfile(srcImage, dst_train_Image)
-            shutil.copyfile(srcLabel, dst_train_Label)
-        elif i in val:
-            dst_val_Image = os.path.join(img_val_path, img_name)
-            dst_val_Label = os.path.join(label_val_path, txt_files[i])
-            shutil.copyfile(srcImage, dst_val_Image)
-            shutil.copyfile(srcLabel, dst_val_Label)
-        # else:
-        #     dst_test_Image = os.path.join(img_test_path, img_name)
-        #     dst_test_Label = os.path.join(label_test_path, txt_files[i])
-        #     shutil.copyfile(srcImage, dst_test_Image)
-        #     shutil.copyfile(srcLabel, dst_test_Label)
+        if manifest:
+            manifests[split].append(os.path.abspath(srcImage))
+            continue
+        img_name = os.path.basename(srcImage)
+
+        if track:
+            entry = [split, img_name, file_signature(srcImage), file_signature(srcLabel)]
+            state[txt_name] = entry
+            old = old_state.pop(txt_name, None)
+            if old == entry:
+                skipped += 1
+                continue
+            if old is not None and old[:2] != entry[:2]:
+                remove_output(split_dirs, old, txt_name)
+
+        img_path, label_path = split_dirs[split]
+        jobs.append((srcImage, os.path.join(img_path, img_name)))
+        jobs.append((srcLabel, os.path.join(label_path, txt_file)))
+
+    # 多线程落地文件，网络盘上主要耗时在每个文件的延迟
+    stats = transfer_files(jobs, mode, workers=transfer_workers, progress=print_progress)
+    print()
+    for src, dst, error in stats.errors:
+        print(f"Failed: {src} -> {dst}: {error}")
+        # 失败的样本不记录到状态中，下次运行时重新处理
+        state.pop(os.path.splitext(os.path.basename(src))[0], None)
+
+    splits = {}
+    for s, (name, ratio) in enumerate(zip(SPLIT_NAMES, ratios)):
+        if ratio <= 0:
+            continue
+        if manifest:
+            # YOLO 训练支持图片路径清单，按图片路径查找同名 txt 标签
+            with open(os.path.join(save_dir, name + '.txt'), 'w', encoding='utf-8') as f:
+                f.writelines(path + '\n' for path in manifests[s])
+            splits[name] = name + '.txt'
+        else:
+            splits[name] = 'images/' + name
+    write_dataset_yaml(save_dir, splits, classes)
+    if track:
+        # 剩下的是源目录中已删除的样本
+        for stem, entry in old_state.items():
+            remove_output(split_dirs, entry, stem)
+        save_state(save_dir, state)
+        print(f"增量划分：{skipped} 个未变化已跳过，{len(state) - skipped} 个新增或修改，{len(old_state)} 个已删除")
+    if stats.modes['copy'] and mode != 'copy':
+        print(f"{stats.modes['copy']} 个文件无法使用 {mode}，已退回复制")
 
 if __name__ == '__main__':
     """
@@ -93,9 +227,25 @@ if __name__ == '__main__':
     parser = argparse.ArgumentParser(description='split datasets to train, val, test params')
     parser.add_argument('--data-dir', type=str, default=r'F:\Image\车号\长春\侧部车号\侧部车号标注\CB02\02\labels', help='path to the directory containing images and labels')
     parser.add_argument('--save-dir', default=r'F:\Image\车号\长春\侧部车号\侧部车号标注\CB02\02\CB02', type=str, help='directory to save split datasets')
+    parser.add_argument('--train', type=float, default=0.8, help='训练集比例')
+    parser.add_argument('--val', type=float, default=0.2, help='验证集比例')
+    parser.add_argument('--test', type=float, default=0.0, help='测试集比例，为 0 时不生成测试集')
+    parser.add_argument('--seed', type=int, default=0, help='随机种子，相同的数据和种子得到相同的划分')
+    parser.add_argument('--stratify', action='store_true', help='按类别分层划分，保证稀有类别也出现在验证集中')
+    parser.add_argument('--workers', type=int, default=None, help='读取标签的进程数，默认使用全部CPU核心')
+    parser.add_argument('--mode', default='copy', choices=COPY_MODES + (MANIFEST_MODE,),
+                        help='文件落地方式：复制、硬链接、符号链接、reflink，或只写 train.txt/val.txt 清单')
+    parser.add_argument('--transfer-workers', type=int, default=DEFAULT_WORKERS, help='复制文件的线程数')
+    parser.add_argument('--incremental', action='store_true', help='按文件名哈希增量划分，只处理新增或修改的文件')
+    parser.add_argument('--group-radius', type=int, default=None, help='近似重复图片的汉明距离阈值，设置后相似图片分到同一个划分')
+    parser.add_argument('--group-window', type=int, default=None, help='分组时只与之后 N 张图片比较，适合按帧顺序命名的连续拍摄')
+    parser.add_argument('--hash-method', default='dhash', choices=HASH_METHODS, help='感知哈希方法')
+    parser.add_argument('--classes', default=None, help='类别文件 (labels.txt 或 yaml)，写入 data.yaml')
     args = parser.parse_args()
     data_dir = args.data_dir
     save_dir = args.save_dir
 
-    main(data_dir, save_dir)
+    main(data_dir, save_dir, (args.train, args.val, args.test), args.seed, args.stratify, args.workers,
+         args.mode, args.classes, args.incremental, args.transfer_workers,
+         args.group_radius, args.group_window, args.hash_method)
     print("done")
@@ -1,10 +1,102 @@
 import sys
 import os
+import time
+from concurrent.futures import ProcessPoolExecutor
 from PyQt5.QtWidgets import (
     QApplication, QWidget, QVBoxLayout, QHBoxLayout, QLabel, QLineEdit,
-    QPushButton, QTextEdit, QFileDialog, QMessageBox, QCheckBox
+    QPushButton, QTextEdit, QFileDialog, QMessageBox, QCheckBox, QProgressBar
 )
-from PyQt5.QtCore import Qt
+from PyQt5.QtCore import Qt, QThread, pyqtSignal
+from label_remap import ClassMap, init_worker, remap_file
+from error_report import ErrorReport, ErrorReportDialog
+from job_control import JobControl
+
+
+# 默认规则，与原来的固定处理相同：类别 >= 15 时减 1
+DEFAULT_RULES = "15~ -> shift -1"
+
+
+class RemapThread(QThread):
+    '''
+    在后台按映射表修改 txt 标签，文件较多时使用进程池
+    ·input_folder   标签文件夹
+    ·output_folder  输出文件夹，与输入相同时原地修改
+    ·class_map      ClassMap
+    '''
+    PROGRESS_INTERVAL = 0.1   # 进度信号最短间隔 (秒)
+    PARALLEL_THRESHOLD = 200  # 文件数达到该值时才启动进程池
+
+    progress_updated = pyqtSignal(int, int)
+    finished = pyqtSignal()
+    error_occurred = pyqtSignal(str)
+
+    def __init__(self, input_folder, output_folder, class_map, workers=None, parent=None):
+        super().__init__(parent)
+        self.input_folder = input_folder
+        self.output_folder = output_folder
+        self.class_map = class_map
+        self.workers = workers or os.cpu_count() or 1
+        self.control = JobControl()
+        self.report = ErrorReport()
+        self.total = 0
+        self.written = 0
+        self.changed_boxes = 0
+        self.dropped_boxes = 0
+        self._last_progress = 0.0
+
+    @property
+    def canceled(self):
+        return self.control.canceled
+
+    def run(self):
+        executor = None
+        try:
+            with os.scandir(self.input_folder) as it:
+                tasks = [(entry.path, os.path.join(self.output_folder, entry.name))
+                         for entry in it if entry.name.lower().endswith('.txt') and entry.is_file()]
+            self.total = len(tasks)
+            os.makedirs(self.output_folder, exist_ok=True)
+
+            if self.workers > 1 and len(tasks) >= self.PARALLEL_THRESHOLD:
+                executor = ProcessPoolExecutor(
+                    max_workers=self.workers, initializer=init_worker, initargs=(self.class_map, self.control)
+                )
+                chunksize = max(1, min(256, len(tasks) // (self.workers * 8)))
+                results = executor.map(remap_file, tasks, chunksize=chunksize)
+            else:
+                init_worker(self.class_map, self.control)
+                results = map(remap_file, tasks)
+
+            done = 0
+            self.report_progress(done, self.total, force=True)
+            for path, written, changed, dropped, error in results:
+                if self.canceled:
+                    break
+                done += 1
+                if error:
+                    self.report.add("处理文件失败", path, error)
+                self.written += written
+                self.changed_boxes += changed
+                self.dropped_boxes += dropped
+                self.report_progress(done, self.total)
+            self.report_progress(done, self.total, force=True)
+        except Exception as e:
+            self.error_occurred.emit(f"处理过程中发生错误: {str(e)}")
+        finally:
+            if executor:
+                # 取消尚未开始的任务，不等待正在执行的任务
+                executor.shutdown(wait=False, cancel_futures=True)
+        self.finished.emit()
+
+    def report_progress(self, current, total, force=False):
+        # 限制进度信号的发送频率，避免大量信号堵塞界面线程
+        now = time.monotonic()
+        if force or now - self._last_progress >= self.PROGRESS_INTERVAL:
+            self._last_progress = now
+            self.progress_updated.emit(current, total)
+
+    def cancel(self):
+        self.control.cancel()
 
 
 class YOLOAnnotationProcessor(QWidget):
@@ -41,10 +133,39 @@ class YOLOAnnotationProcessor(QWidget):
         self.overwrite_check = QCheckBox("覆盖原始文件（不创建新副本）")
         self.overwrite_check.stateChanged.connect(self.toggle_overwrite)
         
+        # 映射规则，可以手写，也可以由新旧两个类别文件生成
+        rules_layout = QVBoxLayout()
+        rules_layout.addWidget(QLabel("类别映射规则（每行一条：3 -> 5、4,6 -> 4、10 -> drop、15~ -> shift -1、* -> drop）:"))
+        self.rules_edit = QTextEdit()
+        self.rules_edit.setAcceptRichText(False)
+        self.rules_edit.setPlainText(DEFAULT_RULES)
+        rules_layout.addWidget(self.rules_edit)
+        vocab_layout = QHBoxLayout()
+        vocab_layout.addWidget(QLabel("旧类别文件:"))
+        self.old_labels_edit = QLineEdit()
+        vocab_layout.addWidget(self.old_labels_edit)
+        vocab_layout.addWidget(QLabel("新类别文件:"))
+        self.new_labels_edit = QLineEdit()
+        vocab_layout.addWidget(self.new_labels_edit)
+        self.vocab_btn = QPushButton("按类别名称生成规则")
+        self.vocab_btn.clicked.connect(self.rules_from_vocabularies)
+        vocab_layout.addWidget(self.vocab_btn)
+        rules_layout.addLayout(vocab_layout)
+        
         # 处理按钮
+        button_layout = QHBoxLayout()
         self.process_btn = QPushButton("开始处理")
         self.process_btn.setStyleSheet("background-color: #4CAF50; color: white; font-weight: bold;")
         self.process_btn.clicked.connect(self.process_files)
+        button_layout.addWidget(self.process_btn)
+        self.cancel_btn = QPushButton("取消")
+        self.cancel_btn.setEnabled(False)
+        self.cancel_btn.clicked.connect(self.cancel_processing)
+        button_layout.addWidget(self.cancel_btn)
+        
+        # 进度条
+        self.progress_bar = QProgressBar()
+        self.progress_bar.setAlignment(Qt.AlignCenter)
         
         # 日志显示
         log_layout = QVBoxLayout()
@@ -57,7 +178,9 @@ class YOLOAnnotationProcessor(QWidget):
         main_layout.addLayout(input_layout)
         main_layout.addLayout(output_layout)
         main_layout.addWidget(self.overwrite_check)
-        main_layout.addWidget(self.process_btn)
+        main_layout.addLayout(rules_layout)
+        main_layout.addLayout(button_layout)
+        main_layout.addWidget(self.progress_bar)
         main_layout.addLayout(log_layout)
         
         self.setLayout(main_layout)
@@ -65,6 +188,8 @@ class YOLOAnnotationProcessor(QWidget):
         # 状态变量
         self.input_folder = ""
         self.output_folder = ""
+        self.thread = None
+        self.error_dialog = None
     
     def select_input_folder(self):
         folder = QFileDialog.getExistingDirectory(self, "选择输入文件夹")
@@ -89,6 +214,23 @@ class YOLOAnnotationProcessor(QWidget):
             self.output_folder_edit.setEnabled(True)
             self.output_browse_btn.setEnabled(True)
     
+    def rules_from_vocabularies(self):
+        old_path = self.old_labels_edit.text().strip()
+        new_path = self.new_labels_edit.text().strip()
+        if not old_path or not new_path:
+            old_path, _ = QFileDialog.getOpenFileName(self, "选择旧类别文件", "", "类别文件 (*.txt *.yaml *.yml)")
+            if not old_path:
+                return
+            new_path, _ = QFileDialog.getOpenFileName(self, "选择新类别文件", "", "类别文件 (*.txt *.yaml *.yml)")
+            if not new_path:
+                return
+            self.old_labels_edit.setText(old_path)
+            self.new_labels_edit.setText(new_path)
+        try:
+            self.rules_edit.setPlainText(ClassMap.from_vocabularies(old_path, new_path).to_rules())
+        except (OSError, KeyError, ValueError) as e:
+            QMessageBox.warning(self, "警告", f"读取类别文件失败:\n{str(e)}")
+    
     def process_files(self):
         if not self.input_folder:
             QMessageBox.warning(self, "警告", "请先选择输入文件夹！")
@@ -98,64 +240,64 @@ class YOLOAnnotationProcessor(QWidget):
             QMessageBox.warning(self, "警告", "请选择输出文件夹！")
             return
         
+        try:
+            class_map = ClassMap.parse(self.rules_edit.toPlainText())
+        except ValueError as e:
+            QMessageBox.warning(self, "警告", f"映射规则有误:\n{str(e)}")
+            return
+        
         overwrite = self.overwrite_check.isChecked()
+        output_folder = self.input_folder if overwrite else self.output_folder
         self.log_text.clear()
+        self.progress_bar.setValue(0)
+        self.process_btn.setEnabled(False)
+        self.cancel_btn.setEnabled(True)
         
-        try:
-            # 创建输出文件夹（如果不是覆盖模式）
-            if not overwrite and not os.path.exists(self.output_folder):
-                os.makedirs(self.output_folder)
-                self.log_text.append(f"创建输出文件夹: {self.output_folder}")
-            
-            # 获取所有txt文件
-            files = [f for f in os.listdir(self.input_folder) if f.lower().endswith('.txt')]
-            if not files:
-                self.log_text.append("未找到任何txt文件！")
-                return
-            
-            self.log_text.append(f"找到 {len(files)} 个txt文件")
-            processed_count = 0
-            
-            for filename in files:
-                input_path = os.path.join(self.input_folder, filename)
-                output_path = input_path if overwrite else os.path.join(self.output_folder, filename)
-                
-                try:
-                    with open(input_path, 'r') as f:
-                        lines = f.readlines()
-                    
-                    processed_lines = []
-                    for line in lines:
-                        parts = line.strip().split()
-                        if parts:
-                            try:
-                                label = int(parts[0])
-                                # 如果标签值 >= 15，则减1
-                                if label >= 15:
-                                    parts[0] = str(label - 1)
-                                processed_lines.append(" ".join(parts) + "\n")
-                            except ValueError:
-                                processed_lines.append(line)  # 保留无法解析的行
-                    
-                    with open(output_path, 'w') as f:
-                        f.writelines(processed_lines)
-                    
-                    processed_count += 1
-                    self.log_text.append(f"处理完成: {filename}")
-                
-                except Exception as e:
-                    self.log_text.append(f"处理 {filename} 时出错: {str(e)}")
-            
-            self.log_text.append("\n处理完成！")
-            self.log_text.append(f"成功处理 {processed_count}/{len(files)} 个文件")
-            
-            if not overwrite:
-                self.log_text.append(f"处理后的文件已保存到: {self.output_folder}")
+        # 在后台线程中处理，界面只接收节流后的进度
+        self.thread = RemapThread(self.input_folder, output_folder, class_map)
+        self.thread.progress_updated.connect(self.update_progress)
+        self.thread.finished.connect(self.processing_finished)
+        self.thread.error_occurred.connect(self.show_error)
+        self.thread.start()
+    
+    def update_progress(self, current, total):
+        if total > 0:
+            self.progress_bar.setValue(int(current / total * 100))
+    
+    def cancel_processing(self):
+        if self.thread and self.thread.isRunning():
+            self.thread.cancel()
+            self.cancel_btn.setEnabled(False)
+            self.log_text.append("正在取消...")
+    
+    def show_error(self, message):
+        self.log_text.append(message)
+        QMessageBox.critical(self, "错误", message)
+    
+    def processing_finished(self):
+        thread = self.thread
+        self.thread = None
+        self.process_btn.setEnabled(True)
+        self.cancel_btn.setEnabled(False)
+        if thread is None:
+            return
+        # finished 是 run 中最后发出的信号，这里只等待线程退出，不会阻塞界面
+        thread.wait()
         
-        except Exception as e:
-            self.log_text.append(f"处理过程中发生错误: {str(e)}")
-            QMessageBox.critical(self, "错误", f"处理过程中发生错误:\n{str(e)}")
-
+        if thread.total == 0:
+            self.log_text.append("未找到任何txt文件！")
+            return
+        self.log_text.append("处理已取消" if thread.canceled else "处理完成！")
+        self.log_text.append(f"共 {thread.total} 个txt文件，写入 {thread.written} 个，其余内容未变化已跳过")
+        self.log_text.append(f"修改类别 {thread.changed_boxes} 个目标，删除 {thread.dropped_boxes} 个目标")
+        if thread.output_folder != thread.input_folder:
+            self.log_text.append(f"处理后的文件已保存到: {thread.output_folder}")
+        
+        # 所有错误汇总后只显示一次，窗口为非模态
+        if thread.report.total:
+            self.log_text.append(f"共 {thread.report.total} 个错误")
+            self.error_dialog = ErrorReportDialog(thread.report, self)
+            self.error_dialog.show()
 
 if __name__ == "__main__":
     app = QApplication(sys.argv)
@@ -1,6 +1,15 @@
 import os
-import shutil
 import argparse
+from dataset_index import DatasetIndex
+from file_transfer import transfer_files, print_progress
+
+def move_files(pairs):
+    # 多线程移动，同一分区内直接重命名
+    stats = transfer_files(pairs, 'move', progress=print_progress)
+    print()
+    for src, _, error in stats.errors:
+        print(f"Failed: {src}: {error}")
+    print(f"Moved: {stats.files} files")
 
 def filter_images_without_json(src_folder, dst_folder, image_extensions=None):
     if image_extensions is None:
@@ -10,21 +19,11 @@ def filter_images_without_json(src_folder, dst_folder, image_extensions=None):
     if not os.path.exists(dst_folder):
         os.makedirs(dst_folder)
         
-    for filename in os.listdir(src_folder):
-        file_lower = filename.lower()
-        file_path = os.path.join(src_folder, filename)
-        # 若为图片文件
-        if os.path.isfile(file_path) and any(file_lower.endswith(ext) for ext in image_extensions):
-            # 拼接对应的 JSON 文件名（假设 JSON 文件名与图片文件名相同，只是后缀不同）
-            base_name = os.path.splitext(filename)[0]
-            json_filename = base_name + '.json'
-            json_path = os.path.join(src_folder, json_filename)
-            
-            # 如果对应的 JSON 文件不存在，则移动该图片到目标文件夹
-            if not os.path.exists(json_path):
-                dst_path = os.path.join(dst_folder, filename)
-                shutil.move(file_path, dst_path)
-                print(f"Moved: {filename}")
+    # 扫描一次文件夹，在内存中查找没有对应 JSON 文件的图片
+    # （假设 JSON 文件名与图片文件名相同，只是后缀不同）
+    index = DatasetIndex(src_folder, image_extensions=image_extensions, label_extensions=['.json'])
+    pairs = [(file_path, os.path.join(dst_folder, os.path.basename(file_path))) for file_path in index.images_without_label()]
+    move_files(pairs)
 
 
 def filter_json_without_images(src_folder, dst_folder, image_extensions=None):
@@ -35,29 +34,10 @@ def filter_json_without_images(src_folder, dst_folder, image_extensions=None):
     if not os.path.exists(dst_folder):
         os.makedirs(dst_folder)
         
-    for filename in os.listdir(src_folder):
-        file_lower = filename.lower()
-        file_path = os.path.join(src_folder, filename)
-        
-        # 若为 JSON 文件
-        if os.path.isfile(file_path) and file_lower.endswith('.json'):
-            # 获取基础文件名
-            base_name = os.path.splitext(filename)[0]
-            
-            # 检查是否存在对应的图片文件
-            has_image = False
-            for ext in image_extensions:
-                image_filename = base_name + ext
-                image_path = os.path.join(src_folder, image_filename)
-                if os.path.exists(image_path):
-                    has_image = True
-                    break
-            
-            # 如果没有找到对应的图片文件，则移动该 JSON 文件到目标文件夹
-            if not has_image:
-                dst_path = os.path.join(dst_folder, filename)
-                shutil.move(file_path, dst_path)
-                print(f"Moved: {filename}")
+    # 扫描一次文件夹，在内存中查找没有对应图片文件的 JSON 文件
+    index = DatasetIndex(src_folder, image_extensions=image_extensions, label_extensions=['.json'])
+    pairs = [(file_path, os.path.join(dst_folder, os.path.basename(file_path))) for file_path in index.labels_without_image('.json')]
+    move_files(pairs)
 
 
 
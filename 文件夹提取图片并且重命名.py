@@ -1,5 +1,5 @@
 import os
-import shutil
+from file_transfer import transfer_files, print_progress
 
 # 源目录和目标目录
 source_dir = r'G:\Imgs\PlantsImages\changchun\imageResult'
@@ -8,21 +8,28 @@ target_dir = r'G:\Imgs\PlantsImages\changchun\imageResult\CC13'
 # 创建目标目录（如果不存在的话）
 os.makedirs(target_dir, exist_ok=True)
 
-# 图片计数器
-image_counter = 1
+def walk_images(source_dir, target_dir):
+    '''
+    边遍历边生成 (源文件, 重命名后的目标文件)，复制线程不需要等待遍历结束
+    '''
+    # 图片计数器
+    image_counter = 1
+    # 遍历源目录下的所有文件夹和文件
+    for root, dirs, files in os.walk(source_dir):
+        # 目标目录在源目录内时不再遍历它，否则会重复复制已输出的图片
+        dirs[:] = [d for d in dirs if os.path.abspath(os.path.join(root, d)) != os.path.abspath(target_dir)]
+        for file in files:
+            # 这里可以根据需要添加其他图片格式
+            if file.lower().endswith(('.png', '.jpg', '.jpeg', '.bmp', '.gif')):
+                # 构建源文件的完整路径和目标文件的重命名路径
+                yield os.path.join(root, file), os.path.join(target_dir, f'{image_counter:05}.jpg')
+                # 增加计数器
+                image_counter += 1
 
-# 遍历源目录下的所有文件夹和文件
-for root, dirs, files in os.walk(source_dir):
-    for file in files:
-        # 这里可以根据需要添加其他图片格式
-        if file.lower().endswith(('.png', '.jpg', '.jpeg', '.bmp', '.gif')):
-            # 构建源文件的完整路径
-            source_file = os.path.join(root, file)
-            # 构建目标文件的重命名路径
-            target_file = os.path.join(target_dir, f'{image_counter:05}.jpg')
-            # 复制文件到目标路径并重命名
-            shutil.copy2(source_file, target_file)
-            # 增加计数器
-            image_counter += 1
+# 多线程复制文件到目标路径并重命名
+stats = transfer_files(walk_images(source_dir, target_dir), preserve=True, progress=print_progress)
+print()
+for src, _, error in stats.errors:
+    print(f"复制失败: {src}: {error}")
 
-print(f'完成！共复制了 {image_counter - 1} 张图片。')
+print(f'完成！共复制了 {stats.files} 张图片。')
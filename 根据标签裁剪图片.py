@@ -1,191 +1,211 @@
 import os
 import sys
-import json
-import glob
+import time
 import shutil
-from PIL import Image, ImageDraw
+from concurrent.futures import ProcessPoolExecutor
 from PyQt5.QtWidgets import (
     QApplication, QMainWindow, QWidget, QVBoxLayout, QHBoxLayout, QPushButton,
-    QLabel, QLineEdit, QFileDialog, QProgressBar, QMessageBox, QCheckBox, QGroupBox, QComboBox
+    QLabel, QLineEdit, QFileDialog, QProgressBar, QMessageBox, QCheckBox, QGroupBox, QComboBox, QSpinBox
 )
 from PyQt5.QtCore import Qt, QThread, pyqtSignal
-from PyQt5.QtGui import QIcon, QPixmap, QFont, QPainter, QColor, QPen
+from PyQt5.QtGui import QIcon, QPixmap, QImage, QFont, QPainter, QColor, QPen
+from dataset_index import DatasetIndex
+from error_report import ErrorReport, ErrorReportDialog
+from crop_engine import crop_image, init_worker
+from crop_dataset import CropDatasetWriter
+from job_control import JobControl, Checkpoint, CHECKPOINT_NAME
 
 class ImageCropper(QThread):
     progress_updated = pyqtSignal(int, int, str)
     finished = pyqtSignal()
     error_occurred = pyqtSignal(str)
-    preview_ready = pyqtSignal(str, list)
+    preview_ready = pyqtSignal(str, list, int, int, bytes)
+    
+    PROGRESS_INTERVAL = 0.1  # 进度信号最短间隔 (秒)
+    PREVIEW_INTERVAL = 0.25  # 预览缩略图最短间隔 (秒)
+    PARALLEL_THRESHOLD = 16  # 图像数达到该值时才启动进程池
 
-    def __init__(self, image_dir, label_dir, output_dir, label_type, preview_only, parent=None):
+    def __init__(self, image_dir, label_dir, output_dir, label_type, preview_only, workers=None,
+                 save_preview=False, preview_size=(640, 480), crop_mode="reencode", array_size=None,
+                 resume_checkpoint=False, parent=None):
         super().__init__(parent)
         self.image_dir = image_dir
         self.label_dir = label_dir
         self.output_dir = output_dir
         self.label_type = label_type
         self.preview_only = preview_only
-        self.canceled = False
+        self.workers = workers or os.cpu_count() or 1
+        self.save_preview = save_preview  # 是否在 preview 目录保存完整尺寸的预览图，仅生成预览时总是保存
+        self.preview_size = preview_size  # 界面预览缩略图的最大尺寸
+        self.crop_mode = crop_mode        # 裁剪输出方式，见 crop_engine.CROP_MODES
+        self.array_size = array_size      # 不为 None 时导出为 (宽, 高) 的数组数据集，保存在输出目录的 dataset 文件夹
+        self.resume_checkpoint = resume_checkpoint  # 是否跳过检查点中记录的已完成图像
+        self.control = JobControl()       # 取消和暂停，同时作用于进程池中的子进程
+        self.report = ErrorReport()  # 单张图像的错误汇总到报告中，结束后统一显示
+        self._last_progress = 0.0
+        self._last_preview = 0.0
+
+    @property
+    def canceled(self):
+        return self.control.canceled
+
+    @property
+    def checkpoint_path(self):
+        # 数组数据集在结束时一次写出，中断后无法接着写，此时不使用检查点
+        if self.array_size and not self.preview_only:
+            return None
+        return os.path.join(self.output_dir, CHECKPOINT_NAME)
+
+    def checkpoint_params(self):
+        return {
+            "task": "crop", "image_dir": self.image_dir, "label_dir": self.label_dir,
+            "label_type": self.label_type, "preview_only": self.preview_only,
+            "save_preview": self.save_preview, "crop_mode": self.crop_mode,
+        }
+
+    def pending_checkpoint(self):
+        '''
+        输出目录中与本次参数相同的检查点里已完成的图像数，0 表示没有可以继续的任务
+        '''
+        if not self.checkpoint_path:
+            return 0
+        return len(Checkpoint.load(self.checkpoint_path, self.checkpoint_params()))
 
     def run(self):
+        checkpoint = None
         try:
             # 支持的图像扩展名
-            image_extensions = ['.jpg', '.jpeg', '.png', '.bmp', '.tiff']
+            image_extensions = ['.jpg', '.jpeg', '.png', '.bmp', '.tif', '.tiff']
+            if self.label_type == "auto":
+                label_extensions = ['.json', '.txt']
+            else:
+                label_extensions = ['.json' if self.label_type == "json" else '.txt']
             
-            # 收集所有图像文件
-            image_files = []
-            for ext in image_extensions:
-                image_files.extend(glob.glob(os.path.join(self.image_dir, f'*{ext}')))
+            # 扫描一次图像目录和标签目录，收集所有图像文件及对应标签
+            index = DatasetIndex(self.image_dir, self.label_dir, image_extensions, label_extensions)
+            image_files = index.image_files()
             
             total_files = len(image_files)
             
-            for i, image_path in enumerate(image_files):
-                if self.canceled:
-                    break
-                
-                self.progress_updated.emit(i + 1, total_files, f"处理中: {os.path.basename(image_path)}")
-                
-                # 获取文件名（不含扩展名）
-                base_name = os.path.splitext(os.path.basename(image_path))[0]
-                
-                # 构建标签文件路径
-                if self.label_type == "auto":
-                    # 尝试自动检测标签文件
-                    label_path = None
-                    for ext in ['.json', '.txt']:
-                        test_path = os.path.join(self.label_dir, f"{base_name}{ext}")
-                        if os.path.exists(test_path):
-                            label_path = test_path
-                            break
-                else:
-                    ext = '.json' if self.label_type == "json" else '.txt'
-                    label_path = os.path.join(self.label_dir, f"{base_name}{ext}")
-                
-                if not label_path or not os.path.exists(label_path):
-                    self.error_occurred.emit(f"找不到标签文件: {base_name}")
+            # 检查点记录已完成的图像，继续上次的任务时跳过这些图像
+            finished = set()
+            if self.checkpoint_path:
+                checkpoint = Checkpoint(self.checkpoint_path, self.checkpoint_params(), self.resume_checkpoint)
+                finished = checkpoint.done
+            
+            # 配对标签文件，自动检测时优先使用 JSON
+            tasks = []
+            done = 0
+            for image_path in image_files:
+                if image_path in finished:
+                    done += 1
                     continue
                 
-                # 打开图像
-                try:
-                    image = Image.open(image_path)
-                except Exception as e:
-                    self.error_occurred.emit(f"无法打开图像: {image_path} - {str(e)}")
-                    continue
+                base_name = os.path.splitext(os.path.basename(image_path))[0]
+                label_path = index.find_label(base_name)
                 
-                # 解析标签文件
-                try:
-                    if label_path.endswith('.json'):
-                        targets = self.parse_json_label(label_path, image.width, image.height)
-                    else:
-                        targets = self.parse_txt_label(label_path, image.width, image.height)
-                except Exception as e:
-                    self.error_occurred.emit(f"解析标签失败: {label_path} - {str(e)}")
+                if not label_path:
+                    self.report.add("找不到标签文件", image_path)
+                    done += 1
                     continue
                 
-                # 生成预览图
-                preview_path = os.path.join(self.output_dir, "preview", f"{base_name}_preview.jpg")
                 if self.preview_only:
                     preview_path = os.path.join(self.output_dir, f"{base_name}_preview.jpg")
-                
-                os.makedirs(os.path.dirname(preview_path), exist_ok=True)
-                self.create_preview(image.copy(), targets, preview_path)
-                
-                # 发送预览信号
-                self.preview_ready.emit(image_path, [t[0] for t in targets])
-                
-                if self.preview_only:
-                    continue
-                
-                # 裁剪并保存目标区域
-                for j, (label, bbox) in enumerate(targets):
-                    # 创建类别目录
-                    class_dir = os.path.join(self.output_dir, label)
-                    os.makedirs(class_dir, exist_ok=True)
+                elif self.save_preview:
+                    preview_path = os.path.join(self.output_dir, "preview", f"{base_name}_preview.jpg")
+                else:
+                    preview_path = None
+                tasks.append((image_path, label_path, self.output_dir, preview_path, self.preview_only))
+            
+            self.report_progress(done, total_files, "", force=True)
+            
+            # 图像较多时使用进程池并行裁剪，每张图像在子进程中只解码一次，只把类别、错误和缩略图传回当前线程
+            # 每个进程按 PREVIEW_INTERVAL * 进程数 的间隔生成缩略图，合计约每 PREVIEW_INTERVAL 秒一张
+            executor = None
+            if self.workers > 1 and len(tasks) >= self.PARALLEL_THRESHOLD:
+                executor = ProcessPoolExecutor(
+                    max_workers=self.workers, initializer=init_worker,
+                    initargs=(self.preview_size, self.PREVIEW_INTERVAL * self.workers, self.crop_mode, self.array_size,
+                              3, self.control)
+                )
+                chunksize = max(1, min(16, len(tasks) // (self.workers * 8)))
+                results = executor.map(crop_image, tasks, chunksize=chunksize)
+            else:
+                init_worker(self.preview_size, self.PREVIEW_INTERVAL, self.crop_mode, self.array_size, 3, self.control)
+                results = map(crop_image, tasks)
+            
+            # 数组数据集由当前线程按顺序写入
+            writer = None
+            if self.array_size and not self.preview_only:
+                writer = CropDatasetWriter(os.path.join(self.output_dir, "dataset"), self.array_size)
+            
+            try:
+                for image_path, classes, saved, errors, thumbnail, samples, warnings in results:
+                    if self.canceled:
+                        break
                     
-                    # 裁剪图像
-                    try:
-                        cropped = image.crop(bbox)
-                        # 保存裁剪后的图像
-                        output_path = os.path.join(class_dir, f"{base_name}_{j}.jpg")
-                        cropped.save(output_path)
-                    except Exception as e:
-                        self.error_occurred.emit(f"裁剪失败: {label} - {str(e)}")
+                    done += 1
+                    for category, path, message in errors + warnings:
+                        self.report.add(category, path, message)
+                    # 出错的图像不记录，继续任务时重新处理
+                    if checkpoint and not errors:
+                        checkpoint.add(image_path)
+                    
+                    if writer and samples:
+                        for label, bbox, array in samples:
+                            writer.add(label, image_path, bbox, array)
+                    
+                    # 发送预览信号
+                    if thumbnail:
+                        self.report_preview(image_path, classes, thumbnail)
+                    self.report_progress(done, total_files, f"处理中: {os.path.basename(image_path)}")
+                
+                if writer and not self.canceled:
+                    writer.close()
+            finally:
+                if writer:
+                    # 取消或出错时删除未写完的文件
+                    writer.abort()
+                if executor:
+                    # 取消尚未开始的任务，不等待正在执行的任务
+                    executor.shutdown(wait=False, cancel_futures=True)
             
+            # 全部完成后删除检查点，取消时保留以便下次继续
+            if checkpoint and not self.canceled:
+                checkpoint.remove()
+            self.report_progress(done, total_files, "处理已取消" if self.canceled else "处理完成", force=True)
             self.finished.emit()
             
         except Exception as e:
             self.error_occurred.emit(f"处理过程中出错: {str(e)}")
             self.finished.emit()
+        finally:
+            if checkpoint:
+                checkpoint.close()
 
-    def parse_json_label(self, label_path, img_width, img_height):
-        targets = []
-        with open(label_path, 'r') as f:
-            data = json.load(f)
-        
-        for shape in data.get('shapes', []):
-            label = shape.get('label', 'unknown')
-            points = shape.get('points', [])
-            
-            if not points:
-                continue
-                
-            # 计算边界框
-            x_coords = [p[0] for p in points]
-            y_coords = [p[1] for p in points]
-            x_min = max(0, min(x_coords))
-            y_min = max(0, min(y_coords))
-            x_max = min(img_width, max(x_coords))
-            y_max = min(img_height, max(y_coords))
-            
-            # 确保边界框有效
-            if x_max > x_min and y_max > y_min:
-                bbox = (x_min, y_min, x_max, y_max)
-                targets.append((label, bbox))
-        
-        return targets
-
-    def parse_txt_label(self, label_path, img_width, img_height):
-        targets = []
-        with open(label_path, 'r') as f:
-            lines = f.readlines()
-        
-        for line in lines:
-            parts = line.strip().split()
-            if len(parts) < 5:
-                continue
-                
-            class_id = int(parts[0])
-            center_x = float(parts[1]) * img_width
-            center_y = float(parts[2]) * img_height
-            width = float(parts[3]) * img_width
-            height = float(parts[4]) * img_height
-            
-            # 计算边界框
-            x_min = max(0, center_x - width / 2)
-            y_min = max(0, center_y - height / 2)
-            x_max = min(img_width, center_x + width / 2)
-            y_max = min(img_height, center_y + height / 2)
-            
-            # 使用类ID作为标签
-            label = f"class_{class_id}"
-            bbox = (x_min, y_min, x_max, y_max)
-            targets.append((label, bbox))
-        
-        return targets
+    def report_preview(self, image_path, classes, thumbnail):
+        # 多个进程的缩略图可能同时到达，界面上只需要最新的一张
+        now = time.monotonic()
+        if now - self._last_preview >= self.PREVIEW_INTERVAL:
+            self._last_preview = now
+            width, height, data = thumbnail
+            self.preview_ready.emit(image_path, classes, width, height, data)
 
-    def create_preview(self, image, targets, output_path):
-        draw = ImageDraw.Draw(image)
-        
-        for label, bbox in targets:
-            # 绘制边界框
-            draw.rectangle(bbox, outline="red", width=3)
-            # 添加标签
-            draw.text((bbox[0] + 5, bbox[1] + 5), label, fill="red")
-        
-        # 保存预览图
-        image.save(output_path)
+    def report_progress(self, current, total, message, force=False):
+        # 限制进度信号的发送频率，避免大量信号堵塞界面线程
+        now = time.monotonic()
+        if force or now - self._last_progress >= self.PROGRESS_INTERVAL:
+            self._last_progress = now
+            self.progress_updated.emit(current, total, message)
 
     def cancel(self):
-        self.canceled = True
+        self.control.cancel()
+
+    def pause(self):
+        self.control.pause()
+
+    def resume(self):
+        self.control.resume()
 
 
 class ImageCropperApp(QMainWindow):
@@ -256,8 +276,36 @@ class ImageCropperApp(QMainWindow):
         # 预览模式
         self.preview_check = QCheckBox("仅生成预览图")
         type_layout.addWidget(self.preview_check)
+        
+        # 是否保存完整尺寸的预览图到 preview 目录
+        self.save_preview_check = QCheckBox("保存预览图")
+        self.save_preview_check.setToolTip("在输出目录的 preview 文件夹中保存带标注框的完整尺寸预览图")
+        type_layout.addWidget(self.save_preview_check)
         settings_layout.addLayout(type_layout)
         
+        # 裁剪输出方式
+        mode_layout = QHBoxLayout()
+        mode_layout.addWidget(QLabel("裁剪输出:"))
+        self.crop_mode_combo = QComboBox()
+        self.crop_mode_combo.addItems(["重新编码", "无损裁剪"])
+        self.crop_mode_combo.setToolTip(
+            "无损裁剪：JPEG 图像直接裁剪压缩数据，不重新编码，裁剪框会扩展到 8/16 像素边界；\n"
+            "其他格式的图像保存为 PNG"
+        )
+        mode_layout.addWidget(self.crop_mode_combo)
+        
+        # 导出为固定尺寸的数组数据集 (images.npy / labels.npy / meta.csv)
+        self.array_check = QCheckBox("导出数组数据集")
+        self.array_check.setToolTip("裁剪结果按比例缩放并填充到固定尺寸，写入输出目录 dataset 文件夹中的 images.npy")
+        mode_layout.addWidget(self.array_check)
+        self.array_size_spin = QSpinBox()
+        self.array_size_spin.setRange(8, 1024)
+        self.array_size_spin.setValue(64)
+        self.array_size_spin.setSuffix(" px")
+        mode_layout.addWidget(self.array_size_spin)
+        mode_layout.addStretch()
+        settings_layout.addLayout(mode_layout)
+        
         main_layout.addWidget(settings_group)
         
         # 预览区域
@@ -349,6 +397,27 @@ class ImageCropperApp(QMainWindow):
         self.cancel_btn.clicked.connect(self.cancel_processing)
         button_layout.addWidget(self.cancel_btn)
         
+        self.pause_btn = QPushButton("暂停")
+        self.pause_btn.setStyleSheet("""
+            QPushButton {
+                background-color: #f39c12;
+                color: white;
+                border: none;
+                border-radius: 5px;
+                padding: 8px 16px;
+                font-weight: bold;
+            }
+            QPushButton:hover {
+                background-color: #d68910;
+            }
+            QPushButton:disabled {
+                background-color: #bdc3c7;
+            }
+        """)
+        self.pause_btn.setEnabled(False)
+        self.pause_btn.clicked.connect(self.toggle_pause)
+        button_layout.addWidget(self.pause_btn)
+        
         self.open_btn = QPushButton("打开输出目录")
         self.open_btn.setStyleSheet("""
             QPushButton {
@@ -375,7 +444,9 @@ class ImageCropperApp(QMainWindow):
         main_layout.addWidget(self.status_label)
         
         self.thread = None
-        self.last_preview = None
+        self.preview_pixmap = None   # 最新的预览缩略图
+        self.scaled_preview = None   # 按预览区域尺寸缩放后的缓存
+        self.error_dialog = None
 
     def create_icon(self):
         # 创建一个简单的应用图标
@@ -454,21 +525,40 @@ class ImageCropperApp(QMainWindow):
         # 预览模式
         preview_only = self.preview_check.isChecked()
         
-        # 清理预览目录
+        thread = ImageCropper(
+            image_dir, label_dir, output_dir, label_type, preview_only,
+            save_preview=self.save_preview_check.isChecked(),
+            crop_mode="lossless" if self.crop_mode_combo.currentIndex() == 1 else "reencode",
+            array_size=(self.array_size_spin.value(),) * 2 if self.array_check.isChecked() else None,
+            preview_size=(max(self.preview_label.width(), 320), max(self.preview_label.height(), 240))
+        )
+        
+        # 输出目录中有相同参数的未完成任务时，询问是否跳过已完成的图像
+        pending = thread.pending_checkpoint()
+        if pending:
+            answer = QMessageBox.question(
+                self, "继续任务", f"输出目录中有未完成的任务，已完成 {pending} 张图像。\n是否跳过已完成的图像继续处理？",
+                QMessageBox.Yes | QMessageBox.No, QMessageBox.Yes
+            )
+            thread.resume_checkpoint = answer == QMessageBox.Yes
+        
+        # 清理预览目录，继续任务时保留
         preview_dir = os.path.join(output_dir, "preview")
-        if os.path.exists(preview_dir):
+        if os.path.exists(preview_dir) and not thread.resume_checkpoint:
             shutil.rmtree(preview_dir)
         
         self.progress_bar.setValue(0)
         self.progress_label.setText("开始处理...")
         self.start_btn.setEnabled(False)
         self.cancel_btn.setEnabled(True)
+        self.pause_btn.setEnabled(True)
+        self.pause_btn.setText("暂停")
         self.preview_label.clear()
+        self.preview_pixmap = None
+        self.scaled_preview = None
         self.classes_label.setText("检测到的类别: ")
         
-        self.thread = ImageCropper(
-            image_dir, label_dir, output_dir, label_type, preview_only
-        )
+        self.thread = thread
         self.thread.progress_updated.connect(self.update_progress)
         self.thread.finished.connect(self.processing_finished)
         self.thread.error_occurred.connect(self.show_error)
@@ -480,28 +570,17 @@ class ImageCropperApp(QMainWindow):
             percent = int(current / total * 100)
             self.progress_bar.setValue(percent)
             self.progress_label.setText(f"{message} ({current}/{total})")
-            self.status_label.setText(f"处理中: {percent}% 完成")
+            status = f"处理中: {percent}% 完成"
+            if self.thread and self.thread.report.total:
+                status += f" | 错误 {self.thread.report.total} 个"
+            self.status_label.setText(status)
 
-    def update_preview(self, image_path, classes):
-        # 尝试加载预览图
-        base_name = os.path.splitext(os.path.basename(image_path))[0]
-        preview_path = os.path.join(self.output_dir_edit.text(), f"{base_name}_preview.jpg")
-        
-        if not os.path.exists(preview_path):
-            preview_path = os.path.join(self.output_dir_edit.text(), "preview", f"{base_name}_preview.jpg")
-        
-        if os.path.exists(preview_path):
-            pixmap = QPixmap(preview_path)
-            if not pixmap.isNull():
-                # 缩放以适应预览区域
-                scaled_pixmap = pixmap.scaled(
-                    self.preview_label.width(), 
-                    self.preview_label.height(),
-                    Qt.KeepAspectRatio,
-                    Qt.SmoothTransformation
-                )
-                self.preview_label.setPixmap(scaled_pixmap)
-                self.last_preview = preview_path
+    def update_preview(self, image_path, classes, width, height, data):
+        # 缩略图已经在子进程中缩小并画好标注框，直接用字节构造 QImage，不读写磁盘
+        image = QImage(data, width, height, width * 3, QImage.Format_RGB888)
+        self.preview_pixmap = QPixmap.fromImage(image)
+        self.scaled_preview = None
+        self.show_preview()
         
         # 更新类别信息
         if classes:
@@ -509,42 +588,78 @@ class ImageCropperApp(QMainWindow):
             self.classes_label.setText(f"检测到的类别: {', '.join(unique_classes)}")
 
     def processing_finished(self):
-        self.progress_label.setText("处理完成！")
+        thread = self.thread
+        report = thread.report if thread else None
+        canceled = thread.canceled if thread else False
+        message = "处理已取消" if canceled else "处理完成！"
+        self.progress_label.setText(message)
         self.start_btn.setEnabled(True)
         self.cancel_btn.setEnabled(False)
-        self.status_label.setText("处理完成！")
+        self.pause_btn.setEnabled(False)
+        self.pause_btn.setText("暂停")
+        self.status_label.setText(message)
         self.thread = None
+        if thread:
+            # finished 是 run 中最后发出的信号，这里只等待线程退出，不会阻塞界面
+            thread.wait()
+        
+        # 所有错误汇总后只显示一次，窗口为非模态
+        if report and report.total:
+            self.status_label.setText(f"{message} 共 {report.total} 个错误")
+            self.error_dialog = ErrorReportDialog(report, self)
+            self.error_dialog.show()
         
         # 显示完成消息
-        QMessageBox.information(self, "完成", "图像处理已完成！")
+        if not canceled:
+            QMessageBox.information(self, "完成", "图像处理已完成！")
 
     def cancel_processing(self):
+        # 只发出取消请求，不在界面线程中等待；子进程不再开始新的图像，线程结束后由 processing_finished 更新界面
         if self.thread and self.thread.isRunning():
             self.thread.cancel()
-            self.thread.wait()
-            self.progress_label.setText("处理已取消")
-            self.start_btn.setEnabled(True)
             self.cancel_btn.setEnabled(False)
-            self.status_label.setText("处理已取消")
+            self.pause_btn.setEnabled(False)
+            self.progress_label.setText("正在取消...")
+            if self.thread.checkpoint_path:
+                self.status_label.setText("正在取消，已完成的图像记录在检查点中，下次可以继续")
+            else:
+                self.status_label.setText("正在取消...")
+
+    def toggle_pause(self):
+        if not (self.thread and self.thread.isRunning()):
+            return
+        if self.thread.control.paused:
+            self.thread.resume()
+            self.pause_btn.setText("暂停")
+            self.status_label.setText("继续处理")
+        else:
+            self.thread.pause()
+            self.pause_btn.setText("继续")
+            self.status_label.setText("已暂停，正在处理的图像完成后停止")
 
     def show_error(self, message):
         QMessageBox.critical(self, "错误", message)
         self.status_label.setText(f"错误: {message}")
 
+    def show_preview(self):
+        # 缩放结果按预览区域尺寸缓存，尺寸不变时不重复缩放
+        if self.preview_pixmap is None:
+            return
+        size = self.preview_label.size()
+        if self.scaled_preview is None or self.scaled_preview[0] != size:
+            scaled_pixmap = self.preview_pixmap.scaled(
+                size.width(),
+                size.height(),
+                Qt.KeepAspectRatio,
+                Qt.SmoothTransformation
+            )
+            self.scaled_preview = (size, scaled_pixmap)
+            self.preview_label.setPixmap(scaled_pixmap)
+
     def resizeEvent(self, event):
         super().resizeEvent(event)
-        # 重新加载预览图以适应新尺寸
-        if self.last_preview and os.path.exists(self.last_preview):
-            pixmap = QPixmap(self.last_preview)
-            if not pixmap.isNull():
-                scaled_pixmap = pixmap.scaled(
-                    self.preview_label.width(), 
-                    self.preview_label.height(),
-                    Qt.KeepAspectRatio,
-                    Qt.SmoothTransformation
-                )
-                self.preview_label.setPixmap(scaled_pixmap)
-
+        # 用内存中的缩略图重新缩放以适应新尺寸
+        self.show_preview()
 
 class ComboBox(QComboBox):
     def __init__(self, parent=None):
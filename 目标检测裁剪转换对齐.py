@@ -1,10 +1,16 @@
 import os
-import json
 import yaml
-import shutil
 import argparse
 from tqdm import tqdm
 from file_script import MkDir, FileList,Imread, Imwrite, ParseJson
+from image_size import get_image_size
+from dataset_index import DatasetIndex
+from yolo_label import read_yolo_labels, xywhn_to_xyxy, xyxy_to_int, class_ids
+from labelme_json import write_labelme
+from jpeg_crop import read_jpeg_layout, align_box, lossless_backend, crop_jpeg, save_image
+from region_read import open_region_reader
+from crop_dataset import CropDatasetWriter, letterbox
+from file_transfer import transfer_files
 
 
 def make_parser():
@@ -20,30 +26,60 @@ def make_parser():
     parser.add_argument("--pad_y",     default=0, help="y方向外扩像素数")
 
     parser.add_argument("--save_dir",  default=r"F:\Image\车号\华兴\json\json_labels", help="保存路径")
+    parser.add_argument("--compact",   action="store_true", help="输出紧凑json (去掉空字段、不缩进)")
+    parser.add_argument("--lossless",  action="store_true", help="JPEG 无损裁剪：不重新编码，裁剪框扩展到 MCU 边界")
+    parser.add_argument("--array_size", default=None, type=int, nargs='+', help="导出数组数据集的尺寸 (宽 高 或边长)，不设置时保存为图片")
+    parser.add_argument("--gray",      action="store_true", help="数组数据集使用单通道灰度")
 
     return parser
 
 def ImgKeepPaceWithLabel(data_dir, img_cate, lab_cate, save_dir):
-    img_list = [i for i in os.listdir(data_dir) if i.endswith(img_cate)]
-    lab_list = [i for i in os.listdir(data_dir) if i.endswith(lab_cate)]
-
-    for img_name in img_list:
-        lab_name = img_name.replace(img_cate, lab_cate)
-        if not lab_name in lab_list:
-            img_path = os.path.join(data_dir, img_name)
-            move_img = os.path.join(save_dir, 'issue', img_name)
-            MkDir(move_img)
-            shutil.move(img_path, move_img)
-    for lab_name in lab_list:
-        img_name = lab_name.replace(lab_cate, img_cate)
-        if not img_name in img_list:
-            lab_path = os.path.join(data_dir, lab_name)
-            move_lab = os.path.join(save_dir, 'issue', lab_name)
-            MkDir(move_lab)
-            shutil.move(lab_path, move_lab)
-
-
-def CropImg(data_dir, img_cate, lab_cate, yaml_dir, pad_x, pad_y, save_dir):
+    # 扫描一次目录，在内存中配对图片和标签
+    index = DatasetIndex(data_dir, image_extensions=['.' + img_cate], label_extensions=['.' + lab_cate])
+
+    # 没有配对的图片和标签移动到 issue 目录，多线程移动，同一分区内直接重命名
+    issue_dir = os.path.join(save_dir, 'issue')
+    unpaired = index.images_without_label() + index.labels_without_image('.' + lab_cate)
+    stats = transfer_files([(path, os.path.join(issue_dir, os.path.basename(path))) for path in unpaired], 'move')
+    for src, _, error in stats.errors:
+        print(f"移动失败: {src}: {error}")
+
+
+def SaveCrop(save, img, data, layout, reader, xmin, ymin, xmax, ymax):
+    '''
+    保存一个裁剪区域
+    ·save: 保存路径
+    ·img: 解码后的图片，无损裁剪或按区域读取时为 None
+    ·data: JPEG 文件内容，layout 不为 None 时使用
+    ·layout: read_jpeg_layout 的结果，不为 None 时直接裁剪压缩数据，不重新编码
+    ·reader: RegionReader，不为 None 时只解码裁剪区域
+    '''
+    MkDir(save)
+    if layout:
+        with open(save, 'wb') as f:
+            f.write(crop_jpeg(data, align_box((xmin, ymin, xmax, ymax), *layout)))
+    elif reader:
+        save_image(reader.crop((xmin, ymin, xmax, ymax)), save)
+    else:
+        Imwrite(save, img[ymin:ymax, xmin:xmax])
+
+
+def CropArray(img, reader, xmin, ymin, xmax, ymax):
+    '''
+    取出一个裁剪区域用于数组数据集
+    ·img: Imread 读取的 BGR/BGRA/灰度图片，按区域读取时为 None
+    ·reader: RegionReader
+    ·return: PIL 图像或 RGB/灰度数组
+    '''
+    if reader:
+        return reader.crop((xmin, ymin, xmax, ymax))
+    crop = img[ymin:ymax, xmin:xmax]
+    if crop.ndim == 3 and crop.shape[2] >= 3:
+        crop = crop[..., 2::-1]
+    return crop
+
+
+def CropImg(data_dir, img_cate, lab_cate, yaml_dir, pad_x, pad_y, save_dir, lossless=False, array_size=None, gray=False):
     '''
     裁剪图片
     ·img_dir: 图片路径
@@ -53,57 +89,89 @@ def CropImg(data_dir, img_cate, lab_cate, yaml_dir, pad_x, pad_y, save_dir):
     ·pad_x: x方向外扩像素数
     ·pad_y: y方向外扩像素数
     ·save_dir: 保存路径
+    ·lossless: JPEG 图片直接裁剪压缩数据，不解码也不重新编码，裁剪框向外扩展到 MCU 边界
+    ·array_size: 不为 None 时不保存图片，裁剪按比例缩放到 (宽, 高) 并写入 save_dir/裁剪数据集 中的数组数据集
+    ·gray: 数组数据集使用单通道灰度
     '''
 
     ImgKeepPaceWithLabel(data_dir, img_cate, lab_cate, save_dir)
 
+    if array_size:
+        lossless = False
+    if lossless and not lossless_backend():
+        print("未找到 PyTurboJPEG 或 jpegtran，无法无损裁剪，将重新编码保存")
+        lossless = False
+
     with open(yaml_dir, 'r', encoding='utf-8') as file:
         cfg_dict = yaml.safe_load(file)['names']
 
     img_list = FileList(data_dir, img_cate)
     lab_list = FileList(data_dir, lab_cate)
 
-    for i in tqdm(range(len(img_list))):
-        img_path = img_list[i]
-        img_name = os.path.basename(img_path)
-        lab_path = lab_list[i]
-        img = Imread(img_path)
-        h, w = img.shape[:2]
-        if lab_cate == 'txt':
-            with open(lab_path, 'r') as f:
-                datas = f.readlines()
-                for ind, data in enumerate(datas):
-                    obj = data[:-1].split(' ')
-                    name = str(cfg_dict[int(obj[0])])
-                    cx = w * float(obj[1])
-                    cy = h * float(obj[2])
-                    ww = w * float(obj[3])
-                    hh = h * float(obj[4])
-
-                    xmin = max(0, int(cx - ww / 2 - pad_x))
-                    ymin = max(0, int(cy - hh / 2 - pad_y))
-                    xmax = min(w, int(cx + ww / 2 + pad_x))
-                    ymax = min(h, int(cy + hh / 2 + pad_y))
-
-                    crop_img = img[ymin:ymax, xmin:xmax]
+    # 导出数组数据集时，yaml 中的类别顺序即为类别id
+    writer = None
+    channels = 1 if gray else 3
+    if array_size:
+        array_size = (array_size,) if isinstance(array_size, int) else tuple(array_size)
+        array_size = array_size * 2 if len(array_size) == 1 else array_size
+        names = cfg_dict if isinstance(cfg_dict, list) else [cfg_dict[k] for k in sorted(cfg_dict)]
+        writer = CropDatasetWriter(os.path.join(save_dir, '裁剪数据集'), array_size, channels, names)
+
+    try:
+        for i in tqdm(range(len(img_list))):
+            img_path = img_list[i]
+            img_name = os.path.basename(img_path)
+            lab_path = lab_list[i]
+            # 无损裁剪时只读取文件内容和文件头，非 JPEG 图片仍然解码后重新编码
+            img = data = layout = reader = None
+            if lossless:
+                with open(img_path, 'rb') as f:
+                    data = f.read()
+                layout = read_jpeg_layout(data)
+            if not layout:
+                # 超大的 TIFF/BMP 只解码与目标框相交的条带或块
+                reader = open_region_reader(img_path)
+            if layout:
+                w, h = layout[:2]
+            elif reader:
+                w, h = reader.size
+            else:
+                img = Imread(img_path)
+                h, w = img.shape[:2]
+            targets = []
+            if lab_cate == 'txt':
+                # 一次读取整个标签文件，外扩、取整和越界裁剪都用数组运算完成
+                labels = read_yolo_labels(lab_path)
+                boxes = xyxy_to_int(xywhn_to_xyxy(labels, w, h, pad_x, pad_y), w, h)
+                for class_id, box in zip(class_ids(labels).tolist(), boxes.tolist()):
+                    targets.append((str(cfg_dict[class_id]), box))
+            elif lab_cate == 'json':
+                shapes = ParseJson(lab_path)['shapes']
+                for shape in shapes:
+                    name = str(shape['label'])
+                    xmin = max(0, int(shape['points'][0][0] - pad_x))
+                    ymin = max(0, int(shape['points'][0][1] - pad_y))
+                    xmax = min(w, int(shape['points'][2][0] + pad_x))
+                    ymax = min(h, int(shape['points'][2][1] + pad_y))
+                    targets.append((name, (xmin, ymin, xmax, ymax)))
+
+            for ind, (name, box) in enumerate(targets):
+                if writer:
+                    writer.add(name, img_path, box, letterbox(CropArray(img, reader, *box), array_size, channels))
+                else:
                     save = os.path.join(save_dir, '裁剪图', name, '{0}_{1}.{2}'.format(img_name.split('.')[0], ind, img_cate))
-                    MkDir(save)
-                    Imwrite(save, crop_img)
-        elif lab_cate == 'json':
-            shapes = ParseJson(lab_path)['shapes']
-            for ind, shape in enumerate(shapes):
-                name = str(shape['label'])
-                xmin = max(0, int(shape['points'][0][0] - pad_x))
-                ymin = max(0, int(shape['points'][0][1] - pad_y))
-                xmax = min(w, int(shape['points'][2][0] + pad_x))
-                ymax = min(h, int(shape['points'][2][1] + pad_y))
-                crop_img = img[ymin:ymax, xmin:xmax]
-                save = os.path.join(save_dir, '裁剪图', name, '{0}_{1}.{2}'.format(img_name.split('.')[0], ind, img_cate))
-                MkDir(save)
-                Imwrite(save, crop_img)
-
-
-def Txt2Json(data_dir, img_cate, yaml_dir, pad_x, pad_y, save_dir):
+                    SaveCrop(save, img, data, layout, reader, *box)
+            if reader:
+                reader.close()
+        if writer:
+            print(f"数组数据集已保存：{writer.close()} 个样本")
+    finally:
+        if writer:
+            # 出错时删除未写完的文件
+            writer.abort()
+
+
+def Txt2Json(data_dir, img_cate, yaml_dir, pad_x, pad_y, save_dir, compact=False):
     '''
     txt标签转json标签
     ·img_dir: 图片路径
@@ -113,6 +181,7 @@ def Txt2Json(data_dir, img_cate, yaml_dir, pad_x, pad_y, save_dir):
     ·pad_x: x方向外扩像素数
     ·pad_y: y方向外扩像素数
     ·save_dir: 保存路径
+    ·compact: 是否输出紧凑json
     '''
     ImgKeepPaceWithLabel(data_dir, img_cate, 'txt', save_dir)
 
@@ -126,8 +195,8 @@ def Txt2Json(data_dir, img_cate, yaml_dir, pad_x, pad_y, save_dir):
         img_path = img_list[i]
         img_name = os.path.basename(img_path)
         lab_path = lab_list[i]
-        img = Imread(img_path)
-        h, w = img.shape[:2]
+        # 只需要图片尺寸，读取文件头即可，不必解码整张图片；JPEG 按 EXIF 方向返回与 Imread 相同的显示尺寸
+        w, h = get_image_size(img_path)
         label = {'version': '2.3.6',
                  'flags': {},
                  'shapes': [],
@@ -137,44 +206,34 @@ def Txt2Json(data_dir, img_cate, yaml_dir, pad_x, pad_y, save_dir):
                  "imageWidth": w
                  }
 
-        with open(lab_path, 'r') as f:
-            datas = f.readlines()
-            for ind, data in enumerate(datas):
-                obj = data[:-1].split(' ')
-                name = str(cfg_dict[int(obj[0])])
-                cx = w * float(obj[1])
-                cy = h * float(obj[2])
-                ww = w * float(obj[3])
-                hh = h * float(obj[4])
-
-                xmin = float(max(0, int(cx - ww / 2 - pad_x)))
-                ymin = float(max(0, int(cy - hh / 2 - pad_y)))
-                xmax = float(min(w, int(cx + ww / 2 + pad_x)))
-                ymax = float(min(h, int(cy + hh / 2 + pad_y)))
-
-                shape = {
-                    "label": name,
-                    "points": [[xmin, ymin], [xmax, ymin], [xmax, ymax], [xmin, ymax]],
-                    "group_id": None,
-                    "description": "",
-                    "difficult": False,
-                    "shape_type": "rectangle",
-                    "flags": {},
-                    "attributes": {}
-                }
-                label['shapes'].append(shape)
+        # 一次读取整个标签文件，外扩、取整和越界裁剪都用数组运算完成
+        labels = read_yolo_labels(lab_path)
+        boxes = xyxy_to_int(xywhn_to_xyxy(labels, w, h, pad_x, pad_y), w, h).astype(float)
+        for class_id, (xmin, ymin, xmax, ymax) in zip(class_ids(labels).tolist(), boxes.tolist()):
+            name = str(cfg_dict[class_id])
+            shape = {
+                "label": name,
+                "points": [[xmin, ymin], [xmax, ymin], [xmax, ymax], [xmin, ymax]],
+                "group_id": None,
+                "description": "",
+                "difficult": False,
+                "shape_type": "rectangle",
+                "flags": {},
+                "attributes": {}
+            }
+            label['shapes'].append(shape)
 
         save_lab = os.path.join(save_dir, 'json标签', img_name.replace(img_cate, 'json'))
         MkDir(save_lab)
-        with open(save_lab, 'w') as json_file:
-            json.dump(label, json_file, indent=4)
+        write_labelme(label, save_lab, compact=compact, indent=4)
 
 
 if __name__ == '__main__':
     args = make_parser().parse_args()
     if args.task == 0:
-        CropImg(args.data_dir, args.img_cate, args.lab_cate, args.yaml_dir, args.pad_x, args.pad_y, args.save_dir)
+        CropImg(args.data_dir, args.img_cate, args.lab_cate, args.yaml_dir, args.pad_x, args.pad_y, args.save_dir,
+                args.lossless, args.array_size, args.gray)
     elif args.task == 1:
-        Txt2Json(args.data_dir, args.img_cate, args.yaml_dir, args.pad_x, args.pad_y, args.save_dir)
+        Txt2Json(args.data_dir, args.img_cate, args.yaml_dir, args.pad_x, args.pad_y, args.save_dir, args.compact)
     elif args.task == 2:
         ImgKeepPaceWithLabel(args.data_dir, args.img_cate, args.lab_cate, args.ave_dir)
\ No newline at end of file
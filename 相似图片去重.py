@@ -0,0 +1,56 @@
+import os
+import argparse
+import numpy as np
+from dataset_index import DatasetIndex
+from file_transfer import transfer_files, print_progress
+from image_hash import HASH_METHODS, compute_hashes, near_duplicate_groups
+
+
+def dedupe_folder(src_folder, dst_folder=None, radius=6, method='dhash', window=None, workers=None):
+    '''
+    找出文件夹中的近似重复图片 (例如连续拍摄的相邻帧)，每组只保留第一张
+    ·src_folder     图片文件夹，图片按文件名排序，即按帧顺序
+    ·dst_folder     重复的图片和同名标签移动到该文件夹，为 None 时只打印不移动
+    ·radius         感知哈希的汉明距离阈值
+    ·method         哈希方法 dhash/phash
+    ·window         只与之后 window 张图片比较，连续帧时可以大幅加快；None 时两两比较
+    ·workers        计算哈希的进程数，默认使用全部CPU核心
+    ·return         重复图片的路径列表
+    '''
+    index = DatasetIndex(src_folder)
+    images = index.image_files()
+    hashes, valid = compute_hashes(images, method, workers)
+    groups = near_duplicate_groups(hashes, radius, valid, window)
+
+    duplicates = np.flatnonzero(groups != np.arange(len(images)))
+    print(f"共 {len(images)} 张图片，{len(np.unique(groups))} 组，重复 {len(duplicates)} 张，"
+          f"无法读取 {int((~valid).sum())} 张")
+    if dst_folder is None:
+        for i in duplicates:
+            print(f"{images[i]}  ~  {images[groups[i]]}")
+        return [images[i] for i in duplicates]
+
+    # 图片和同名的所有标签一起移动
+    pairs = []
+    for i in duplicates:
+        stem = os.path.splitext(os.path.basename(images[i]))[0]
+        for path in [images[i]] + list(index.labels.get(stem, {}).values()):
+            pairs.append((path, os.path.join(dst_folder, os.path.basename(path))))
+    stats = transfer_files(pairs, 'move', progress=print_progress)
+    print()
+    for src, _, error in stats.errors:
+        print(f"移动失败: {src}: {error}")
+    return [images[i] for i in duplicates]
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='按感知哈希找出近似重复的图片，每组只保留一张')
+    parser.add_argument('src_folder', help='图片文件夹路径')
+    parser.add_argument('--dst', default=None, help='重复图片移动到的文件夹，不设置时只列出')
+    parser.add_argument('--radius', type=int, default=6, help='汉明距离阈值 (0~64)，越大越多图片被视为重复')
+    parser.add_argument('--method', default='dhash', choices=HASH_METHODS, help='感知哈希方法')
+    parser.add_argument('--window', type=int, default=None, help='只与之后 N 张图片比较，适合按帧顺序命名的连续拍摄')
+    parser.add_argument('--workers', type=int, default=None, help='计算哈希的进程数，默认使用全部CPU核心')
+    args = parser.parse_args()
+
+    dedupe_folder(args.src_folder, args.dst, args.radius, args.method, args.window, args.workers)